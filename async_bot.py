@@ -0,0 +1,443 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+
+# модули бота
+import landmarks
+from config import (TOKEN, LANDMARKS_FILE, LANDMARKS_WATCH_INTERVAL, HEAVY_WORKERS,
+                    TRANSLATE_URL, TRANSLATE_BACKEND, ASYNC_REQUEST_LIMIT, TELEGRAM_API_URL, PHOTO_MIN_PIXELS,
+                    OCR_MIN_CONFIDENCE, PHOTO_DEADLINE, TEXT_DEADLINE,
+                    TRANSLATE_FAILURE_THRESHOLD, TRANSLATE_RESET_TIMEOUT,
+                    TRANSLATE_CALL_TIMEOUT, CARD_WARMUP_RATE,
+                    METRICS_HOST, METRICS_PORT)
+from ocr import (start_readers_warmup, readers_loading, wait_readers,
+                 process_image_ocr_detailed, photo_size_plan)
+from landmarks import find_landmark_info
+from landmark_cards import LandmarkCardCache
+from translation import create_translator, create_async_translator
+from singleflight import AsyncSingleFlight
+from resilience import (CircuitBreaker, DeadlineExceeded, CircuitOpenError, with_deadline,
+                        await_with_deadline, deadline_expired, current_deadline)
+from metrics import (STAGE_SECONDS, HANDLER_SECONDS, ERRORS, QUEUE_DEPTH, timed,
+                     start_metrics_server)
+from database import (DB_FILE, init_db, add_user, add_to_history, get_user_language,
+                      set_user_language, get_history, clear_history)
+from messages import (LANGUAGES, LANG_NAMES, BUTTON_PHOTO, BUTTON_TRANSLATOR, BUTTON_LANGUAGE,
+                      BUTTON_HISTORY, BUTTON_HELP, BUTTON_EXAMPLES, WELCOME_TEXT, HELP_TEXT,
+                      EXAMPLES_TEXT, PHOTO_HINT_TEXT, TRANSLATOR_HINT_TEXT, SHORT_TEXT,
+                      PHOTO_FAILED_TEXT, PHOTO_TIMEOUT_TEXT, TRANSLATE_UNAVAILABLE_TEXT,
+                      OCR_WARMING_TEXT, OCR_UNAVAILABLE_TEXT,
+                      get_main_keyboard, get_lang_keyboard, shorten, format_photo_landmark,
+                      format_photo_translation, format_photo_untranslated,
+                      format_text_translation, format_history, format_language_set)
+
+# асинхронный режим: все сетевые вызовы неблокирующие, sqlite в потоках,
+# OCR в отдельном пуле потоков
+#
+# Поддерживается не всё, что умеет langhelperbot.py, а основной сценарий:
+# /start, /help, /examples, /language, /history, /clear, фото (OCR в процессе
+# бота, без пула процессов и очереди задач), текст, карточки достопримечательностей,
+# дедлайны, предохранитель переводчика и метрики. Нет: очереди исходящих
+# сообщений (ответы уходят сразу, без учёта 429/retry_after), webhook-режима,
+# /export, /stats и команд администратора, поиска по изображению и записи
+# апдейтов. Переводчик тот же, что у синхронного бота (TRANSLATE_BACKEND).
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def run_db(func, *args):
+    """Вызов функции бд в отдельном потоке"""
+    return await asyncio.to_thread(func, *args)
+
+
+class AsyncLangHelperApp:
+    """
+    Асинхронное приложение бота
+
+    Как и LangHelperApp, импорт модуля ничего не запускает:
+    setup() - проверка токена, бот, переводчики, пул OCR и обработчики;
+    run()   - загрузка моделей в фоне, бд, каталог, карточки и polling.
+    """
+
+    def __init__(self, token=TOKEN):
+        self.token = token
+        self.bot = None
+        self.translator = None
+        self.ocr_executor = None
+        self.landmark_cards = None
+        # задачи OCR, ожидающие свободного потока (метрика глубины очереди)
+        self.ocr_queued = 0
+        self._ocr_lock = threading.Lock()
+        # одинаковые одновременные запросы (одно фото, один текст) выполняются один раз
+        self.inflight = AsyncSingleFlight()
+        # при сбоях переводчика запросы к нему временно не отправляются
+        self.translate_breaker = CircuitBreaker('translate', TRANSLATE_FAILURE_THRESHOLD,
+                                                TRANSLATE_RESET_TIMEOUT, TRANSLATE_CALL_TIMEOUT)
+        self.menu_actions = {
+            BUTTON_LANGUAGE: self.cmd_language,
+            BUTTON_HISTORY: self.cmd_history,
+            BUTTON_HELP: self.cmd_help,
+            BUTTON_EXAMPLES: self.cmd_examples,
+        }
+
+    def setup(self):
+        """Создание бота, клиентов и пула OCR"""
+        # проверка токена
+        if not self.token:
+            raise ValueError("токен не найден")
+        if ":" not in self.token:
+            raise ValueError("неверный формат токена")
+
+        # лимит одновременных запросов к Bot API
+        asyncio_helper.REQUEST_LIMIT = ASYNC_REQUEST_LIMIT
+
+        # свой адрес Bot API (например, локальный сервер для тестов)
+        if TELEGRAM_API_URL:
+            asyncio_helper.API_URL = TELEGRAM_API_URL.rstrip('/') + "/bot{0}/{1}"
+            asyncio_helper.FILE_URL = TELEGRAM_API_URL.rstrip('/') + "/file/bot{0}/{1}"
+
+        self.bot = AsyncTeleBot(self.token)
+        # тот же переводчик, что и у синхронного бота (TRANSLATE_BACKEND)
+        self.translator = create_async_translator(TRANSLATE_BACKEND, TRANSLATE_URL,
+                                                  ASYNC_REQUEST_LIMIT)
+
+        # пул для OCR (CPU), остальное выполняется в цикле событий
+        self.ocr_executor = ThreadPoolExecutor(max_workers=HEAVY_WORKERS, thread_name_prefix="ocr")
+
+        # карточки переводятся в своём фоновом потоке (не в цикле событий),
+        # поэтому им нужен синхронный клиент того же сервиса
+        self.landmark_cards = LandmarkCardCache(DB_FILE,
+                                                create_translator(TRANSLATE_BACKEND, TRANSLATE_URL),
+                                                [code for _, code in LANGUAGES],
+                                                self.translate_breaker, CARD_WARMUP_RATE)
+        self._register_handlers()
+        return self
+
+    async def run(self):
+        """Запуск фоновых задач и приём апдейтов до остановки"""
+        # модели OCR грузятся в фоне, текст и команды работают сразу
+        start_readers_warmup()
+        await run_db(init_db)
+        landmarks.reload_landmarks(LANDMARKS_FILE)
+        if LANDMARKS_WATCH_INTERVAL > 0:
+            landmarks.start_watcher(LANDMARKS_WATCH_INTERVAL)
+        self.landmark_cards.load()
+        self.landmark_cards.start_warmup()
+        landmarks.add_reload_listener(self.landmark_cards.reload)
+
+        QUEUE_DEPTH.set_function(lambda: self.ocr_queued, queue='ocr')
+        if METRICS_PORT:
+            start_metrics_server(METRICS_HOST, METRICS_PORT)
+
+        print("\n🤖 Бот запущен в асинхронном режиме! Ожидаю запросы...")
+        try:
+            await self.bot.infinity_polling()
+        finally:
+            await self.translator.close()
+            await self.bot.close_session()
+
+    def _register_handlers(self):
+        bot = self.bot
+        bot.register_message_handler(self.cmd_start, commands=['start'])
+        bot.register_message_handler(self.cmd_help, commands=['help'])
+        bot.register_message_handler(self.cmd_examples, commands=['examples'])
+        bot.register_message_handler(self.cmd_language, commands=['language', 'lang'])
+        bot.register_message_handler(self.cmd_history, commands=['history'])
+        bot.register_message_handler(self.cmd_clear, commands=['clear'])
+        bot.register_message_handler(self.handle_photo, content_types=['photo'])
+        bot.register_message_handler(self.handle_text, func=lambda message: True)
+        bot.register_callback_query_handler(self.callback_handler, func=lambda call: True)
+
+    # распознавание и перевод
+
+    async def run_ocr(self, image_bytes):
+        """Распознавание текста в пуле OCR: (текст, уверенность)"""
+        with self._ocr_lock:
+            self.ocr_queued += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.ocr_executor, self._ocr_task, image_bytes)
+
+    def _ocr_task(self, image_bytes):
+        with self._ocr_lock:
+            self.ocr_queued -= 1
+        return process_image_ocr_detailed(image_bytes)
+
+    async def recognize_photo(self, message):
+        """Скачивание фото и распознавание текста"""
+        return await self.inflight.do(('ocr', message.photo[-1].file_unique_id),
+                                           self._download_and_ocr, message.photo)
+
+    async def _download_and_ocr(self, photo_sizes):
+        # сначала средний размер, самый большой - только при низкой уверенности
+        best_text, best_confidence = None, -1.0
+        for size in photo_size_plan(photo_sizes, PHOTO_MIN_PIXELS):
+            if best_text and deadline_expired():
+                break
+            try:
+                downloaded_file = await self.download_photo(size)
+            except DeadlineExceeded:
+                if best_text:
+                    break
+                raise
+            text, confidence = await self.run_ocr(downloaded_file)
+            if text and confidence > best_confidence:
+                best_text, best_confidence = text, confidence
+            if text and len(text.strip()) > 2 and confidence >= OCR_MIN_CONFIDENCE:
+                break
+        return best_text
+
+    @timed(STAGE_SECONDS, stage='download')
+    async def download_photo(self, photo_size):
+        """Скачивание одного размера фото"""
+        file_info = await await_with_deadline(self.bot.get_file(photo_size.file_id))
+        return await await_with_deadline(self.bot.download_file(file_info.file_path))
+
+    async def translate_text(self, text, target_lang):
+        """Определение языка и перевод: (язык, точность в %, перевод), как в синхронном боте"""
+        return await self.inflight.do(('translate', text, target_lang),
+                                      self._detect_and_translate, text, target_lang)
+
+    async def _detect_and_translate(self, text, target_lang):
+        breaker = self.translate_breaker
+        with STAGE_SECONDS.time(stage='detect'):
+            detected = await breaker.call_async(self.translator.detect, text)
+        with STAGE_SECONDS.time(stage='translate'):
+            translation = await breaker.call_async(self.translator.translate, text,
+                                                   src=detected.lang, dest=target_lang)
+        return detected.lang, detected.confidence * 100, translation.text
+
+    # обтработчики команд
+
+    async def cmd_start(self, message):
+        """Команда старт"""
+        user_id = message.from_user.id
+        username = message.from_user.username or ""
+        first_name = message.from_user.first_name or ""
+
+        await run_db(add_user, user_id, username, first_name)
+        await run_db(set_user_language, user_id, 'ru')
+
+        await self.bot.send_message(message.chat.id, WELCOME_TEXT.format(first_name=first_name),
+                                    reply_markup=get_main_keyboard(),
+                                    parse_mode='Markdown')
+
+    async def cmd_help(self, message):
+        """Команда помощь"""
+        await self.bot.send_message(message.chat.id, HELP_TEXT, parse_mode='Markdown')
+
+    async def cmd_examples(self, message):
+        """Примеры достопримечательностей"""
+        await self.bot.send_message(message.chat.id, EXAMPLES_TEXT, parse_mode='Markdown')
+
+    async def cmd_language(self, message):
+        """Выбор языка"""
+        await self.bot.send_message(message.chat.id,
+                                    "Выберите язык для перевода:",
+                                    reply_markup=get_lang_keyboard(),
+                                    parse_mode='Markdown')
+
+    async def cmd_history(self, message):
+        """История переводов"""
+        history = await run_db(get_history, message.from_user.id)
+
+        if not history:
+            await self.bot.send_message(message.chat.id, "История пуста", parse_mode='Markdown')
+            return
+
+        await self.bot.send_message(message.chat.id, format_history(history), parse_mode='Markdown')
+
+    async def cmd_clear(self, message):
+        """Очистка истории"""
+        await run_db(clear_history, message.from_user.id)
+        await self.bot.send_message(message.chat.id, "✅ История очищена")
+
+    # обработка фото
+
+    @timed(HANDLER_SECONDS, handler='photo')
+    @with_deadline(PHOTO_DEADLINE)
+    async def handle_photo(self, message):
+        """Обработка фото: распознаём текст и ищем достопримечательности"""
+        user_id = message.from_user.id
+
+        processing_msg = await self.bot.send_message(message.chat.id,
+                                                     "📸 Распознаю текст на фото...",
+                                                     parse_mode='Markdown')
+
+        try:
+            # сразу после запуска ждём загрузки моделей OCR
+            if readers_loading():
+                await self.bot.edit_message_text(OCR_WARMING_TEXT, message.chat.id,
+                                                 processing_msg.message_id)
+                ready = await asyncio.to_thread(wait_readers, current_deadline().remaining())
+                if not ready and readers_loading():
+                    raise DeadlineExceeded("модели OCR ещё загружаются")
+            if not wait_readers(0):
+                await self.bot.edit_message_text(OCR_UNAVAILABLE_TEXT, message.chat.id,
+                                                 processing_msg.message_id)
+                return
+
+            # скачиваем и распознаём текст на фото
+            recognized_text = await self.recognize_photo(message)
+
+            if not recognized_text or len(recognized_text.strip()) <= 2:
+                # не удалось распознать текст
+                await self.bot.edit_message_text(PHOTO_FAILED_TEXT,
+                                                 message.chat.id,
+                                                 processing_msg.message_id,
+                                                 parse_mode='Markdown')
+                return
+
+            display_text = shorten(recognized_text, 300)
+            target_lang = await run_db(get_user_language, user_id)
+
+            # пробуем найти достопримечательность в тексте
+            landmark_info = find_landmark_info(recognized_text)
+
+            if landmark_info['found']:
+                card = self.landmark_cards.get('photo', landmark_info, target_lang)
+                await run_db(add_to_history, user_id, 'photo_landmark', recognized_text[:100],
+                             landmark_info['name'], 'text', 'landmark')
+                await self.bot.edit_message_text(format_photo_landmark(card, display_text),
+                                                 message.chat.id,
+                                                 processing_msg.message_id,
+                                                 parse_mode='Markdown')
+                return
+
+            # определение языка и перевод одним запросом
+            try:
+                src_lang, confidence, translated = await self.translate_text(recognized_text,
+                                                                             target_lang)
+            except (DeadlineExceeded, CircuitOpenError) as e:
+                # переводчик не успел или отключён: отдаём хотя бы распознанный текст
+                logger.warning(f"Фото без перевода: {e}")
+                ERRORS.inc(stage='translate')
+                await self.bot.edit_message_text(format_photo_untranslated(display_text),
+                                                 message.chat.id,
+                                                 processing_msg.message_id,
+                                                 parse_mode='Markdown')
+                return
+            await run_db(add_to_history, user_id, 'photo', recognized_text, translated,
+                         src_lang, target_lang)
+
+            response = format_photo_translation(display_text, src_lang, confidence,
+                                                target_lang, translated)
+            await self.bot.edit_message_text(response,
+                                             message.chat.id,
+                                             processing_msg.message_id,
+                                             parse_mode='Markdown')
+
+        except DeadlineExceeded as e:
+            logger.warning(f"Фото не обработано вовремя: {e}")
+            ERRORS.inc(stage='deadline')
+            await self.bot.edit_message_text(PHOTO_TIMEOUT_TEXT, message.chat.id, processing_msg.message_id)
+
+        except Exception as e:
+            logger.error(f"Ошибка обработки фото: {e}")
+            ERRORS.inc(stage='photo')
+            await self.bot.edit_message_text(f"❌ Ошибка обработки фото: `{str(e)[:100]}`",
+                                             message.chat.id,
+                                             processing_msg.message_id,
+                                             parse_mode='Markdown')
+
+    # обработ текста
+
+    @timed(HANDLER_SECONDS, handler='text')
+    @with_deadline(TEXT_DEADLINE)
+    async def handle_text(self, message):
+        """Обработка текста: ищем достопримечательности или переводим"""
+        text = message.text.strip()
+        user_id = message.from_user.id
+
+        # проверяем команды меню
+        if text == BUTTON_PHOTO:
+            await self.bot.send_message(message.chat.id, PHOTO_HINT_TEXT, parse_mode='Markdown')
+            return
+        if text == BUTTON_TRANSLATOR:
+            await self.bot.send_message(message.chat.id, TRANSLATOR_HINT_TEXT, parse_mode='Markdown')
+            return
+        if text in self.menu_actions:
+            await self.menu_actions[text](message)
+            return
+
+        if len(text) < 2:
+            await self.bot.send_message(message.chat.id, SHORT_TEXT, parse_mode='Markdown')
+            return
+
+        target_lang = await run_db(get_user_language, user_id)
+
+        # пробуем найти достопримечательность в тексте
+        landmark_info = find_landmark_info(text)
+
+        if landmark_info['found']:
+            response = self.landmark_cards.get('text', landmark_info, target_lang)
+            await run_db(add_to_history, user_id, 'text_landmark', text, landmark_info['name'],
+                         'landmark', 'info')
+            await self.bot.reply_to(message, response, parse_mode='Markdown')
+            return
+
+        # если не достопримечательность, делаем перевод
+        try:
+            await self.bot.send_chat_action(message.chat.id, 'typing')
+
+            src_lang, confidence, translated = await self.translate_text(text, target_lang)
+
+            await run_db(add_to_history, user_id, 'text', text, translated, src_lang, target_lang)
+
+            response = format_text_translation(text, src_lang, confidence, target_lang, translated)
+            await self.bot.reply_to(message, response, parse_mode='Markdown')
+
+        except (DeadlineExceeded, CircuitOpenError) as e:
+            logger.warning(f"Текст без перевода: {e}")
+            ERRORS.inc(stage='translate')
+            await self.bot.reply_to(message, TRANSLATE_UNAVAILABLE_TEXT)
+
+        except Exception as e:
+            ERRORS.inc(stage='translate')
+            await self.bot.reply_to(message, f"❌ Ошибка перевода: `{str(e)[:100]}`", parse_mode='Markdown')
+
+    # обработчик callback
+
+    async def callback_handler(self, call):
+        """Обработка callback (выбор языка)"""
+        try:
+            if call.data.startswith("lang_"):
+                lang = call.data[5:]
+                await run_db(set_user_language, call.from_user.id, lang)
+
+                lang_name = LANG_NAMES.get(lang, lang)
+
+                await self.bot.answer_callback_query(call.id, f"Язык перевода: {lang_name}")
+                await self.bot.edit_message_text(format_language_set(lang),
+                                                 call.message.chat.id,
+                                                 call.message.message_id,
+                                                 parse_mode='Markdown')
+
+        except Exception as e:
+            await self.bot.answer_callback_query(call.id, f"Ошибка: {str(e)[:50]}")
+
+
+def create_app(token=TOKEN):
+    """Фабрика приложения: созданное и подготовленное, но ещё не запущенное"""
+    return AsyncLangHelperApp(token).setup()
+
+# заупск бота
+
+def main():
+    try:
+        app = create_app()
+    except ValueError as e:
+        print(f"ОШИБКА: {e}")
+        return 1
+    try:
+        asyncio.run(app.run())
+    except KeyboardInterrupt:
+        print("\n✅ Бот остановлен пользователем")
+    return 0
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,331 @@
+"""
+Офлайн-бенчмарки горячих путей: OCR, поиск достопримечательностей, перевод
+
+    python benchmark.py --output baseline.json
+    python benchmark.py --compare baseline.json
+    python benchmark.py --only ocr-backend --quantize recognizer
+
+Результаты - JSON; в режиме --compare время каждого замера сравнивается
+с сохранённым, регрессии выше порога дают код выхода 1.
+"""
+import argparse
+import difflib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+# шрифты для синтетических изображений по письменностям (первый найденный)
+FONT_CANDIDATES = {
+    'latin': ['DejaVuSans.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+              'C:/Windows/Fonts/arial.ttf'],
+    'cyrillic': ['DejaVuSans.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+                 'C:/Windows/Fonts/arial.ttf'],
+    'japanese': ['/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+                 'C:/Windows/Fonts/msgothic.ttc'],
+    'korean': ['/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+               'C:/Windows/Fonts/malgun.ttf'],
+}
+
+# тексты по письменностям
+SAMPLE_TEXTS = {
+    'latin': "Eiffel Tower, Paris",
+    'cyrillic': "Красная площадь, Москва",
+    'japanese': "東京タワー",
+    'korean': "경복궁 서울",
+}
+
+# размеры, близкие к размерам фото в Telegram
+IMAGE_SIZES = [(320, 240), (800, 600), (1280, 960)]
+
+# слова-шум для корпуса поиска
+NOISE_WORDS = ["мы", "были", "вчера", "около", "очень", "красивый", "вид", "the", "we",
+               "visited", "near", "beautiful", "view", "photo", "trip", "город", "old",
+               "музей", "ticket", "вход", "street", "улица", "day", "вечером"]
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по отсортированной выборке (ближайший ранг)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples):
+    """Сводка по длительностям (секунды)"""
+    values = sorted(samples)
+    total = sum(values)
+    return {
+        'count': len(values),
+        'mean': total / len(values) if values else 0.0,
+        'min': values[0] if values else 0.0,
+        'p50': percentile(values, 0.50),
+        'p95': percentile(values, 0.95),
+        'p99': percentile(values, 0.99),
+        'ops_per_sec': len(values) / total if total else 0.0,
+    }
+
+
+def find_font(script, size):
+    from PIL import ImageFont
+    for path in FONT_CANDIDATES.get(script, []):
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return None
+
+
+def make_text_image(text, font, size):
+    """PNG с тёмным текстом на светлом фоне, текст по центру"""
+    from PIL import Image, ImageDraw
+    width, height = size
+    image = Image.new('RGB', size, (235, 232, 225))
+    draw = ImageDraw.Draw(image)
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    position = ((width - (right - left)) // 2, (height - (bottom - top)) // 2)
+    draw.text(position, text, fill=(20, 20, 20), font=font)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def build_images():
+    """Синтетические изображения: {(письменность, ширина x высота): байты}"""
+    images = {}
+    for script, text in SAMPLE_TEXTS.items():
+        for size in IMAGE_SIZES:
+            font = find_font(script, max(16, size[0] // 16))
+            if font is None:
+                print(f"⚠️ Нет шрифта для {script}, пропускаю", file=sys.stderr)
+                break
+            images[(script, f"{size[0]}x{size[1]}")] = make_text_image(text, font, size)
+    return images
+
+
+def timeit(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+# бенчмарки
+
+def bench_ocr(repeat):
+    """process_image_ocr на каждом изображении для каждого читателя отдельно и для всех сразу"""
+    import easyocr
+    import ocr
+
+    images = build_images()
+    all_readers = {}
+    for name, langs in ocr.READER_CONFIGS.items():
+        try:
+            all_readers[name] = easyocr.Reader(langs, gpu=False, verbose=False)
+        except Exception as e:
+            print(f"⚠️ Читатель {name} не загружен: {e}", file=sys.stderr)
+
+    configs = {name: {name: reader} for name, reader in all_readers.items()}
+    if len(all_readers) > 1:
+        configs['all'] = all_readers
+
+    results = {}
+    for config_name, config_readers in configs.items():
+        ocr.readers = config_readers
+        for (script, size), image_bytes in images.items():
+            ocr.process_image_ocr(image_bytes)  # прогрев
+            samples = timeit(lambda: ocr.process_image_ocr(image_bytes), repeat)
+            results[f"ocr/{config_name}/{script}/{size}"] = summarize(samples)
+    return results
+
+
+def similarity(a, b):
+    """Похожесть строк 0..1 без учёта регистра и пробелов по краям"""
+    return difflib.SequenceMatcher(None, a.strip().lower(), b.strip().lower()).ratio()
+
+
+def bench_ocr_backends(repeat, quantize):
+    """
+    PyTorch против ONNX Runtime на одних и тех же изображениях
+
+    Кроме времени для каждого движка записывается точность: похожесть
+    распознанного текста на исходный (accuracy) и, для ONNX, совпадение
+    с результатом PyTorch (agreement).
+    """
+    import easyocr
+    import ocr
+    from config import ONNX_MODEL_DIR
+    from ocr_onnx import enable_onnx
+
+    images = build_images()
+    readers = {name: easyocr.Reader(langs, gpu=False, verbose=False)
+               for name, langs in ocr.READER_CONFIGS.items()}
+    ocr.readers = readers
+    results = {}
+
+    def run_backend(backend):
+        texts = {}
+        for (script, size), image_bytes in images.items():
+            text = ocr.process_image_ocr(image_bytes)  # прогрев
+            samples = timeit(lambda: ocr.process_image_ocr(image_bytes), repeat)
+            summary = summarize(samples)
+            summary['accuracy'] = similarity(text, SAMPLE_TEXTS[script])
+            texts[(script, size)] = text
+            results[f"ocr-backend/{backend}/{script}/{size}"] = summary
+        return texts
+
+    torch_texts = run_backend('torch')
+    enable_onnx(readers, ocr.READER_CONFIGS, ONNX_MODEL_DIR, quantize)
+    onnx_texts = run_backend('onnx')
+    for key, text in onnx_texts.items():
+        results[f"ocr-backend/onnx/{key[0]}/{key[1]}"]['agreement'] = similarity(text, torch_texts[key])
+    return results
+
+
+def build_corpus(size, seed=42):
+    """Корпус текстов: треть с названием достопримечательности, остальное - шум"""
+    from landmarks import get_index
+    index = get_index()
+    names = list(index.landmarks_ru) + [en_key for en_key, _ in index.en_matches]
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(size):
+        words = rng.sample(NOISE_WORDS, rng.randint(3, 10))
+        if i % 3 == 0:
+            words.insert(rng.randint(0, len(words)), rng.choice(names))
+        corpus.append(' '.join(words))
+    return corpus
+
+
+def bench_landmarks(corpus_size, repeat):
+    """Пропускная способность find_landmark_info на сгенерированном корпусе"""
+    from landmarks import find_landmark_info
+    corpus = build_corpus(corpus_size)
+
+    def run():
+        for text in corpus:
+            find_landmark_info(text)
+
+    run()  # прогрев
+    samples = timeit(run, repeat)
+    summary = summarize([sample / len(corpus) for sample in samples])
+    summary['corpus_size'] = len(corpus)
+    summary['matches'] = sum(1 for text in corpus if find_landmark_info(text)['found'])
+    return {'landmarks/find_landmark_info': summary}
+
+
+def bench_translate(requests_count, delay):
+    """Клиент перевода против локальной заглушки gtx"""
+    from fake_servers import FakeTranslateServer
+    from translation import Translator
+
+    server = FakeTranslateServer(delay=delay).start()
+    try:
+        translator = Translator(server.url)
+        texts = [SAMPLE_TEXTS[script] for script in SAMPLE_TEXTS]
+        translator.translate(texts[0], dest='en')  # прогрев соединения
+
+        results = {}
+        samples = []
+        for i in range(requests_count):
+            text = texts[i % len(texts)]
+            start = time.perf_counter()
+            translator.translate(text, dest='ru')
+            samples.append(time.perf_counter() - start)
+        results['translate/translate'] = summarize(samples)
+
+        samples = timeit(lambda: translator.detect(texts[1]), requests_count)
+        results['translate/detect'] = summarize(samples)
+        return results
+    finally:
+        server.stop()
+
+
+# сравнение с базовой линией
+
+def compare(results, baseline, threshold, out=sys.stdout):
+    """Список регрессий: замеры, ставшие медленнее больше чем на threshold"""
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None or not previous.get('p50'):
+            print(f"  {name}: новый замер, {current['p50'] * 1000:.3f} мс", file=out)
+            continue
+        # медиана устойчивее к единичным выбросам, чем среднее
+        change = current['p50'] / previous['p50'] - 1
+        mark = '❌' if change > threshold else '✅'
+        print(f"  {mark} {name}: {previous['p50'] * 1000:.3f} → {current['p50'] * 1000:.3f} мс "
+              f"({change:+.1%})", file=out)
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки OCR, поиска достопримечательностей и перевода")
+    parser.add_argument('--only', default='ocr,landmarks,translate',
+                        help="какие наборы запускать, через запятую")
+    parser.add_argument('--repeat', type=int, default=5, help="повторов каждого замера")
+    parser.add_argument('--corpus-size', type=int, default=20000, help="текстов в корпусе поиска")
+    parser.add_argument('--translate-requests', type=int, default=200)
+    parser.add_argument('--quantize', default='none', choices=['none', 'recognizer', 'all'],
+                        help="int8-квантование моделей для набора ocr-backend")
+    parser.add_argument('--translate-delay', type=float, default=0.0,
+                        help="задержка заглушки переводчика (секунды)")
+    parser.add_argument('--output', help="файл для результатов (иначе stdout)")
+    parser.add_argument('--compare', help="JSON предыдущего запуска для сравнения")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="допустимое замедление при сравнении (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    suites = set(args.only.split(','))
+    results = {}
+    if 'landmarks' in suites:
+        results.update(bench_landmarks(args.corpus_size, args.repeat))
+    if 'translate' in suites:
+        results.update(bench_translate(args.translate_requests, args.translate_delay))
+    if 'ocr' in suites:
+        results.update(bench_ocr(args.repeat))
+    if 'ocr-backend' in suites:
+        results.update(bench_ocr_backends(args.repeat, args.quantize))
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        # без --output в stdout уже JSON, отчёт сравнения идёт в stderr
+        out = sys.stdout if args.output else sys.stderr
+        print(f"\nСравнение с {args.compare}:", file=out)
+        regressions = compare(results, baseline, args.threshold, out)
+        if regressions:
+            print(f"\n❌ Регрессии: {len(regressions)}", file=out)
+            return 1
+        print("\n✅ Регрессий нет", file=out)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
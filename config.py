@@ -0,0 +1,128 @@
+import os
+from dotenv import load_dotenv
+
+from landmarks import LANDMARKS_FILE as LANDMARKS_FILE_DEFAULT
+
+# загрузка конфигурации
+load_dotenv()
+TOKEN = os.getenv("BOT_TOKEN")
+
+# администраторы (id через запятую)
+ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if x}
+
+# каталог достопримечательностей и интервал проверки изменений (сек)
+LANDMARKS_FILE = os.getenv("LANDMARKS_FILE", LANDMARKS_FILE_DEFAULT)
+LANDMARKS_WATCH_INTERVAL = int(os.getenv("LANDMARKS_WATCH_INTERVAL", "10"))
+
+# пулы обработчиков: тяжёлые (фото/OCR) и лёгкие (текст, команды, callback)
+HEAVY_WORKERS = int(os.getenv("HEAVY_WORKERS", "2"))
+LIGHT_WORKERS = int(os.getenv("LIGHT_WORKERS", "8"))
+HEAVY_QUEUE_LIMIT = int(os.getenv("HEAVY_QUEUE_LIMIT", "50"))
+LIGHT_QUEUE_LIMIT = int(os.getenv("LIGHT_QUEUE_LIMIT", "500"))
+
+# переводчик (оба режима): googletrans или gtx (свой клиент, адрес TRANSLATE_URL)
+TRANSLATE_BACKEND = os.getenv("TRANSLATE_BACKEND", "googletrans")
+
+# сервис перевода (протокол client=gtx) и лимит соединений асинхронного режима
+TRANSLATE_URL = os.getenv("TRANSLATE_URL", "https://translate.googleapis.com")
+ASYNC_REQUEST_LIMIT = int(os.getenv("ASYNC_REQUEST_LIMIT", "200"))
+
+# адрес Bot API (можно указать локальный сервер для тестов)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
+# режим работы: polling или webhook
+RUN_MODE = os.getenv("RUN_MODE", "polling")
+
+# webhook: публичный адрес для setWebhook, локальный адрес сервера, путь и секрет
+# (секрет обязателен: 1-256 символов A-Z, a-z, 0-9, _ и -; без него бот не запустится)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# лимиты на распознавание фото (в минуту и размер всплеска) и очередь на пользователя
+USER_PHOTO_RATE = float(os.getenv("USER_PHOTO_RATE", "6"))
+USER_PHOTO_BURST = int(os.getenv("USER_PHOTO_BURST", "3"))
+CHAT_PHOTO_RATE = float(os.getenv("CHAT_PHOTO_RATE", "20"))
+CHAT_PHOTO_BURST = int(os.getenv("CHAT_PHOTO_BURST", "10"))
+USER_PHOTO_QUEUE_LIMIT = int(os.getenv("USER_PHOTO_QUEUE_LIMIT", "10"))
+
+# адаптивное разрешение фото: минимальный размер первой попытки (пиксели)
+# и уверенность OCR, ниже которой скачивается самый большой размер
+PHOTO_MIN_PIXELS = int(os.getenv("PHOTO_MIN_PIXELS", "400000"))
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "0.5"))
+
+# исходящие сообщения: общий лимит бота (в секунду) и число потоков отправки
+OUTBOUND_RATE = float(os.getenv("OUTBOUND_RATE", "30"))
+OUTBOUND_WORKERS = int(os.getenv("OUTBOUND_WORKERS", "4"))
+
+# сколько ждать отправки файла /export (секунды); не дождались - выгрузка отменяется
+EXPORT_SEND_TIMEOUT = float(os.getenv("EXPORT_SEND_TIMEOUT", "120"))
+
+# бюджет времени на обработку фото и текста (секунды) и предохранитель переводчика:
+# число ошибок подряд до отключения, пауза до пробного запроса и таймаут одного
+# запроса к переводчику (сбоем считается только он, а не нехватка бюджета запроса)
+PHOTO_DEADLINE = float(os.getenv("PHOTO_DEADLINE", "45"))
+TEXT_DEADLINE = float(os.getenv("TEXT_DEADLINE", "15"))
+TRANSLATE_FAILURE_THRESHOLD = int(os.getenv("TRANSLATE_FAILURE_THRESHOLD", "5"))
+TRANSLATE_RESET_TIMEOUT = float(os.getenv("TRANSLATE_RESET_TIMEOUT", "30"))
+TRANSLATE_CALL_TIMEOUT = float(os.getenv("TRANSLATE_CALL_TIMEOUT", "5"))
+
+# фоновый перевод карточек достопримечательностей: запросов к переводчику в секунду
+CARD_WARMUP_RATE = float(os.getenv("CARD_WARMUP_RATE", "2"))
+
+# метрики в формате Prometheus (0 - выключены)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# движок OCR: torch или onnx (ONNX Runtime, модели экспортируются в ONNX_MODEL_DIR);
+# квантование int8 для onnx: none, recognizer или all
+OCR_BACKEND = os.getenv("OCR_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/onnx")
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "none")
+
+# процессы OCR с общими весами моделей (0 - распознавание в процессе бота)
+# и потоков torch на процесс (0 - ядра поровну); нужен fork (Linux, macOS)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0"))
+OCR_WORKER_THREADS = int(os.getenv("OCR_WORKER_THREADS", "0"))
+
+# передача фото процессам OCR через разделяемую память: размер слота в МБ
+# (по умолчанию 2560x2560 RGB - самое большое фото Telegram; фото больше слота
+# уходит байтами файла; 0 - всегда байтами) и число слотов - сколько фото
+# одновременно в работе (0 - по два на процесс)
+OCR_SHM_SLOT_MB = float(os.getenv("OCR_SHM_SLOT_MB", str(2560 * 2560 * 3 / 2**20)))
+OCR_SHM_SLOTS = int(os.getenv("OCR_SHM_SLOTS", "0"))
+
+# потоков torch / OpenCV на распознавание в процессе бота (0 - ядра поровну между
+# HEAVY_WORKERS), закрепление процессов OCR за ядрами и файл с результатом
+# подбора (python resources.py): он задаёт процессы и потоки, если они не указаны явно
+OCR_THREADS = int(os.getenv("OCR_THREADS", "0"))
+OCR_PIN_CORES = os.getenv("OCR_PIN_CORES", "1") == "1"
+OCR_TUNING_FILE = os.getenv("OCR_TUNING_FILE", "ocr_tuning.json")
+
+# очередь задач OCR для отдельных исполнителей (ocr_worker.py): sqlite - база бота,
+# sqlite:///путь - отдельная база; пусто - OCR в процессе бота.
+# Аренда задачи (сек), попыток на задачу и сколько ждать результат, прежде чем сдаться
+JOB_QUEUE_URL = os.getenv("JOB_QUEUE_URL", "")
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RESULT_TIMEOUT = float(os.getenv("JOB_RESULT_TIMEOUT", "300"))
+
+# поиск достопримечательности по изображению (фото без текста): папка эталонов
+# (подпапки по ключу каталога или английскому названию; пусто - выключено),
+# сеть torchvision, минимальная косинусная близость и отрыв от второй достопримечательности.
+# Эталонные фото с ботом не поставляются: пока их нет в папке, поиск выключен.
+# Пороги - начальные, на настоящих фото не проверены; после добавления
+# эталонов их стоит подобрать: python visual_index.py --check
+VISUAL_INDEX_DIR = os.getenv("VISUAL_INDEX_DIR",
+                             os.path.join(os.path.dirname(LANDMARKS_FILE_DEFAULT), 'landmark_images'))
+VISUAL_MODEL = os.getenv("VISUAL_MODEL", "mobilenet_v3_small")
+VISUAL_MIN_SCORE = float(os.getenv("VISUAL_MIN_SCORE", "0.75"))
+VISUAL_MARGIN = float(os.getenv("VISUAL_MARGIN", "0.05"))
+
+# запись входящих апдейтов для воспроизведения (replay.py): файл JSONL, например
+# recordings/updates.jsonl (пусто - выключено; фото - в подпапке photos рядом)
+# и соль псевдонимов пользователей (пусто - своя на каждый запуск)
+RECORD_UPDATES_FILE = os.getenv("RECORD_UPDATES_FILE", "")
+RECORD_SALT = os.getenv("RECORD_SALT", "")
@@ -0,0 +1,370 @@
+import sqlite3
+import logging
+from datetime import datetime, timezone
+
+from metrics import DB_SECONDS, timed
+
+logger = logging.getLogger(__name__)
+
+# константы
+DB_FILE = "langhelper.db"
+
+# функц бд
+
+def init_db():
+    """Инициализация базы данных"""
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        
+        # WAL: долгое чтение (выгрузка истории) не блокирует запись
+        cursor.execute('PRAGMA journal_mode=WAL')
+        
+        # таб пользователей
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            target_language TEXT DEFAULT 'ru',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        
+        # таб истории
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            type TEXT,
+            original_text TEXT,
+            translated_text TEXT,
+            source_lang TEXT,
+            target_lang TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        
+        # таб переведённых карточек достопримечательностей
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS landmark_cards (
+            landmark_key TEXT,
+            lang TEXT,
+            source_hash TEXT,
+            name TEXT,
+            description TEXT,
+            fact TEXT,
+            PRIMARY KEY (landmark_key, lang)
+        )
+        ''')
+        
+        # счётчики статистики: обновляются вместе с записью истории
+        for statement in STATS_SCHEMA:
+            cursor.execute(statement)
+        
+        conn.commit()
+        conn.close()
+        print("База данных инициализирована")
+    except Exception as e:
+        print(f"Ошибка БД: {e}")
+
+@timed(DB_SECONDS, op='add_user')
+def add_user(user_id, username="", first_name=""):
+    """Добавление пользователя"""
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute('''
+        INSERT OR IGNORE INTO users (user_id, username, first_name) 
+        VALUES (?, ?, ?)
+        ''', (user_id, username, first_name))
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        logger.error(f"Ошибка добавления пользователя: {e}")
+
+@timed(DB_SECONDS, op='add_to_history')
+def add_to_history(user_id, type_, original, translated, src_lang, target_lang):
+    """Добавление в историю (и в счётчики статистики, в той же транзакции)"""
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute('''
+        INSERT INTO history (user_id, type, original_text, translated_text, source_lang, target_lang)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', (user_id, type_, original[:1000], translated[:1000], src_lang, target_lang))
+        count_request(cursor, user_id, type_, translated[:1000], src_lang, target_lang)
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        logger.error(f"Ошибка добавления в историю: {e}")
+
+@timed(DB_SECONDS, op='get_user_language')
+def get_user_language(user_id):
+    """Получение языка пользователя"""
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute('SELECT target_language FROM users WHERE user_id = ?', (user_id,))
+        result = cursor.fetchone()
+        conn.close()
+        return result[0] if result else 'ru'
+    except:
+        return 'ru'
+
+@timed(DB_SECONDS, op='set_user_language')
+def set_user_language(user_id, lang):
+    """Установка языка"""
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute('''
+        INSERT OR REPLACE INTO users (user_id, target_language) 
+        VALUES (?, ?)
+        ''', (user_id, lang))
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        logger.error(f"Ошибка установки языка: {e}")
+
+@timed(DB_SECONDS, op='get_history')
+def get_history(user_id, limit=10):
+    """Последние записи истории пользователя"""
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT type, original_text, translated_text, source_lang, target_lang, timestamp
+    FROM history 
+    WHERE user_id = ? 
+    ORDER BY timestamp DESC 
+    LIMIT ?
+    ''', (user_id, limit))
+    
+    history = cursor.fetchall()
+    conn.close()
+    return history
+
+@timed(DB_SECONDS, op='clear_history')
+def clear_history(user_id):
+    """Очистка истории пользователя"""
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM history WHERE user_id = ?', (user_id,))
+    conn.commit()
+    conn.close()
+
+# колонки выгрузки истории (порядок полей iter_history)
+HISTORY_COLUMNS = ('id', 'type', 'original_text', 'translated_text', 'source_lang',
+                   'target_lang', 'timestamp')
+
+def iter_history(user_id, batch_size=500):
+    """
+    Вся история пользователя по порядку, пачками по batch_size строк
+
+    Курсор SQLite читает строки по мере обхода, поэтому в памяти не больше
+    одной пачки при любом размере истории.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT id, type, original_text, translated_text, source_lang, target_lang, timestamp
+        FROM history
+        WHERE user_id = ?
+        ORDER BY id
+        ''', (user_id,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+# статистика
+#
+# Счётчики по дням, пользователям, достопримечательностям и языковым парам
+# обновляются каждой записью истории, поэтому запросы статистики читают
+# несколько строк маленьких таблиц вместо обхода всей истории. Очистка
+# истории счётчики не уменьшает; rebuild_stats пересчитывает их по тому,
+# что осталось в истории.
+
+STATS_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS stats_daily (
+        day TEXT PRIMARY KEY,
+        requests INTEGER NOT NULL DEFAULT 0,
+        photos INTEGER NOT NULL DEFAULT 0,
+        landmarks INTEGER NOT NULL DEFAULT 0,
+        users INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    # пары (пользователь, день) - чтобы считать активных за день без обхода
+    '''
+    CREATE TABLE IF NOT EXISTS stats_user_days (
+        user_id INTEGER,
+        day TEXT,
+        PRIMARY KEY (user_id, day)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stats_users (
+        user_id INTEGER PRIMARY KEY,
+        requests INTEGER NOT NULL DEFAULT 0,
+        photos INTEGER NOT NULL DEFAULT 0,
+        landmarks INTEGER NOT NULL DEFAULT 0,
+        first_at TEXT,
+        last_at TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stats_landmarks (
+        name TEXT PRIMARY KEY,
+        requests INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stats_lang_pairs (
+        source_lang TEXT,
+        target_lang TEXT,
+        requests INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (source_lang, target_lang)
+    )
+    ''',
+)
+
+STATS_TABLES = ('stats_daily', 'stats_user_days', 'stats_users', 'stats_landmarks',
+                'stats_lang_pairs')
+
+def count_request(cursor, user_id, type_, translated, src_lang, target_lang):
+    """
+    Запись истории в счётчики (в транзакции вызывающего)
+
+    Достопримечательность - тип с landmark (название в translated),
+    остальное - перевод с языковой парой.
+    """
+    # та же зона и формат, что у CURRENT_TIMESTAMP в истории
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    day = now[:10]
+    photo = int(type_.startswith('photo'))
+    landmark = int('landmark' in type_)
+
+    cursor.execute('INSERT OR IGNORE INTO stats_user_days (user_id, day) VALUES (?, ?)',
+                   (user_id, day))
+    new_user_day = cursor.rowcount
+    cursor.execute('''
+    INSERT INTO stats_daily (day, requests, photos, landmarks, users) VALUES (?, 1, ?, ?, ?)
+    ON CONFLICT (day) DO UPDATE SET requests = requests + 1, photos = photos + excluded.photos,
+        landmarks = landmarks + excluded.landmarks, users = users + excluded.users
+    ''', (day, photo, landmark, new_user_day))
+    cursor.execute('''
+    INSERT INTO stats_users (user_id, requests, photos, landmarks, first_at, last_at)
+    VALUES (?, 1, ?, ?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET requests = requests + 1,
+        photos = photos + excluded.photos, landmarks = landmarks + excluded.landmarks,
+        last_at = excluded.last_at
+    ''', (user_id, photo, landmark, now, now))
+    if landmark:
+        cursor.execute('''
+        INSERT INTO stats_landmarks (name, requests) VALUES (?, 1)
+        ON CONFLICT (name) DO UPDATE SET requests = requests + 1
+        ''', (translated,))
+    else:
+        cursor.execute('''
+        INSERT INTO stats_lang_pairs (source_lang, target_lang, requests) VALUES (?, ?, 1)
+        ON CONFLICT (source_lang, target_lang) DO UPDATE SET requests = requests + 1
+        ''', (src_lang, target_lang))
+
+@timed(DB_SECONDS, op='get_stats')
+def get_stats(user_id=None, top=5, days=7):
+    """
+    Статистика из счётчиков
+
+    Возвращает dict: user (запросы, фото, достопримечательности, первый
+    и последний запрос или None), landmarks и pairs (самые частые),
+    daily (последние days дней: день, запросы, фото, достопр., активных).
+    """
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        cursor = conn.cursor()
+        user = None
+        if user_id is not None:
+            user = cursor.execute('''
+            SELECT requests, photos, landmarks, first_at, last_at FROM stats_users
+            WHERE user_id = ?
+            ''', (user_id,)).fetchone()
+        landmarks = cursor.execute(
+            'SELECT name, requests FROM stats_landmarks ORDER BY requests DESC LIMIT ?',
+            (top,)).fetchall()
+        pairs = cursor.execute('''
+        SELECT source_lang, target_lang, requests FROM stats_lang_pairs
+        ORDER BY requests DESC LIMIT ?
+        ''', (top,)).fetchall()
+        daily = cursor.execute(
+            'SELECT day, requests, photos, landmarks, users FROM stats_daily '
+            'ORDER BY day DESC LIMIT ?', (days,)).fetchall()
+        return {'user': user, 'landmarks': landmarks, 'pairs': pairs, 'daily': daily}
+    finally:
+        conn.close()
+
+def rebuild_stats():
+    """
+    Пересчёт счётчиков по всей истории (одной транзакцией)
+
+    Каждая таблица - один проход GROUP BY по истории; запись истории
+    на это время ждёт (busy timeout). Возвращает число записей истории.
+    """
+    conn = sqlite3.connect(DB_FILE, timeout=60)
+    try:
+        cursor = conn.cursor()
+        for statement in STATS_SCHEMA:
+            cursor.execute(statement)
+        cursor.execute('BEGIN IMMEDIATE')
+        for table in STATS_TABLES:
+            cursor.execute(f'DELETE FROM {table}')
+        cursor.execute('''
+        INSERT INTO stats_user_days (user_id, day)
+        SELECT DISTINCT user_id, date(timestamp) FROM history
+        ''')
+        cursor.execute('''
+        INSERT INTO stats_daily (day, requests, photos, landmarks, users)
+        SELECT date(timestamp), COUNT(*), SUM(type LIKE 'photo%'), SUM(type LIKE '%landmark%'),
+               COUNT(DISTINCT user_id)
+        FROM history GROUP BY date(timestamp)
+        ''')
+        cursor.execute('''
+        INSERT INTO stats_users (user_id, requests, photos, landmarks, first_at, last_at)
+        SELECT user_id, COUNT(*), SUM(type LIKE 'photo%'), SUM(type LIKE '%landmark%'),
+               MIN(timestamp), MAX(timestamp)
+        FROM history GROUP BY user_id
+        ''')
+        cursor.execute('''
+        INSERT INTO stats_landmarks (name, requests)
+        SELECT translated_text, COUNT(*) FROM history
+        WHERE type LIKE '%landmark%' GROUP BY translated_text
+        ''')
+        cursor.execute('''
+        INSERT INTO stats_lang_pairs (source_lang, target_lang, requests)
+        SELECT source_lang, target_lang, COUNT(*) FROM history
+        WHERE type NOT LIKE '%landmark%' GROUP BY source_lang, target_lang
+        ''')
+        total = cursor.execute('SELECT COALESCE(SUM(requests), 0) FROM stats_daily').fetchone()[0]
+        conn.commit()
+        return total
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    if sys.argv[1:] != ['rebuild-stats']:
+        print("python database.py rebuild-stats - пересчёт статистики по истории")
+        sys.exit(1)
+    start = time.perf_counter()
+    total = rebuild_stats()
+    print(f"✅ Статистика пересчитана: записей истории {total}, "
+          f"{time.perf_counter() - start:.1f} с")
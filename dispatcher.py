@@ -0,0 +1,251 @@
+import threading
+import queue
+import time
+import logging
+from collections import deque
+
+from ratelimit import FairQueue, fair_position
+from metrics import ERRORS
+
+logger = logging.getLogger(__name__)
+
+# полосы обработки
+HEAVY = 'heavy'   # фото / OCR
+LIGHT = 'light'   # текст, команды, callback
+
+
+def update_chat_id(update):
+    """Чат, к которому относится апдейт (для сохранения порядка)"""
+    message = update.message or update.edited_message
+    if message is not None:
+        return message.chat.id
+    if update.callback_query is not None:
+        call = update.callback_query
+        if call.message is not None:
+            return call.message.chat.id
+        return call.from_user.id
+    return None
+
+
+def update_user_id(update):
+    """Автор апдейта"""
+    message = update.message or update.edited_message
+    if message is not None and message.from_user is not None:
+        return message.from_user.id
+    if update.callback_query is not None:
+        return update.callback_query.from_user.id
+    return None
+
+
+def classify_update(update):
+    """Тяжёлый (фото) или лёгкий апдейт"""
+    message = update.message or update.edited_message
+    if message is not None and message.content_type == 'photo':
+        return HEAVY
+    return LIGHT
+
+
+class WorkerPool:
+    """Пул потоков с общей очередью задач (fair=True - по кругу по ключам)"""
+
+    def __init__(self, name, size, fair=False):
+        self.name = name
+        self.size = size
+        self.fair = fair
+        self._queue = FairQueue() if fair else queue.Queue()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.size):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def put(self, task, key=None, not_before=0.0):
+        if self.fair:
+            self._queue.put(task, key, not_before)
+        else:
+            self._queue.put(task)
+
+    def stop(self):
+        for _ in self._threads:
+            self.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            try:
+                task()
+            except Exception as e:
+                logger.error(f"Ошибка в пуле {self.name}: {e}")
+
+
+class Dispatcher:
+    """
+    Распределение апдейтов между пулами обработчиков
+
+    Тяжёлые апдейты (фото) и лёгкие (текст, команды, callback) выполняются
+    в разных пулах, поэтому OCR не занимает потоки текстовых обработчиков.
+    Апдейты одного чата выполняются строго по очереди, в порядке поступления.
+    Число принятых, но не выполненных апдейтов каждой полосы ограничено.
+
+    Тяжёлые задачи раздаются по кругу между пользователями, чтобы один
+    активный пользователь не занимал OCR целиком. Если пользователь или чат
+    превысил свой лимит (token bucket), апдейт откладывается до появления
+    токенов (остальные пользователи обслуживаются в это время), а on_queued
+    сообщает примерную позицию; сверх user_queue_limit ожидающих фото апдейт
+    отклоняется.
+    """
+
+    def __init__(self, handle, heavy_workers=2, light_workers=8,
+                 heavy_queue_limit=50, light_queue_limit=500, on_reject=None,
+                 user_limiter=None, chat_limiter=None, user_queue_limit=None, on_queued=None):
+        self.handle = handle
+        self.on_reject = on_reject
+        self.on_queued = on_queued
+        self.user_limiter = user_limiter
+        self.chat_limiter = chat_limiter
+        self.user_queue_limit = user_queue_limit
+        self.pools = {
+            HEAVY: WorkerPool('heavy', heavy_workers, fair=True),
+            LIGHT: WorkerPool('light', light_workers),
+        }
+        self.limits = {HEAVY: heavy_queue_limit, LIGHT: light_queue_limit}
+        self.pending = {HEAVY: 0, LIGHT: 0}
+        self.user_pending = {}
+        self._chats = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        for pool in self.pools.values():
+            pool.start()
+
+    def stop(self):
+        for pool in self.pools.values():
+            pool.stop()
+
+    def submit(self, update):
+        """Постановка апдейта в очередь; False, если полоса переполнена"""
+        lane = classify_update(update)
+        chat_id = update_chat_id(update)
+        user_id = update_user_id(update)
+
+        position = None
+        with self._lock:
+            if self.pending[lane] >= self.limits[lane]:
+                rejected = True
+            elif (lane == HEAVY and self.user_queue_limit is not None
+                  and self.user_pending.get(user_id, 0) >= self.user_queue_limit):
+                rejected = True
+            else:
+                rejected = False
+                self.pending[lane] += 1
+                not_before = 0.0
+                if lane == HEAVY:
+                    delay = self._throttle(user_id, chat_id)
+                    if delay:
+                        not_before = time.monotonic() + delay
+                        position = fair_position(self.user_pending, user_id)
+                    self.user_pending[user_id] = self.user_pending.get(user_id, 0) + 1
+                if chat_id is None:
+                    # без чата порядок не важен
+                    self.pools[lane].put(lambda: self._run_single(lane, user_id, update), user_id,
+                                         not_before)
+                elif chat_id in self._chats:
+                    # чат уже обрабатывается: ждём своей очереди
+                    self._chats[chat_id].append((lane, user_id, update, not_before))
+                else:
+                    self._chats[chat_id] = deque([(lane, user_id, update, not_before)])
+                    self.pools[lane].put(lambda: self._run_chat(chat_id), user_id, not_before)
+
+        if position is not None and self.on_queued:
+            try:
+                self.on_queued(update, position)
+            except Exception as e:
+                logger.error(f"Ошибка уведомления об очереди: {e}")
+
+        if rejected:
+            logger.warning(f"Очередь {lane} переполнена, апдейт {update.update_id} отклонён")
+            if self.on_reject:
+                try:
+                    self.on_reject(update, lane)
+                except Exception as e:
+                    logger.error(f"Ошибка уведомления о перегрузке: {e}")
+            return False
+        return True
+
+    def _throttle(self, user_id, chat_id):
+        """Задержка фото сверх лимитов пользователя и чата (секунды, 0 - без задержки)"""
+        # токены резервируются только у принятых апдейтов и с обоих лимитов:
+        # отложенные фото выполняются с темпом лимита, а не пачкой
+        delay = 0.0
+        if self.user_limiter is not None:
+            delay = self.user_limiter.reserve(user_id)
+        if self.chat_limiter is not None:
+            delay = max(delay, self.chat_limiter.reserve(chat_id))
+        return delay
+
+    def depth(self, lane):
+        """Число принятых, но ещё не обработанных апдейтов полосы"""
+        return self.pending[lane]
+
+    def _execute(self, update):
+        try:
+            self.handle(update)
+        except Exception as e:
+            logger.error(f"Ошибка обработки апдейта {update.update_id}: {e}")
+            ERRORS.inc(stage='handler')
+
+    def _done(self, lane, user_id):
+        self.pending[lane] -= 1
+        if lane == HEAVY:
+            self.user_pending[user_id] -= 1
+            if not self.user_pending[user_id]:
+                del self.user_pending[user_id]
+
+    def _run_single(self, lane, user_id, update):
+        try:
+            self._execute(update)
+        finally:
+            with self._lock:
+                self._done(lane, user_id)
+
+    def _run_chat(self, chat_id):
+        with self._lock:
+            lane, user_id, update, _ = self._chats[chat_id][0]
+        try:
+            self._execute(update)
+        finally:
+            with self._lock:
+                self._done(lane, user_id)
+                chat_queue = self._chats[chat_id]
+                chat_queue.popleft()
+                if chat_queue:
+                    # следующий апдейт чата уходит в пул своей полосы
+                    next_lane, next_user, _, not_before = chat_queue[0]
+                    self.pools[next_lane].put(lambda: self._run_chat(chat_id), next_user,
+                                              not_before)
+                else:
+                    del self._chats[chat_id]
+
+
+def run_polling(bot, dispatcher, timeout=20, stop_event=None):
+    """Long polling: получение апдейтов и передача в диспетчер"""
+    offset = None
+    while stop_event is None or not stop_event.is_set():
+        try:
+            updates = bot.get_updates(offset=offset, timeout=timeout,
+                                      long_polling_timeout=timeout)
+        except Exception as e:
+            logger.error(f"Ошибка получения апдейтов: {e}")
+            time.sleep(3)
+            continue
+
+        for update in updates:
+            offset = update.update_id + 1
+            dispatcher.submit(update)
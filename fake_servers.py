@@ -0,0 +1,346 @@
+import json
+import queue
+import re
+import threading
+import time
+import logging
+import urllib.error
+import urllib.request
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, urljoin, parse_qs, parse_qsl
+
+logger = logging.getLogger(__name__)
+
+# локальные заглушки внешних сервисов для бенчмарков и нагрузочных тестов
+
+
+def guess_lang(text):
+    """Грубое определение языка по алфавиту"""
+    if re.search('[぀-ヿ]', text):
+        return 'ja'
+    if re.search('[가-힯]', text):
+        return 'ko'
+    if re.search('[一-鿿]', text):
+        return 'zh-cn'
+    if re.search('[а-яё]', text, re.IGNORECASE):
+        return 'ru'
+    return 'en'
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+
+    server_version = "fake"
+
+    def _reply(self, status, body, content_type='application/json'):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class TranslateHandler(_QuietHandler):
+    """translate_a/single в формате client=gtx"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/translate_a/single':
+            self._reply(404, '{}')
+            return
+        params = parse_qs(url.query)
+        text = params.get('q', [''])[0]
+        dest = params.get('tl', ['en'])[0]
+        src = params.get('sl', ['auto'])[0]
+        if src == 'auto':
+            src = guess_lang(text)
+
+        server = self.server
+        if server.delay:
+            time.sleep(server.delay)
+        with server.lock:
+            server.requests += 1
+
+        translated = f"[{dest}] {text}"
+        data = [[[translated, text, None, None, 10]], None, src, None, None, None, 0.95]
+        self._reply(200, json.dumps(data, ensure_ascii=False))
+
+
+class FakeServer(ThreadingHTTPServer):
+    """HTTP-заглушка в фоновом потоке"""
+
+    daemon_threads = True
+
+    def __init__(self, handler, host='127.0.0.1', port=0):
+        super().__init__((host, port), handler)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name=type(self).__name__,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeTranslateServer(FakeServer):
+    """Переводчик: отвечает '[язык] текст' с заданной задержкой (секунды)"""
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0):
+        super().__init__(TranslateHandler, host, port)
+        self.delay = delay
+
+
+# Bot API
+
+BOT_USER = {'id': 1000, 'is_bot': True, 'first_name': 'LangHelper', 'username': 'langhelper_bot'}
+
+BOT_PATH = re.compile(r'^/bot(?P<token>[^/]+)/(?P<method>\w+)$')
+FILE_PATH = re.compile(r'^/file/bot(?P<token>[^/]+)/(?P<path>.+)$')
+
+
+class BotApiHandler(_QuietHandler):
+    """Методы Bot API, которыми пользуется бот, и скачивание файлов"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        match = FILE_PATH.match(url.path)
+        if match:
+            content = self.server.files.get(match.group('path'))
+            if content is None:
+                self._reply(404, 'not found', 'text/plain')
+            else:
+                self._reply(200, content, 'application/octet-stream')
+            return
+        self._api(url, b'')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self._api(urlparse(self.path), self.rfile.read(length) if length else b'')
+
+    def _params(self, url, body):
+        params = dict(parse_qsl(url.query))
+        content_type = self.headers.get('Content-Type', '')
+        if body and content_type.startswith('application/json'):
+            params.update(json.loads(body))
+        elif body and content_type.startswith('application/x-www-form-urlencoded'):
+            params.update(parse_qsl(body.decode('utf-8')))
+        elif body and content_type.startswith('multipart/form-data'):
+            # sendDocument и т.п.: содержимое файлов не нужно, только текстовые поля
+            message = BytesParser(policy=HTTP).parsebytes(
+                b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+            for part in message.iter_parts():
+                name = part.get_param('name', header='content-disposition')
+                if part.get_filename() is None:
+                    params[name] = part.get_content()
+                else:
+                    params[name] = part.get_filename()
+        return params
+
+    def _api(self, url, body):
+        match = BOT_PATH.match(url.path)
+        if not match:
+            self._reply(404, json.dumps({'ok': False, 'error_code': 404,
+                                         'description': 'Not Found'}))
+            return
+        method = match.group('method')
+        params = self._params(url, body)
+        handler = getattr(self.server, 'api_' + method, None)
+        result = handler(params) if handler else True
+        self._reply(200, json.dumps({'ok': True, 'result': result}, ensure_ascii=False))
+
+
+class FakeBotApiServer(FakeServer):
+    """
+    Заглушка Bot API
+
+    Апдейты кладутся через push_update и отдаются getUpdates (long polling)
+    или, если задан webhook_url, отправляются боту POST-запросом с заголовком
+    X-Telegram-Bot-Api-Secret-Token, как это делает Telegram. Файлы - через
+    add_file. Исходящие сообщения бота (sendMessage, editMessageText)
+    записываются в sent и передаются в on_message.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, on_message=None, webhook_url=None,
+                 webhook_secret='', webhook_connections=4):
+        super().__init__(BotApiHandler, host, port)
+        self.on_message = on_message
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.webhook_connections = webhook_connections
+        self.webhook_errors = 0
+        self._outgoing = queue.Queue()
+        self.files = {}
+        self.file_paths = {}
+        self.sent = []
+        self.polling = threading.Event()
+        self._updates = []
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._cond = threading.Condition(self.lock)
+
+    def start(self):
+        super().start()
+        if self.webhook_url:
+            # как max_connections у Telegram: несколько одновременных доставок
+            for i in range(self.webhook_connections):
+                threading.Thread(target=self._deliver, name=f"webhook-push-{i}",
+                                 daemon=True).start()
+        return self
+
+    def stop(self):
+        for _ in range(self.webhook_connections if self.webhook_url else 0):
+            self._outgoing.put(None)
+        super().stop()
+
+    def wait_ready(self, timeout):
+        """Ожидание готовности бота: первый getUpdates или 200 от /readyz"""
+        if not self.webhook_url:
+            return self.polling.wait(timeout)
+        readyz = urljoin(self.webhook_url, '/readyz')
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                with urllib.request.urlopen(readyz, timeout=1) as response:
+                    if response.status == 200:
+                        return True
+            except OSError:
+                pass
+            time.sleep(0.2)
+        return False
+
+    # наполнение
+
+    def add_file(self, file_id, content):
+        path = f"photos/{file_id}.jpg"
+        with self.lock:
+            self.file_paths[file_id] = path
+            self.files[path] = content
+        return path
+
+    def push_update(self, update):
+        """Апдейт без update_id; возвращает присвоенный id"""
+        with self._cond:
+            update = dict(update, update_id=self._next_update_id)
+            self._next_update_id += 1
+            if self.webhook_url:
+                self._outgoing.put(update)
+            else:
+                self._updates.append(update)
+                self._cond.notify_all()
+        return update['update_id']
+
+    def _deliver(self):
+        """Доставка апдейтов на webhook; при сбое - повтор, как у Telegram"""
+        while True:
+            update = self._outgoing.get()
+            if update is None:
+                return
+            if not self._post_update(update):
+                with self.lock:
+                    self.webhook_errors += 1
+
+    def _post_update(self, update):
+        body = json.dumps(update, ensure_ascii=False).encode('utf-8')
+        headers = {'Content-Type': 'application/json',
+                   'X-Telegram-Bot-Api-Secret-Token': self.webhook_secret}
+        for attempt in range(5):
+            request = urllib.request.Request(self.webhook_url, data=body, headers=headers,
+                                             method='POST')
+            try:
+                with urllib.request.urlopen(request, timeout=10):
+                    return True
+            except urllib.error.HTTPError as e:
+                if e.code < 500:
+                    # 403 (неверный секрет) и прочие 4xx не повторяем
+                    logger.error(f"Webhook отклонил апдейт {update['update_id']}: {e.code}")
+                    return False
+            except OSError:
+                pass
+            time.sleep(0.5 * 2 ** attempt)
+        logger.error(f"Апдейт {update['update_id']} не доставлен на webhook")
+        return False
+
+    def next_message_id(self):
+        with self.lock:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+        return message_id
+
+    # методы API
+
+    def api_getMe(self, params):
+        return BOT_USER
+
+    def api_getUpdates(self, params):
+        self.polling.set()
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = float(params.get('timeout') or 0)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            # подтверждённые апдейты больше не нужны
+            self._updates = [update for update in self._updates if update['update_id'] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            return self._updates[:limit]
+
+    def api_getFile(self, params):
+        file_id = params.get('file_id')
+        with self.lock:
+            path = self.file_paths.get(file_id)
+            size = len(self.files.get(path, b''))
+        return {'file_id': file_id, 'file_unique_id': file_id, 'file_size': size,
+                'file_path': path}
+
+    def _message(self, chat_id, text, message_id=None):
+        return {'message_id': message_id or self.next_message_id(), 'date': int(time.time()),
+                'chat': {'id': int(chat_id), 'type': 'private' if int(chat_id) > 0 else 'group'},
+                'from': BOT_USER, 'text': text}
+
+    def _record(self, method, params, message):
+        reply_to = params.get('reply_to_message_id')
+        if params.get('reply_parameters'):
+            reply_to = json.loads(params['reply_parameters']).get('message_id')
+        record = {'time': time.monotonic(), 'method': method, 'chat_id': int(params['chat_id']),
+                  'message_id': message['message_id'],
+                  'text': params.get('text') or params.get('caption') or '',
+                  'reply_to': int(reply_to) if reply_to else None}
+        with self.lock:
+            self.sent.append(record)
+        if self.on_message:
+            self.on_message(record)
+
+    def api_sendMessage(self, params):
+        message = self._message(params['chat_id'], params.get('text', ''))
+        self._record('sendMessage', params, message)
+        return message
+
+    def api_editMessageText(self, params):
+        message = self._message(params['chat_id'], params.get('text', ''),
+                                int(params['message_id']))
+        self._record('editMessageText', params, message)
+        return message
+
+    def api_sendDocument(self, params):
+        message = self._message(params['chat_id'], params.get('caption', ''))
+        message['document'] = {'file_id': 'document', 'file_unique_id': 'document',
+                               'file_name': params.get('document')}
+        self._record('sendDocument', params, message)
+        return message
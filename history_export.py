@@ -0,0 +1,54 @@
+import io
+import os
+import csv
+import gzip
+import json
+import tempfile
+import logging
+
+from database import iter_history, HISTORY_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# выгрузка истории пользователя в CSV или JSONL, сразу в gzip
+#
+# Строки идут из курсора бд через генератор в сжатый временный файл,
+# поэтому память не зависит от размера истории.
+
+FORMATS = ('csv', 'jsonl')
+
+
+def write_history(user_id, fmt, fileobj):
+    """Запись истории в открытый бинарный файл (gzip); число строк"""
+    count = 0
+    with gzip.GzipFile(fileobj=fileobj, mode='wb') as compressed:
+        text = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+        if fmt == 'csv':
+            writer = csv.writer(text)
+            writer.writerow(HISTORY_COLUMNS)
+            for row in iter_history(user_id):
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in iter_history(user_id):
+                text.write(json.dumps(dict(zip(HISTORY_COLUMNS, row)), ensure_ascii=False))
+                text.write('\n')
+                count += 1
+        text.flush()
+        # GzipFile закрывается сам; TextIOWrapper не должен закрыть его раньше
+        text.detach()
+    return count
+
+
+def export_history(user_id, fmt='csv'):
+    """Выгрузка во временный файл: (путь, имя для пользователя, число строк)"""
+    if fmt not in FORMATS:
+        raise ValueError(f"неизвестный формат: {fmt}")
+    handle, path = tempfile.mkstemp(prefix='history-', suffix=f'.{fmt}.gz')
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            count = write_history(user_id, fmt, f)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, f"history-{user_id}.{fmt}.gz", count
@@ -0,0 +1,267 @@
+import json
+import time
+import uuid
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Очередь задач с арендой (lease/ack/retry)
+#
+# Исполнитель берёт задачу в аренду на visibility_timeout секунд. Пока аренда
+# действует, задачу не видят другие исполнители; подтверждение (ack) или
+# отказ (fail) принимаются только с токеном текущей аренды. Если исполнитель
+# пропал, по истечении аренды задача снова становится доступной, пока не
+# исчерпаны попытки. Готовые и окончательно упавшие задачи забирает
+# отправитель результатов (completed); mark_delivered удаляет задачу, так что
+# всё, что лежит в таблице, ещё не отправлено, и таблица не растёт.
+
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job:
+    """Задача очереди"""
+
+    def __init__(self, id, kind, payload, status=QUEUED, attempts=0, max_attempts=3,
+                 lease_token=None, result=None, error=None, created_at=None):
+        self.id = id
+        self.kind = kind
+        self.payload = payload
+        self.status = status
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.lease_token = lease_token
+        self.result = result
+        self.error = error
+        self.created_at = created_at
+
+
+class JobBackend:
+    """Интерфейс хранилища задач; SQLite - одна из реализаций"""
+
+    def enqueue(self, kind, payload, max_attempts=3):
+        """Новая задача; возвращает её id"""
+        raise NotImplementedError
+
+    def lease(self, kinds, visibility_timeout):
+        """Аренда следующей доступной задачи одного из kinds или None"""
+        raise NotImplementedError
+
+    def extend(self, job_id, lease_token, visibility_timeout):
+        """Продление аренды; False, если аренда уже потеряна"""
+        raise NotImplementedError
+
+    def ack(self, job_id, lease_token, result):
+        """Задача выполнена; False, если аренда уже потеряна"""
+        raise NotImplementedError
+
+    def fail(self, job_id, lease_token, error, retry_delay=0):
+        """Ошибка выполнения: повтор через retry_delay или окончательный отказ"""
+        raise NotImplementedError
+
+    def expire(self, max_age):
+        """Незавершённые задачи старше max_age секунд - в отказ; число таких задач"""
+        raise NotImplementedError
+
+    def completed(self, kinds, limit=50):
+        """Готовые и упавшие задачи, результаты которых ещё не отправлены"""
+        raise NotImplementedError
+
+    def mark_delivered(self, job_id):
+        """Результат отправлен: задача больше не нужна и удаляется"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Число задач по статусам"""
+        raise NotImplementedError
+
+
+class SQLiteJobBackend(JobBackend):
+    """
+    Очередь в SQLite (можно в той же базе, что и данные бота)
+
+    Каждая операция - отдельное соединение и короткая транзакция; аренда
+    берётся под BEGIN IMMEDIATE, поэтому одну задачу не получат два
+    исполнителя даже из разных процессов.
+    """
+
+    def __init__(self, path, busy_timeout=30):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._init()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init(self):
+        conn = self._connect()
+        try:
+            # WAL: исполнители и бот читают, не блокируя запись
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                lease_token TEXT,
+                lease_until REAL,
+                available_at REAL NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, available_at)')
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _job(row):
+        return Job(row['id'], row['kind'], json.loads(row['payload']), row['status'],
+                   row['attempts'], row['max_attempts'], row['lease_token'],
+                   json.loads(row['result']) if row['result'] is not None else None,
+                   row['error'], row['created_at'])
+
+    def enqueue(self, kind, payload, max_attempts=3):
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+            INSERT INTO jobs (kind, payload, status, max_attempts, available_at, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (kind, json.dumps(payload, ensure_ascii=False), QUEUED, max_attempts, now, now, now))
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+    def lease(self, kinds, visibility_timeout):
+        now = time.time()
+        marks = ','.join('?' * len(kinds))
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            while True:
+                row = conn.execute(f'''
+                SELECT * FROM jobs
+                WHERE kind IN ({marks})
+                  AND ((status = ? AND available_at <= ?) OR (status = ? AND lease_until < ?))
+                ORDER BY id LIMIT 1
+                ''', (*kinds, QUEUED, now, LEASED, now)).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                if row['attempts'] >= row['max_attempts']:
+                    # аренда истекла на последней попытке: исполнитель пропал
+                    conn.execute('UPDATE jobs SET status = ?, error = ?, lease_token = NULL, '
+                                 'updated_at = ? WHERE id = ?',
+                                 (FAILED, 'lease expired', now, row['id']))
+                    continue
+                token = uuid.uuid4().hex
+                conn.execute('''
+                UPDATE jobs SET status = ?, attempts = attempts + 1, lease_token = ?,
+                                lease_until = ?, updated_at = ?
+                WHERE id = ?
+                ''', (LEASED, token, now + visibility_timeout, now, row['id']))
+                conn.execute('COMMIT')
+                job = self._job(row)
+                job.status = LEASED
+                job.attempts += 1
+                job.lease_token = token
+                return job
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _update_leased(self, sql, params, job_id, lease_token):
+        conn = self._connect()
+        try:
+            cursor = conn.execute(sql + ' WHERE id = ? AND status = ? AND lease_token = ?',
+                                  (*params, job_id, LEASED, lease_token))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def extend(self, job_id, lease_token, visibility_timeout):
+        now = time.time()
+        return self._update_leased('UPDATE jobs SET lease_until = ?, updated_at = ?',
+                                   (now + visibility_timeout, now), job_id, lease_token)
+
+    def ack(self, job_id, lease_token, result):
+        return self._update_leased(
+            'UPDATE jobs SET status = ?, result = ?, lease_token = NULL, updated_at = ?',
+            (DONE, json.dumps(result, ensure_ascii=False), time.time()), job_id, lease_token)
+
+    def fail(self, job_id, lease_token, error, retry_delay=0):
+        now = time.time()
+        return self._update_leased('''
+            UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END,
+                            available_at = ?, error = ?, lease_token = NULL, updated_at = ?''',
+            (FAILED, QUEUED, now + retry_delay, str(error)[:500], now), job_id, lease_token)
+
+    def expire(self, max_age):
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+            UPDATE jobs SET status = ?, error = ?, lease_token = NULL, updated_at = ?
+            WHERE status IN (?, ?) AND created_at < ?
+            ''', (FAILED, 'expired', now, QUEUED, LEASED, now - max_age))
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def completed(self, kinds, limit=50):
+        marks = ','.join('?' * len(kinds))
+        conn = self._connect()
+        try:
+            rows = conn.execute(f'''
+            SELECT * FROM jobs
+            WHERE status IN (?, ?) AND kind IN ({marks})
+            ORDER BY id LIMIT ?
+            ''', (DONE, FAILED, *kinds, limit)).fetchall()
+            return [self._job(row) for row in rows]
+        finally:
+            conn.close()
+
+    def mark_delivered(self, job_id):
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+        finally:
+            conn.close()
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+            return {status: count for status, count in rows}
+        finally:
+            conn.close()
+
+
+def create_backend(url):
+    """
+    Хранилище по адресу: sqlite:///путь/к/базе или sqlite (база бота)
+
+    Сетевые хранилища подключаются здесь же, под своей схемой адреса.
+    """
+    scheme, _, rest = url.partition('://')
+    if scheme == 'sqlite':
+        if not rest:
+            from database import DB_FILE
+            return SQLiteJobBackend(DB_FILE)
+        # sqlite:///data/jobs.db -> /data/jobs.db, sqlite://jobs.db -> jobs.db
+        return SQLiteJobBackend(rest)
+    raise ValueError(f"неизвестное хранилище задач: {url}")
@@ -0,0 +1,227 @@
+import sqlite3
+import threading
+import hashlib
+import time
+import logging
+
+from landmarks import get_index
+from metrics import CACHE_REQUESTS
+from messages import escape_markdown
+from ratelimit import TokenBucket
+from resilience import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+# язык, на котором написан каталог
+SOURCE_LANG = 'ru'
+
+# поля карточки, которые переводятся
+TRANSLATED_FIELDS = ('name', 'description', 'fact')
+
+# шаблоны карточек (подписи - из CARD_LABELS на языке карточки)
+
+TEXT_CARD = """
+🏛️ **{title_text}**
+
+**{name}**
+{description}
+
+{fact}
+
+📌 {en_name_label}: {en_name}
+
+💡 *{hint}*
+"""
+
+PHOTO_CARD = """
+🏛️ **{title_photo}**
+
+**{name}**
+{description}
+
+{fact}
+"""
+
+# подписи карточек по языкам перевода (messages.LANGUAGES); переведены
+# заранее, а не переводчиком: в них нет разметки, которую он мог бы сломать
+CARD_LABELS = {
+    'ru': ("Достопримечательность найдена!", "Найдена достопримечательность!",
+           "Английское название", "Можете также отправить фото с названием этой достопримечательности"),
+    'en': ("Landmark found!", "Landmark found!",
+           "English name", "You can also send a photo with the name of this landmark"),
+    'de': ("Sehenswürdigkeit gefunden!", "Sehenswürdigkeit gefunden!",
+           "Englischer Name", "Sie können auch ein Foto mit dem Namen dieser Sehenswürdigkeit senden"),
+    'fr': ("Monument trouvé !", "Monument trouvé !",
+           "Nom anglais", "Vous pouvez aussi envoyer une photo avec le nom de ce monument"),
+    'es': ("¡Lugar de interés encontrado!", "¡Lugar de interés encontrado!",
+           "Nombre en inglés", "También puede enviar una foto con el nombre de este lugar"),
+    'ja': ("名所が見つかりました！", "名所が見つかりました！",
+           "英語名", "この名所の名前が写った写真を送ることもできます"),
+    'ko': ("명소를 찾았습니다!", "명소를 찾았습니다!",
+           "영어 이름", "이 명소의 이름이 있는 사진을 보낼 수도 있습니다"),
+    'it': ("Attrazione trovata!", "Attrazione trovata!",
+           "Nome inglese", "Puoi anche inviare una foto con il nome di questa attrazione"),
+    'pt': ("Ponto turístico encontrado!", "Ponto turístico encontrado!",
+           "Nome em inglês", "Você também pode enviar uma foto com o nome deste ponto turístico"),
+    'ar': ("تم العثور على معلم سياحي!", "تم العثور على معلم سياحي!",
+           "الاسم بالإنجليزية", "يمكنك أيضًا إرسال صورة تحمل اسم هذا المعلم"),
+    'tr': ("Turistik yer bulundu!", "Turistik yer bulundu!",
+           "İngilizce adı", "Bu yerin adının yazdığı bir fotoğraf da gönderebilirsiniz"),
+    'zh-cn': ("找到名胜古迹！", "找到名胜古迹！",
+              "英文名称", "您也可以发送带有该名胜名称的照片"),
+}
+
+
+def render_card(kind, info, lang, fields):
+    """
+    Карточка ('text' или 'photo') с полями fields и подписями языка lang
+
+    Поля экранируются: перевод может содержать символы разметки Markdown,
+    и тогда Telegram не принял бы сообщение.
+    """
+    title_text, title_photo, en_name_label, hint = CARD_LABELS.get(lang, CARD_LABELS['en'])
+    values = {field: escape_markdown(fields[field]) for field in TRANSLATED_FIELDS}
+    values.update(en_name=escape_markdown(info['en_name']), title_text=title_text,
+                  title_photo=title_photo, en_name_label=en_name_label, hint=hint)
+    template = TEXT_CARD if kind == 'text' else PHOTO_CARD
+    return template.format(**values)
+
+
+def source_hash(info):
+    """Хэш исходных полей карточки (для инвалидации переводов)"""
+    raw = '\x00'.join(info[field] for field in TRANSLATED_FIELDS)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class LandmarkCardCache:
+    """Готовые карточки достопримечательностей для каждого языка перевода"""
+
+    def __init__(self, db_file, translator, languages, breaker=None, rate=2.0):
+        self.db_file = db_file
+        self.translator = translator
+        self.languages = [lang for lang in languages if lang != SOURCE_LANG]
+        # прогрев идёт через предохранитель переводчика и не чаще rate запросов
+        # в секунду: перевод карточек не должен мешать ответам пользователям
+        self.breaker = breaker
+        self._bucket = TokenBucket(rate, 1)
+        self._cards = {}
+        self._thread = None
+        self._pending = False
+        self._lock = threading.Lock()
+
+    def get(self, kind, info, lang):
+        """Готовая карточка ('text' или 'photo'); пока перевода нет — русская"""
+        cards = self._cards
+        card = cards.get((kind, info['key'], lang))
+        CACHE_REQUESTS.inc(cache='landmark_cards', result='miss' if card is None else 'hit')
+        if card is None:
+            card = cards.get((kind, info['key'], SOURCE_LANG))
+        if card is None:
+            # каталог только что перезагрузили, карточки ещё пересобираются
+            card = render_card(kind, info, SOURCE_LANG, info)
+        return card
+
+    def load(self, index=None):
+        """Рендер русских карточек и загрузка сохранённых переводов"""
+        infos = (index or get_index()).infos
+        cards = {}
+        for info in infos.values():
+            self._render(cards, info, SOURCE_LANG, info)
+
+        try:
+            conn = sqlite3.connect(self.db_file)
+            cursor = conn.cursor()
+            cursor.execute('''
+            SELECT landmark_key, lang, source_hash, name, description, fact
+            FROM landmark_cards
+            ''')
+            rows = cursor.fetchall()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Ошибка загрузки карточек: {e}")
+            rows = []
+
+        loaded = 0
+        for key, lang, hash_, name, description, fact in rows:
+            info = infos.get(key)
+            if info is None or source_hash(info) != hash_:
+                continue
+            self._render(cards, info, lang, {'name': name, 'description': description, 'fact': fact})
+            loaded += 1
+
+        # подменяем словарь целиком, чтобы поиск не видел полусобранный набор
+        self._cards = cards
+        logger.info(f"Карточки достопримечательностей: {loaded} переводов из кэша")
+
+    def reload(self, index):
+        """Пересборка карточек после перезагрузки каталога"""
+        self.load(index)
+        self.start_warmup()
+
+    def start_warmup(self):
+        """Фоновый перевод недостающих карточек"""
+        with self._lock:
+            self._pending = True
+            if self._thread is not None:
+                # поток прогрева ещё не вышел: он увидит _pending и сделает новый проход
+                return
+            self._thread = threading.Thread(target=self._warmup, name="card-warmup", daemon=True)
+            self._thread.start()
+
+    def _render(self, cards, info, lang, fields):
+        """Подстановка полей в шаблоны"""
+        cards[('text', info['key'], lang)] = render_card('text', info, lang, fields)
+        cards[('photo', info['key'], lang)] = render_card('photo', info, lang, fields)
+
+    def _warmup(self):
+        # повторяем проход, если каталог перезагрузили во время прогрева
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                self._pending = False
+            if not self._warmup_pass(get_index()):
+                # переводчик отключён предохранителем: ждём и повторяем проход
+                with self._lock:
+                    self._pending = True
+                time.sleep(self.breaker.reset_timeout)
+
+    def _translate(self, text, lang):
+        while not self._bucket.try_acquire():
+            time.sleep(self._bucket.wait_time())
+        if self.breaker is None:
+            return self.translator.translate(text, src=SOURCE_LANG, dest=lang)
+        return self.breaker.call(self.translator.translate, text, src=SOURCE_LANG, dest=lang)
+
+    def _warmup_pass(self, index):
+        """Один проход по недостающим карточкам; False - прерван предохранителем"""
+        translated = 0
+        for lang in self.languages:
+            for info in index.infos.values():
+                if ('text', info['key'], lang) in self._cards:
+                    continue
+                try:
+                    fields = {}
+                    for field in TRANSLATED_FIELDS:
+                        fields[field] = self._translate(info[field], lang).text
+                    self._save(info, lang, fields)
+                    self._render(self._cards, info, lang, fields)
+                    translated += 1
+                except CircuitOpenError:
+                    logger.warning(f"Прогрев карточек приостановлен, переведено: {translated}")
+                    return False
+                except Exception as e:
+                    logger.error(f"Ошибка перевода карточки {info['key']} ({lang}): {e}")
+        logger.info(f"Прогрев карточек завершён, переведено: {translated}")
+        return True
+
+    def _save(self, info, lang, fields):
+        conn = sqlite3.connect(self.db_file)
+        cursor = conn.cursor()
+        cursor.execute('''
+        INSERT OR REPLACE INTO landmark_cards (landmark_key, lang, source_hash, name, description, fact)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', (info['key'], lang, source_hash(info), fields['name'], fields['description'], fields['fact']))
+        conn.commit()
+        conn.close()
@@ -1,390 +1,133 @@
 import re
+import os
+import json
+import threading
+import time
 import logging
 
-logger = logging.getLogger(__name__)
-
-# cЛоварь достопримечательности
-
-LANDMARKS_RU = {
-    # россия
-    'красная площадь': {
-        'name': 'Красная площадь',
-        'description': 'Главная площадь Москвы, исторический и культурный центр России. Расположена у стен Московского Кремля.',
-        'en_name': 'Red Square'
-    },
-    'кремль': {
-        'name': 'Московский Кремль',
-        'description': 'Исторический крепостной комплекс в центре Москвы, официальная резиденция президента Российской Федерации.',
-        'en_name': 'Moscow Kremlin'
-    },
-    'эрмитаж': {
-        'name': 'Государственный Эрмитаж',
-        'description': 'Один из крупнейших художественных музеев мира, расположен в Санкт-Петербурге в комплексе зданий на Дворцовой набережной.',
-        'en_name': 'Hermitage Museum'
-    },
-    'петергоф': {
-        'name': 'Петергоф',
-        'description': 'Дворцово-парковый ансамбль на южном берегу Финского залива, знаменит своими фонтанами и садами.',
-        'en_name': 'Peterhof Palace'
-    },
-    'собор василия блаженного': {
-        'name': 'Собор Василия Блаженного',
-        'description': 'Православный храм на Красной площади, один из самых узнаваемых символов России.',
-        'en_name': "Saint Basil's Cathedral"
-    },
-    'большой театр': {
-        'name': 'Большой театр',
-        'description': 'Один из крупнейших в России и один из самых значительных в мире театров оперы и балета.',
-        'en_name': 'Bolshoi Theatre'
-    },
-    'третьяковская галерея': {
-        'name': 'Третьяковская галерея',
-        'description': 'Главный музей русского национального искусства, отражающий его уникальный вклад в мировую культуру.',
-        'en_name': 'Tretyakov Gallery'
-    },
-    'мавзолей ленина': {
-        'name': 'Мавзолей В.И. Ленина',
-        'description': 'Памятник-усыпальница на Красной площади, где находится забальзамированное тело Владимира Ленина.',
-        'en_name': "Lenin's Mausoleum"
-    },
-    'останкинская башня': {
-        'name': 'Останкинская телебашня',
-        'description': 'Телевизионная и радиовещательная башня в Москве, самое высокое сооружение в Европе.',
-        'en_name': 'Ostankino Tower'
-    },
-    'храм христа спасителя': {
-        'name': 'Храм Христа Спасителя',
-        'description': 'Кафедральный собор Русской православной церкви, расположен в Москве на левом берегу Москвы-реки.',
-        'en_name': 'Cathedral of Christ the Saviour'
-    },
-
-    # европа
-    'эйфелева башня': {
-        'name': 'Эйфелева башня',
-        'description': 'Металлическая башня в центре Парижа, самая посещаемая и узнаваемая достопримечательность в мире.',
-        'en_name': 'Eiffel Tower'
-    },
-    'лувр': {
-        'name': 'Лувр',
-        'description': 'Крупнейший художественный музей мира, расположен в Париже. Известен стеклянной пирамидой у входа.',
-        'en_name': 'Louvre Museum'
-    },
-    'колизей': {
-        'name': 'Колизей',
-        'description': 'Амфитеатр в Риме, одно из самых грандиозных сооружений Древнего мира, символ Римской империи.',
-        'en_name': 'Colosseum'
-    },
-    'биг бен': {
-        'name': 'Биг-Бен',
-        'description': 'Часовая башня Вестминстерского дворца в Лондоне, один из самых узнаваемых символов Великобритании.',
-        'en_name': 'Big Ben'
-    },
-    'римский форум': {
-        'name': 'Римский форум',
-        'description': 'Площадь в центре Древнего Рима вместе с прилегающими зданиями, центр общественной жизни города.',
-        'en_name': 'Roman Forum'
-    },
-    'пизанская башня': {
-        'name': 'Пизанская башня',
-        'description': 'Колокольная башня в городе Пиза, получившая всемирную известность благодаря непреднамеренному наклону.',
-        'en_name': 'Leaning Tower of Pisa'
-    },
-    'акрополь': {
-        'name': 'Афинский Акрополь',
-        'description': 'Акрополь в Афинах — скалистый холм высотой 156 метров с храмом Парфенон, символ древнегреческой цивилизации.',
-        'en_name': 'Acropolis of Athens'
-    },
-    'собор парижской богоматери': {
-        'name': 'Собор Парижской Богоматери',
-        'description': 'Католический храм в Париже, один из самых известных памятников архитектуры в мире.',
-        'en_name': 'Notre-Dame de Paris'
-    },
-    'букингемский дворец': {
-        'name': 'Букингемский дворец',
-        'description': 'Официальная лондонская резиденция британских монархов и место проведения многих официальных мероприятий.',
-        'en_name': 'Buckingham Palace'
-    },
-    'прага замок': {
-        'name': 'Пражский Град',
-        'description': 'Крепость в Праге, резиденция президента Чехии, самый большой замковый комплекс в мире.',
-        'en_name': 'Prague Castle'
-    },
-
-    # америка
-    'статуя свободы': {
-        'name': 'Статуя Свободы',
-        'description': 'Колоссальная скульптура в Нью-Йоркской гавани, подарок французского народа США.',
-        'en_name': 'Statue of Liberty'
-    },
-    'белый дом': {
-        'name': 'Белый дом',
-        'description': 'Официальная резиденция президента США, расположена в Вашингтоне. Символ американской демократии.',
-        'en_name': 'White House'
-    },
-    'гора рашмор': {
-        'name': 'Гора Рашмор',
-        'description': 'Национальный мемориал в Южной Дакоте, на котором высечены портреты четырёх президентов США.',
-        'en_name': 'Mount Rushmore'
-    },
-    'ниагарский водопад': {
-        'name': 'Ниагарский водопад',
-        'description': 'Комплекс водопадов на реке Ниагара на границе США и Канады, один из самых известных водопадов в мире.',
-        'en_name': 'Niagara Falls'
-    },
-    'опера сидней': {
-        'name': 'Сиднейский оперный театр',
-        'description': 'Музыкальный театр в Сиднее, одно из наиболее известных и легко узнаваемых зданий мира.',
-        'en_name': 'Sydney Opera House'
-    },
-    'золотые ворота': {
-        'name': 'Мост Золотые Ворота',
-        'description': 'Висячий мост через пролив Золотые Ворота в Сан-Франциско, один из символов США.',
-        'en_name': 'Golden Gate Bridge'
-    },
-    'башня си эн': {
-        'name': 'Си-Эн Тауэр',
-        'description': 'Телебашня в Торонто, самое высокое свободно стоящее сооружение в Западном полушарии.',
-        'en_name': 'CN Tower'
-    },
-    'рио статуя': {
-        'name': 'Статуя Христа-Искупителя',
-        'description': 'Знаменитая статуя Иисуса Христа в Рио-де-Жанейро, одно из новых семи чудес света.',
-        'en_name': 'Christ the Redeemer'
-    },
-    'мачу пикчу': {
-        'name': 'Мачу-Пикчу',
-        'description': 'Древний город инков в Перу, расположенный на вершине горного хребта на высоте 2450 метров.',
-        'en_name': 'Machu Picchu'
-    },
+from metrics import STAGE_SECONDS, timed
 
-    # азия
-    'великая китайская стена': {
-        'name': 'Великая Китайская стена',
-        'description': 'Крупнейший памятник архитектуры, оборонительное сооружение в Северном Китае, одно из новых семи чудес света.',
-        'en_name': 'Great Wall of China'
-    },
-    'тадж махал': {
-        'name': 'Тадж-Махал',
-        'description': 'Мавзолей-мечеть в Индии, построенный по приказу падишаха Шах-Джахана в память о жене Мумтаз-Махал.',
-        'en_name': 'Taj Mahal'
-    },
-    'фудзияма': {
-        'name': 'Фудзияма',
-        'description': 'Действующий стратовулкан на японском острове Хонсю, самая высокая гора Японии и священное место.',
-        'en_name': 'Mount Fuji'
-    },
-    'ангкор ват': {
-        'name': 'Ангкор-Ват',
-        'description': 'Гигантский храмовый комплекс в Камбодже, крупнейшее религиозное сооружение в мире.',
-        'en_name': 'Angkor Wat'
-    },
-    'бурдж халифа': {
-        'name': 'Бурдж-Халифа',
-        'description': 'Небоскрёб в Дубае, самое высокое сооружение в мире. Высота здания составляет 828 метров.',
-        'en_name': 'Burj Khalifa'
-    },
-    'петрона': {
-        'name': 'Башни Петронас',
-        'description': 'Башни-близнецы в Куала-Лумпуре, самые высокие башни-близнецы в мире (452 метра).',
-        'en_name': 'Petronas Towers'
-    },
-    'мечеть султанахмет': {
-        'name': 'Голубая мечеть',
-        'description': 'Мечеть в Стамбуле, одна из самых красивых мечетей мира, построенная в период Османской империи.',
-        'en_name': 'Sultan Ahmed Mosque'
-    },
-    'дворец тадж': {
-        'name': 'Тадж-Махал Пэлас',
-        'description': 'Роскошный отель в Мумбаи, один из самых известных отелей в мире, символ индийской роскоши.',
-        'en_name': 'Taj Mahal Palace Hotel'
-    },
-
-    # африка
-    'пирамида хеопса': {
-        'name': 'Пирамида Хеопса',
-        'description': 'Крупнейшая из египетских пирамид, единственное из Семи чудес света, сохранившееся до наших дней.',
-        'en_name': 'Great Pyramid of Giza'
-    },
-    'сфинкс': {
-        'name': 'Большой Сфинкс',
-        'description': 'Монументальная скульптура в Египте, высеченная из монолитной известковой скалы в форме лежащего льва.',
-        'en_name': 'Great Sphinx of Giza'
-    },
-    'столовая гора': {
-        'name': 'Столовая гора',
-        'description': 'Гора с плоской вершиной в Кейптауне, одна из самых узнаваемых достопримечательностей Южной Африки.',
-        'en_name': 'Table Mountain'
-    },
-    'виктория водопад': {
-        'name': 'Водопад Виктория',
-        'description': 'Водопад на реке Замбези в Южной Африке, один из крупнейших водопадов в мире.',
-        'en_name': 'Victoria Falls'
-    },
-
-    # ближний восток
-    'мечеть аль акса': {
-        'name': 'Мечеть Аль-Акса',
-        'description': 'Мечеть в Иерусалиме, третья святыня ислама после мечети Аль-Харам в Мекке и мечети Пророка в Медине.',
-        'en_name': 'Al-Aqsa Mosque'
-    },
-    'храм гроба господня': {
-        'name': 'Храм Гроба Господня',
-        'description': 'Храм в Иерусалиме, где, согласно христианской традиции, был распят, погребён и воскрес Иисус Христос.',
-        'en_name': 'Church of the Holy Sepulchre'
-    },
-    'мечеть пророка': {
-        'name': 'Мечеть Пророка',
-        'description': 'Мечеть в Медине, вторая святыня ислама, построенная пророком Мухаммедом.',
-        'en_name': "Prophet's Mosque"
-    },
-    
-    # др
-    'диснейленд': {
-        'name': 'Диснейленд',
-        'description': 'Парк развлечений в Калифорнии, первый тематический парк Уолта Диснея, открытый в 1955 году.',
-        'en_name': 'Disneyland'
-    },
-    'венеция каналы': {
-        'name': 'Венецианские каналы',
-        'description': 'Система каналов в Венеции, по которым вместо улиц движутся гондолы и другие лодки.',
-        'en_name': 'Venice Canals'
-    },
-    'бродвей': {
-        'name': 'Бродвей',
-        'description': 'Улица в Нью-Йорке, известная своими театрами и мюзиклами, центр американской театральной индустрии.',
-        'en_name': 'Broadway'
-    }
-}
-
-# англ назва
-
-LANDMARKS_EN = {
-    'eiffel tower': {'ru_name': 'Эйфелева башня', 'en_name': 'Eiffel Tower'},
-    'red square': {'ru_name': 'Красная площадь', 'en_name': 'Red Square'},
-    'big ben': {'ru_name': 'Биг-Бен', 'en_name': 'Big Ben'},
-    'statue of liberty': {'ru_name': 'Статуя Свободы', 'en_name': 'Statue of Liberty'},
-    'colosseum': {'ru_name': 'Колизей', 'en_name': 'Colosseum'},
-    'kremlin': {'ru_name': 'Кремль', 'en_name': 'Kremlin'},
-    'taj mahal': {'ru_name': 'Тадж-Махал', 'en_name': 'Taj Mahal'},
-    'great wall of china': {'ru_name': 'Великая Китайская стена', 'en_name': 'Great Wall of China'},
-    'mount fuji': {'ru_name': 'Фудзияма', 'en_name': 'Mount Fuji'},
-    'angkor wat': {'ru_name': 'Ангкор-Ват', 'en_name': 'Angkor Wat'},
-    'louvre': {'ru_name': 'Лувр', 'en_name': 'Louvre Museum'},
-    'hermitage': {'ru_name': 'Эрмитаж', 'en_name': 'Hermitage Museum'},
-    'saint basils cathedral': {'ru_name': 'Собор Василия Блаженного', 'en_name': "Saint Basil's Cathedral"},
-    'peterhof': {'ru_name': 'Петергоф', 'en_name': 'Peterhof Palace'},
-    'white house': {'ru_name': 'Белый дом', 'en_name': 'White House'},
-    'sydney opera house': {'ru_name': 'Сиднейский оперный театр', 'en_name': 'Sydney Opera House'},
-    'golden gate bridge': {'ru_name': 'Мост Золотые Ворота', 'en_name': 'Golden Gate Bridge'},
-    'mount rushmore': {'ru_name': 'Гора Рашмор', 'en_name': 'Mount Rushmore'},
-    'niagara falls': {'ru_name': 'Ниагарский водопад', 'en_name': 'Niagara Falls'},
-    'christ the redeemer': {'ru_name': 'Статуя Христа-Искупителя', 'en_name': 'Christ the Redeemer'},
-    'machu picchu': {'ru_name': 'Мачу-Пикчу', 'en_name': 'Machu Picchu'},
-    'great pyramid of giza': {'ru_name': 'Пирамида Хеопса', 'en_name': 'Great Pyramid of Giza'},
-    'acropolis': {'ru_name': 'Афинский Акрополь', 'en_name': 'Acropolis of Athens'},
-    'leaning tower of pisa': {'ru_name': 'Пизанская башня', 'en_name': 'Leaning Tower of Pisa'},
-    'notre dame': {'ru_name': 'Собор Парижской Богоматери', 'en_name': 'Notre-Dame de Paris'},
-    'buckingham palace': {'ru_name': 'Букингемский дворец', 'en_name': 'Buckingham Palace'},
-    'prague castle': {'ru_name': 'Пражский Град', 'en_name': 'Prague Castle'},
-    'roman forum': {'ru_name': 'Римский форум', 'en_name': 'Roman Forum'},
-    'cn tower': {'ru_name': 'Си-Эн Тауэр', 'en_name': 'CN Tower'},
-    'burj khalifa': {'ru_name': 'Бурдж-Халифа', 'en_name': 'Burj Khalifa'},
-    'petronas towers': {'ru_name': 'Башни Петронас', 'en_name': 'Petronas Towers'},
-    'sultan ahmed mosque': {'ru_name': 'Голубая мечеть', 'en_name': 'Sultan Ahmed Mosque'},
-    'table mountain': {'ru_name': 'Столовая гора', 'en_name': 'Table Mountain'},
-    'victoria falls': {'ru_name': 'Водопад Виктория', 'en_name': 'Victoria Falls'},
-    'disneyland': {'ru_name': 'Диснейленд', 'en_name': 'Disneyland'},
-    'venice canals': {'ru_name': 'Венецианские каналы', 'en_name': 'Venice Canals'},
-    'broadway': {'ru_name': 'Бродвей', 'en_name': 'Broadway'},
-    'al aqsa mosque': {'ru_name': 'Мечеть Аль-Акса', 'en_name': 'Al-Aqsa Mosque'},
-    'bolshoi theatre': {'ru_name': 'Большой театр', 'en_name': 'Bolshoi Theatre'}
-}
-
-# факты
-
-LANDMARK_FACTS = {
-    'красная площадь': '📌 Интересный факт: Название "Красная" произошло не от цвета, а от слова "красивая" в старорусском языке.',
-    'кремль': '📌 Интересный факт: В Кремле 20 башен, каждая имеет своё название и историю. Самые известные — Спасская, Троицкая и Боровицкая.',
-    'эрмитаж': '📌 Интересный факт: Чтобы осмотреть все экспонаты Эрмитажа, уделяя каждому хотя бы минуту, потребуется более 11 лет!',
-    'петергоф': '📌 Интересный факт: В Петергофе 176 фонтанов и 4 каскада. Фонтаны работают без единого насоса, используя естественный перепад высот.',
-    'собор василия блаженного': '📌 Интересный факт: Изначально собор был белым с золотыми куполами. Современный яркий вид он приобрёл только в XVII веке.',
-    'эйфелева башня': '📌 Интересный факт: Башня была построена за 2 года и 2 месяца и изначально планировалась как временное сооружение на 20 лет.',
-    'лувр': '📌 Интересный факт: Лувр — самый посещаемый музей в мире. Ежегодно его посещают более 10 миллионов человек.',
-    'колизей': '📌 Интересный факт: В Колизее могли разместиться до 50 000 зрителей. Он имел раздвижную крышу из парусины для защиты от солнца.',
-    'биг бен': '📌 Интересный факт: Название "Биг-Бен" относится не к башне, а к 13-тонному колоколу внутри часов.',
-    'статуя свободы': '📌 Интересный факт: Статуя была подарком Франции США к 100-летию независимости. Её полное название — "Свобода, озаряющая мир".',
-    'великая китайская стена': '📌 Интересный факт: Общая длина стены со всеми ответвлениями составляет около 21 196 км. Это самое длинное сооружение, созданное человеком.',
-    'тадж махал': '📌 Интересный факт: Строительство Тадж-Махала длилось 22 года. Для его отделки использовались 28 видов полудрагоценных камней.',
-    'белый дом': '📌 Интересный факт: Белый дом имеет 132 комнаты, 35 ванных, 6 этажей, теннисный корт, кинотеатр и даже собственную кондитерскую.',
-    'гора рашмор': '📌 Интересный факт: Лица четырёх президентов высечены на высоте 18 метров. На создание памятника ушло 14 лет.',
-    'фудзияма': '📌 Интересный факт: Фудзияма — активный вулкан, последнее извержение было в 1707 году. Гора считается священной в синтоизме.',
-    'ангкор ват': '📌 Интересный факт: Ангкор-Ват — крупнейший религиозный памятник в мире. Его площадь составляет 162,6 га.',
-    'пирамида хеопса': '📌 Интересный факт: Это единственное из Семи чудес света древнего мира, сохранившееся до наших дней.',
-    'сиднейский оперный театр': '📌 Интересный факт: Крыша театра весит более 160 000 тонн и покрыта миллионом белых и кремовых плиток.',
-    'мачу пикчу': '📌 Интересный факт: Город был построен без использования колеса и металлических инструментов. Камни подгонялись друг к другу с удивительной точностью.',
-    'бродвей': '📌 Интересный факт: Самый длинный бродвейский мюзикл — "Призрак Оперы", который шёл более 35 лет.',
-    'букингемский дворец': '📌 Интересный факт: Во дворце 775 комнат. Когда королева находится в резиденции, над дворцом развевается королевский штандарт.',
-    'пизанская башня': '📌 Интересный факт: Наклон башни увеличивается примерно на 1 мм в год. Сейчас отклонение от вертикали составляет около 5 метров.',
-    'золотые ворота': '📌 Интересный факт: Мост окрашен в специальный цвет "интернешнл орандж", который хорошо виден в тумане.',
-    'ниагарский водопад': '📌 Интересный факт: Это самый мощный водопад в Северной Америке. Каждую минуту через него проходит 168 000 кубометров воды.',
-    'бурдж халифа': '📌 Интересный факт: На строительство небоскрёба ушло 22 миллиона человеко-часов. В нём 57 лифтов, включая самый быстрый в мире.',
-    'диснейленд': '📌 Интересный факт: В день открытия в 1955 году в парк попали 28 000 человек вместо ожидаемых 15 000. Это было названо "Чёрным воскресеньем".',
-    'останкинская башня': '📌 Интересный факт: Башня может выдержать землетрясение силой 8 баллов и ураганный ветер скоростью до 44 м/с.',
-    'венеция каналы': '📌 Интересный факт: В Венеции 150 каналов и около 400 мостов. Город построен на 118 островах.',
-    'римский форум': '📌 Интересный факт: Здесь находился "золотой мильный столб", от которого отсчитывались все дороги Римской империи.',
-    'сфинкс': '📌 Интересный факт: Нос Сфинкса был отбит не Наполеоном, как считают многие, а суфийским фанатиком в XIV веке.'
-}
-
-# синоним для посика
+logger = logging.getLogger(__name__)
 
-SYNONYMS = {
-    # русс
-    'московский кремль': 'кремль',
-    'кремль москва': 'кремль',
-    'эйфелева': 'эйфелева башня',
-    'эйфель': 'эйфелева башня',
-    'парижская башня': 'эйфелева башня',
-    'башня эйфеля': 'эйфелева башня',
-    'великая стена': 'великая китайская стена',
-    'китайская стена': 'великая китайская стена',
-    'тадж': 'тадж махал',
-    'гора фудзи': 'фудзияма',
-    'фудзи': 'фудзияма',
-    'ангкор': 'ангкор ват',
-    'лондонская башня': 'биг бен',
-    'лондонский биг бен': 'биг бен',
-    'bigben': 'биг бен',
-    'нью йорк статуя': 'статуя свободы',
-    'статуя в нью йорке': 'статуя свободы',
-    'римский амфитеатр': 'колизей',
-    'амфитеатр рима': 'колизей',
-    'пизанская': 'пизанская башня',
-    'падающая башня': 'пизанская башня',
-    'собор василия': 'собор василия блаженного',
-    'василий блаженный': 'собор василия блаженного',
-    'покровский собор': 'собор василия блаженного',
-    
-    # англ
-    'the eiffel tower': 'eiffel tower',
-    'eiffel': 'eiffel tower',
-    'tower of pisa': 'leaning tower of pisa',
-    'pisa tower': 'leaning tower of pisa',
-    'notre dame cathedral': 'notre dame',
-    'saint basils': 'saint basils cathedral',
-    'great wall': 'great wall of china',
-    'the great wall': 'great wall of china',
-    'moscow kremlin': 'kremlin',
-    'the kremlin': 'kremlin',
-    'hermitage museum': 'hermitage',
-    'state hermitage': 'hermitage',
-    'taj': 'taj mahal',
-    'the taj mahal': 'taj mahal',
-    'fuji': 'mount fuji',
-    'mount fujiyama': 'mount fuji'
-}
+# каталог достопримечательностей лежит в data/landmarks.json:
+#   landmarks - русские названия и описания
+#   english   - английские названия со ссылкой на русское
+#   facts     - интересные факты
+#   synonyms  - синонимы для поиска
+
+LANDMARKS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'landmarks.json')
+
+DEFAULT_FACT = '📌 Интересный факт: Эта достопримечательность имеет богатую историю и культурное значение.'
+
+# индекс
+
+class LandmarkIndex:
+    """Каталог достопримечательностей и производные индексы для поиска"""
+
+    def __init__(self, catalog):
+        self.landmarks_ru = catalog['landmarks']
+        self.landmarks_en = catalog['english']
+        self.facts = catalog['facts']
+        self.synonyms = catalog['synonyms']
+
+        # готовые ответы по ключу
+        self.infos = {key: self._build_info(key) for key in self.landmarks_ru}
+
+        # английские названия, у которых есть русская карточка
+        self.en_matches = []
+        for en_key, info in self.landmarks_en.items():
+            ru_key = info['ru_name'].lower()
+            if ru_key in self.landmarks_ru:
+                self.en_matches.append((en_key, self._build_info(ru_key, info['ru_name'], info['en_name'])))
+
+        # слово -> первая достопримечательность, в ключе которой оно есть
+        self.ru_words = {}
+        for key in self.landmarks_ru:
+            for word in key.split():
+                self.ru_words.setdefault(word, self.infos[key])
+        self.en_words = {}
+        for en_key, info in self.en_matches:
+            for word in en_key.split():
+                self.en_words.setdefault(word, info)
+
+    def _build_info(self, key, name=None, en_name=None):
+        info = self.landmarks_ru[key]
+        return {
+            'found': True,
+            'key': key,
+            'name': name or info['name'],
+            'description': info['description'],
+            'fact': self.facts.get(key, DEFAULT_FACT),
+            'en_name': en_name or info['en_name']
+        }
+
+def load_catalog(path=LANDMARKS_FILE):
+    """Чтение каталога из файла"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+# текущий индекс; подменяется целиком, читатели берут ссылку один раз
+_index = None
+_index_path = LANDMARKS_FILE
+_index_mtime = None
+_reload_lock = threading.Lock()
+_reload_listeners = []
+
+def get_index():
+    """Текущий индекс (при первом обращении загружается из файла)"""
+    if _index is None:
+        reload_landmarks()
+    return _index
+
+def reload_landmarks(path=None):
+    """Перестроение индекса из файла и атомарная подмена"""
+    global _index, _index_path, _index_mtime
+    with _reload_lock:
+        if path:
+            _index_path = path
+        mtime = os.path.getmtime(_index_path)
+        index = LandmarkIndex(load_catalog(_index_path))
+        _index = index
+        _index_mtime = mtime
+    logger.info(f"Каталог достопримечательностей загружен: {len(index.landmarks_ru)}")
+    for listener in list(_reload_listeners):
+        try:
+            listener(index)
+        except Exception as e:
+            logger.error(f"Ошибка обработчика перезагрузки каталога: {e}")
+    return index
+
+def add_reload_listener(listener):
+    """Подписка на перезагрузку каталога"""
+    _reload_listeners.append(listener)
+
+def start_watcher(interval=5):
+    """Фоновая проверка изменений файла каталога"""
+    def watch():
+        failed_mtime = None
+        while True:
+            time.sleep(interval)
+            mtime = None
+            try:
+                mtime = os.path.getmtime(_index_path)
+                if mtime != _index_mtime and mtime != failed_mtime:
+                    reload_landmarks()
+            except Exception as e:
+                # битый файл: остаёмся на старом индексе до следующего изменения
+                failed_mtime = mtime
+                logger.error(f"Ошибка перезагрузки каталога: {e}")
+
+    thread = threading.Thread(target=watch, name="landmarks-watcher", daemon=True)
+    thread.start()
+    return thread
 
 # функц поиска
 
+def get_landmark_by_key(key):
+    """Информация о достопримечательности по ключу каталога"""
+    return get_index().infos[key]
+
+@timed(STAGE_SECONDS, stage='landmark')
 def find_landmark_info(text):
     """
     Поиск достопримечательности в тексте на русском или английском
@@ -395,79 +138,33 @@ def find_landmark_info(text):
     Возвращает:
         dict: Информация о найденной достопримечательности или {'found': False}
     """
+    index = get_index()
     text_lower = text.lower().strip()
     
     # 1) проверяем синонимы
-    for synonym, main_name in SYNONYMS.items():
+    for synonym, main_name in index.synonyms.items():
         if synonym in text_lower:
             # заменяем синоним на основное название
             text_lower = text_lower.replace(synonym, main_name)
             break
     
     # 2) сначала ищем полное совпадение на русском
-    for landmark_key, info in LANDMARKS_RU.items():
+    for landmark_key, info in index.infos.items():
         if landmark_key in text_lower:
-            fact = LANDMARK_FACTS.get(landmark_key, 
-                '📌 Интересный факт: Эта достопримечательность имеет богатую историю и культурное значение.')
-            return {
-                'found': True,
-                'name': info['name'],
-                'description': info['description'],
-                'fact': fact,
-                'en_name': info['en_name']
-            }
+            return info
     
     # 3) ищем на английском
-    for landmark_key, info in LANDMARKS_EN.items():
+    for landmark_key, info in index.en_matches:
         if landmark_key in text_lower:
-            # находим русский аналог
-            ru_name = info['ru_name']
-            ru_key = ru_name.lower()
-            
-            if ru_key in LANDMARKS_RU:
-                fact = LANDMARK_FACTS.get(ru_key, 
-                    '📌 Интересный факт: Эта достопримечательность имеет богатую историю и культурное значение.')
-                return {
-                    'found': True,
-                    'name': ru_name,
-                    'description': LANDMARKS_RU[ru_key]['description'],
-                    'fact': fact,
-                    'en_name': info['en_name']
-                }
+            return info
     
-    # 4) более гибкий поиск
+    # 4) более гибкий поиск по словам
     words = re.findall(r'\b\w+\b', text_lower)
     for word in words:
         if len(word) > 3:  # Ищем слова длиннее 3 букв
-            # Проверяем русские названия
-            for landmark_key, info in LANDMARKS_RU.items():
-                if word in landmark_key.split():
-                    fact = LANDMARK_FACTS.get(landmark_key, 
-                        '📌 Интересный факт: Эта достопримечательность имеет богатую историю и культурное значение.')
-                    return {
-                        'found': True,
-                        'name': info['name'],
-                        'description': info['description'],
-                        'fact': fact,
-                        'en_name': info['en_name']
-                    }
-            
-            # проверяем английские названия
-            for landmark_key, info in LANDMARKS_EN.items():
-                if word in landmark_key.split():
-                    ru_name = info['ru_name']
-                    ru_key = ru_name.lower()
-                    
-                    if ru_key in LANDMARKS_RU:
-                        fact = LANDMARK_FACTS.get(ru_key, 
-                            '📌 Интересный факт: Эта достопримечательность имеет богатую историю и культурное значение.')
-                        return {
-                            'found': True,
-                            'name': ru_name,
-                            'description': LANDMARKS_RU[ru_key]['description'],
-                            'fact': fact,
-                            'en_name': info['en_name']
-                        }
+            info = index.ru_words.get(word) or index.en_words.get(word)
+            if info:
+                return info
     
     # 5) если ничего не нашли
     return {'found': False}
@@ -477,7 +174,7 @@ def find_landmark_info(text):
 def get_all_landmarks():
     """Получить список всех доступных достопримечательностей"""
     landmarks = []
-    for key, info in LANDMARKS_RU.items():
+    for key, info in get_index().landmarks_ru.items():
         landmarks.append({
             'russian': info['name'],
             'english': info['en_name'],
@@ -507,7 +204,7 @@ def search_by_country(country):
     results = []
     keywords = country_keywords[country]
     
-    for key, info in LANDMARKS_RU.items():
+    for key, info in get_index().landmarks_ru.items():
         for keyword in keywords:
             if keyword in key:
                 results.append(info['name'])
@@ -539,5 +236,5 @@ if __name__ == "__main__":
         else:
             print(f"Not ok. '{test}' → Не найдено")
     
-    print("\n📊 Всего доступно достопримечательностей:", len(LANDMARKS_RU))
+    print("\n📊 Всего доступно достопримечательностей:", len(get_index().landmarks_ru))
     print("🌍 Поддерживаются языки: русский, английский")
\ No newline at end of file
@@ -1,686 +1,823 @@
 import telebot
-from googletrans import Translator
-import easyocr
-import cv2
-import numpy as np
-from PIL import Image
-import io
-import sqlite3
-from datetime import datetime
+from telebot import apihelper
 import os
-from dotenv import load_dotenv
 import logging
-
-# импорт модуля достопримечательностей
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# модули бота
+import landmarks
+import ocr
+from config import (TOKEN, ADMIN_IDS, LANDMARKS_FILE, LANDMARKS_WATCH_INTERVAL, HEAVY_WORKERS,
+                    LIGHT_WORKERS, HEAVY_QUEUE_LIMIT, LIGHT_QUEUE_LIMIT, TELEGRAM_API_URL,
+                    RUN_MODE, WEBHOOK_URL, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH,
+                    WEBHOOK_SECRET, USER_PHOTO_RATE, USER_PHOTO_BURST, CHAT_PHOTO_RATE,
+                    CHAT_PHOTO_BURST, USER_PHOTO_QUEUE_LIMIT, PHOTO_MIN_PIXELS,
+                    OCR_MIN_CONFIDENCE, OUTBOUND_RATE, OUTBOUND_WORKERS, PHOTO_DEADLINE,
+                    TEXT_DEADLINE, TRANSLATE_FAILURE_THRESHOLD, TRANSLATE_RESET_TIMEOUT,
+                    TRANSLATE_CALL_TIMEOUT, CARD_WARMUP_RATE, METRICS_HOST, METRICS_PORT,
+                    TRANSLATE_BACKEND, TRANSLATE_URL, EXPORT_SEND_TIMEOUT,
+                    OCR_WORKERS, OCR_WORKER_THREADS, OCR_THREADS, OCR_PIN_CORES,
+                    OCR_TUNING_FILE, JOB_QUEUE_URL, JOB_MAX_ATTEMPTS, JOB_RESULT_TIMEOUT,
+                    VISUAL_INDEX_DIR, VISUAL_MODEL, VISUAL_MIN_SCORE, VISUAL_MARGIN,
+                    RECORD_UPDATES_FILE, RECORD_SALT)
 from landmarks import find_landmark_info
+from landmark_cards import LandmarkCardCache
+from dispatcher import Dispatcher, run_polling, update_chat_id, HEAVY, LIGHT
+from webhook import run_webhook
+from ratelimit import KeyedRateLimiter
+from singleflight import SingleFlight
+from outbound import OutboundSender
+from profiling import HandlerProfiler, MemorySnapshots, CPROFILE, SAMPLE
+from recorder import UpdateRecorder, record_result, record_photo
+from resilience import (CircuitBreaker, DeadlineExceeded, CircuitOpenError, with_deadline,
+                        call_with_deadline, current_deadline)
+from jobqueue import create_backend, DONE
+from resources import load_tuning, threads_per_task
+from translation import create_translator
+from history_export import export_history, FORMATS as EXPORT_FORMATS
+from ocr_worker import OCR_JOB
+from metrics import (STAGE_SECONDS, HANDLER_SECONDS, ERRORS, QUEUE_DEPTH, timed,
+                     start_metrics_server)
+from database import (DB_FILE, init_db, add_user, add_to_history, get_user_language,
+                      set_user_language, get_history, clear_history, get_stats)
+from messages import (LANGUAGES, LANG_NAMES, BUTTON_PHOTO, BUTTON_TRANSLATOR, BUTTON_LANGUAGE,
+                      BUTTON_HISTORY, BUTTON_HELP, BUTTON_EXAMPLES, WELCOME_TEXT, HELP_TEXT,
+                      EXAMPLES_TEXT, PHOTO_HINT_TEXT, TRANSLATOR_HINT_TEXT, SHORT_TEXT,
+                      PHOTO_FAILED_TEXT, PHOTO_TIMEOUT_TEXT, TRANSLATE_UNAVAILABLE_TEXT,
+                      OCR_WARMING_TEXT, OCR_UNAVAILABLE_TEXT, EXPORT_STARTED_TEXT,
+                      EXPORT_FAILED_TEXT, EXPORT_BUSY_TEXT, get_main_keyboard,
+                      get_lang_keyboard, shorten, format_photo_landmark, format_photo_visual,
+                      format_photo_translation, format_photo_untranslated,
+                      format_text_translation, format_history, format_language_set,
+                      format_stats)
 
 # настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# загрузка конфигурации
-load_dotenv()
-TOKEN = os.getenv("BOT_TOKEN")
-
-# проверка токена
-if not TOKEN:
-    print("ОШИБКА: токен не найден")
-    exit(1)
-
-if ":" not in TOKEN:
-    print("ОШИБКА: неверный формат токена")
-    exit(1)
-
-# инициализация бота и переводчика
-bot = telebot.TeleBot(TOKEN)
-translator = Translator()
-
-# инициализация нейросети OCR
-print("Инициализация нейросети EasyOCR...")
-try:
-    reader_europe = easyocr.Reader(['en', 'ru'], gpu=False)
-    reader_japanese = easyocr.Reader(['ja', 'en'], gpu=False)
-    reader_korean = easyocr.Reader(['ko', 'en'], gpu=False)
-    reader_other = easyocr.Reader(['en', 'de', 'fr', 'es'], gpu=False)
-    
-    readers = {
-        'cyrillic': reader_europe,
-        'japanese': reader_japanese,
-        'korean': reader_korean,
-        'europe': reader_other
-    }
-    
-    print("Нейросеть OCR загружена")
-except Exception as e:
-    print(f"Ошибка загрузки OCR: {e}")
-    try:
-        readers = {'english': easyocr.Reader(['en'], gpu=False)}
-        print("Загружен только английский")
-    except:
-        print("Критическая ошибка: не удалось загрузить OCR")
-        exit(1)
 
-# константы
-DB_FILE = "langhelper.db"
+class LangHelperApp:
+    """
+    Приложение бота
+
+    Импорт модуля ничего не запускает. Фазы:
+    setup() - бот, переводчик, бд, каталог и обработчики (быстро, без OCR);
+    start() - фоновые потоки: отправка, диспетчер, метрики, прогрев карточек
+              и загрузка моделей OCR (текст и команды работают сразу);
+              с OCR_WORKERS модели грузятся до запуска потоков, затем fork;
+              с JOB_QUEUE_URL фото уходят в очередь отдельных исполнителей
+              (ocr_worker.py), а модели в боте не загружаются;
+              с эталонными фото в VISUAL_INDEX_DIR в фоне строится индекс
+              поиска достопримечательностей по изображению;
+              с RECORD_UPDATES_FILE входящие апдейты пишутся для replay.py;
+    run()   - приём апдейтов (polling или webhook); stop() - остановка.
+    """
 
-# функц бд
+    def __init__(self, token=TOKEN):
+        self.token = token
+        self.bot = None
+        self.translator = None
+        self.outbox = None
+        self.landmark_cards = None
+        self.dispatcher = None
+        self.profiler = None
+        self.recorder = None
+        self.memory_snapshots = MemorySnapshots()
+        self.jobs = None
+        # поиск достопримечательностей по изображению (None - ещё не готов или выключен)
+        self.visual = None
+        # задачи, результаты которых сейчас отправляются (поток забора и пул отправки)
+        self._delivering = set()
+        self._delivering_lock = threading.Lock()
+        self._delivery_pool = None
+        self._stopped = threading.Event()
+        # выгрузки истории идут в своих потоках, по одной на пользователя
+        self._export_pool = ThreadPoolExecutor(2, thread_name_prefix='export')
+        self._exporting = set()
+        self._export_lock = threading.Lock()
+        # одинаковые одновременные запросы (одно фото, один текст) выполняются один раз
+        self.inflight = SingleFlight()
+        # при сбоях переводчика запросы к нему временно не отправляются
+        self.translate_breaker = CircuitBreaker('translate', TRANSLATE_FAILURE_THRESHOLD,
+                                                TRANSLATE_RESET_TIMEOUT, TRANSLATE_CALL_TIMEOUT)
+
+    # фазы жизненного цикла
+
+    def setup(self):
+        """Создание бота и подготовка всего, что не требует OCR"""
+        # проверка токена
+        if not self.token:
+            raise ValueError("токен не найден")
+        if ":" not in self.token:
+            raise ValueError("неверный формат токена")
+        # без секрета апдейты на webhook мог бы присылать кто угодно
+        if RUN_MODE == 'webhook' and not WEBHOOK_SECRET:
+            raise ValueError("для webhook-режима нужен WEBHOOK_SECRET")
+
+        # свой адрес Bot API (например, локальный сервер для тестов)
+        if TELEGRAM_API_URL:
+            apihelper.API_URL = TELEGRAM_API_URL.rstrip('/') + "/bot{0}/{1}"
+            apihelper.FILE_URL = TELEGRAM_API_URL.rstrip('/') + "/file/bot{0}/{1}"
+
+        # обработчики запускает диспетчер, поэтому сам бот работает без своих потоков
+        self.bot = telebot.TeleBot(self.token, threaded=False)
+        self.translator = create_translator(TRANSLATE_BACKEND, TRANSLATE_URL)
+
+        # исходящие сообщения: обработчики ставят ответы в очередь и не ждут Bot API
+        self.outbox = OutboundSender(self.bot, global_rate=OUTBOUND_RATE, workers=OUTBOUND_WORKERS)
+
+        init_db()
+        if JOB_QUEUE_URL:
+            self.jobs = create_backend(JOB_QUEUE_URL)
+
+        # каталог достопримечательностей и карточки: русские сразу, остальные языки в фоне
+        landmarks.reload_landmarks(LANDMARKS_FILE)
+        self.landmark_cards = LandmarkCardCache(DB_FILE, self.translator,
+                                                [code for _, code in LANGUAGES],
+                                                self.translate_breaker, CARD_WARMUP_RATE)
+        self.landmark_cards.load()
+        landmarks.add_reload_listener(self.landmark_cards.reload)
+
+        self._register_handlers()
+        self.dispatcher = self._create_dispatcher()
+        if RECORD_UPDATES_FILE:
+            self.recorder = UpdateRecorder(RECORD_UPDATES_FILE, RECORD_SALT).install(self.dispatcher)
+        self.profiler = HandlerProfiler(self.dispatcher)
+        return self
+
+    def start(self):
+        """Запуск фоновых потоков"""
+        if self.jobs is not None:
+            # OCR у исполнителей: боту остаётся отправлять их результаты
+            self._delivery_pool = ThreadPoolExecutor(4, thread_name_prefix='job-results')
+            threading.Thread(target=self._deliver_results, name="job-results", daemon=True).start()
+        else:
+            # процессы и потоки: из окружения, иначе из результата подбора
+            tuning = load_tuning(OCR_TUNING_FILE) or {}
+            workers = OCR_WORKERS or tuning.get('workers', 0)
+            if not (workers and self._start_ocr_workers(workers, tuning)):
+                # модели OCR грузятся в фоне; до готовности фото ждут в своей очереди.
+                # одновременно распознают HEAVY_WORKERS потоков - ядра делятся между ними
+                ocr.start_readers_warmup(OCR_THREADS or threads_per_task(HEAVY_WORKERS))
+
+        # после fork процессов OCR: в процессе бота уже можно запускать потоки
+        if VISUAL_INDEX_DIR and os.path.isdir(VISUAL_INDEX_DIR):
+            threading.Thread(target=self._load_visual_index, name="visual-index",
+                             daemon=True).start()
+        else:
+            logger.info("Эталонных фото нет (VISUAL_INDEX_DIR), поиск по изображению выключен")
+
+        self.outbox.start()
+        self.dispatcher.start()
+        self.landmark_cards.start_warmup()
+        if LANDMARKS_WATCH_INTERVAL > 0:
+            landmarks.start_watcher(LANDMARKS_WATCH_INTERVAL)
+
+        # глубина очередей считается в момент запроса метрик
+        QUEUE_DEPTH.set_function(lambda: self.dispatcher.depth(HEAVY), queue='heavy')
+        QUEUE_DEPTH.set_function(lambda: self.dispatcher.depth(LIGHT), queue='light')
+        QUEUE_DEPTH.set_function(self.outbox.depth, queue='outbound')
+        if METRICS_PORT:
+            start_metrics_server(METRICS_HOST, METRICS_PORT)
+
+    def _start_ocr_workers(self, workers, tuning):
+        """Загрузка моделей и fork процессов OCR, пока в процессе нет других потоков"""
+        from ocr_workers import fork_supported
+        if not fork_supported():
+            logger.warning("fork недоступен, OCR в процессе бота")
+            return False
+        threads = OCR_WORKER_THREADS or tuning.get('threads') or threads_per_task(workers)
+        pin = OCR_PIN_CORES and tuning.get('pin', True)
+        if ocr.init_readers():
+            ocr.start_worker_pool(workers, threads, pin)
+        return True
+
+    def _load_visual_index(self):
+        """Сеть и индекс эталонных фото; до готовности фото сразу идут в OCR"""
+        import visual_index
+        try:
+            embedder = visual_index.TorchvisionEmbedder(VISUAL_MODEL)
+            index = visual_index.build_index(
+                VISUAL_INDEX_DIR, embedder, visual_index.catalog_label_resolver(landmarks.get_index()))
+            if not len(index):
+                logger.info("Эталонных фото нет, поиск по изображению выключен")
+                return
+            self.visual = visual_index.VisualRecognizer(embedder, index, VISUAL_MIN_SCORE,
+                                                        VISUAL_MARGIN)
+            logger.info(f"✅ Поиск по изображению готов: эталонов {len(index)}")
+        except Exception as e:
+            logger.error(f"Ошибка загрузки визуального индекса: {e}")
+            ERRORS.inc(stage='visual')
+
+    def run(self):
+        """Приём апдейтов до остановки"""
+        if RUN_MODE == 'webhook':
+            # готовность: очередь лёгких апдейтов не переполнена
+            run_webhook(self.bot, self.dispatcher, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH,
+                        WEBHOOK_SECRET, public_url=WEBHOOK_URL,
+                        is_ready=lambda: self.dispatcher.depth(LIGHT) < LIGHT_QUEUE_LIMIT)
+        else:
+            self.bot.remove_webhook()
+            run_polling(self.bot, self.dispatcher)
+
+    def stop(self):
+        """Остановка отправки (оставшиеся ответы не ждёт) и процессов OCR"""
+        self._stopped.set()
+        if self.outbox is not None:
+            self.outbox.stop()
+        if self.recorder is not None:
+            self.recorder.stop()
+        ocr.stop_worker_pool()
+
+    def _register_handlers(self):
+        bot = self.bot
+        bot.register_message_handler(self.cmd_start, commands=['start'])
+        bot.register_message_handler(self.cmd_help, commands=['help'])
+        bot.register_message_handler(self.cmd_examples, commands=['examples'])
+        bot.register_message_handler(self.cmd_language, commands=['language', 'lang'])
+        bot.register_message_handler(self.cmd_history, commands=['history'])
+        bot.register_message_handler(self.cmd_clear, commands=['clear'])
+        bot.register_message_handler(self.cmd_export, commands=['export'])
+        bot.register_message_handler(self.cmd_stats, commands=['stats'])
+        bot.register_message_handler(self.cmd_reload, commands=['reload'])
+        bot.register_message_handler(self.cmd_profile, commands=['profile'])
+        bot.register_message_handler(self.cmd_memsnap, commands=['memsnap'])
+        bot.register_message_handler(self.handle_photo, content_types=['photo'])
+        bot.register_message_handler(self.handle_text, func=lambda message: True)
+        bot.register_callback_query_handler(self.callback_handler, func=lambda call: True)
+
+    def is_admin(self, user_id):
+        """Проверка прав администратора"""
+        return user_id in ADMIN_IDS
+
+    # распознавание и перевод
+
+    def recognize_photo(self, message, download=None):
+        """Скачивание фото и распознавание текста"""
+        # file_unique_id одинаков у одного и того же файла у всех пользователей
+        return self.inflight.do(('ocr', message.photo[-1].file_unique_id),
+                                self._download_and_ocr, message.photo,
+                                download or self.download_photo)
+
+    def _download_and_ocr(self, photo_sizes, download):
+        # сначала средний размер, самый большой - только при низкой уверенности
+        return ocr.recognize_adaptive(photo_sizes, download, PHOTO_MIN_PIXELS,
+                                      OCR_MIN_CONFIDENCE)
+
+    def recognize_landmark_image(self, message, download):
+        """Достопримечательность по изображению: (информация, близость) или None"""
+        visual = self.visual
+        if visual is None:
+            return None
+        # тот же размер, с которого начнёт OCR: скачивается один раз
+        size = ocr.photo_size_plan(message.photo, PHOTO_MIN_PIXELS)[0]
+        try:
+            match = self.inflight.do(('visual', size.file_unique_id),
+                                     lambda: visual.recognize(download(size)))
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            # поиск по изображению не обязателен: фото уходит в OCR
+            logger.error(f"Ошибка поиска по изображению: {e}")
+            ERRORS.inc(stage='visual')
+            return None
+        if match is None:
+            return None
+        key, score = match
+        try:
+            return landmarks.get_landmark_by_key(key), score
+        except KeyError:
+            # достопримечательность убрали из каталога после построения индекса
+            return None
 
-def init_db():
-    """Инициализация базы данных"""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # таб пользователей
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            username TEXT,
-            first_name TEXT,
-            target_language TEXT DEFAULT 'ru',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # таб истории
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            type TEXT,
-            original_text TEXT,
-            translated_text TEXT,
-            source_lang TEXT,
-            target_lang TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        print("База данных инициализирована")
-    except Exception as e:
-        print(f"Ошибка БД: {e}")
+    def _photo_downloader(self):
+        """download_photo с памятью: каждый размер фото скачивается один раз за обработку"""
+        downloaded = {}
+
+        def download(photo_size):
+            if photo_size.file_id not in downloaded:
+                downloaded[photo_size.file_id] = self.download_photo(photo_size)
+            return downloaded[photo_size.file_id]
+        return download
+
+    @timed(STAGE_SECONDS, stage='download')
+    def download_photo(self, photo_size):
+        """Скачивание одного размера фото"""
+        file_info = call_with_deadline(self.bot.get_file, photo_size.file_id)
+        content = call_with_deadline(self.bot.download_file, file_info.file_path)
+        record_photo(photo_size, content)
+        return content
+
+    def translate_text(self, text, target_lang):
+        """Определение языка и перевод: (язык, точность в %, перевод)"""
+        return self.inflight.do(('translate', text, target_lang), self._detect_and_translate,
+                                text, target_lang)
+
+    def _detect_and_translate(self, text, target_lang):
+        breaker = self.translate_breaker
+        with STAGE_SECONDS.time(stage='detect'):
+            detected = breaker.call(self.translator.detect, text)
+        with STAGE_SECONDS.time(stage='translate'):
+            translation = breaker.call(self.translator.translate, text,
+                                       src=detected.lang, dest=target_lang)
+        return detected.lang, detected.confidence * 100, translation.text
+
+    # обтработчики команд
+
+    def cmd_start(self, message):
+        """Команда старт"""
+        user_id = message.from_user.id
+        username = message.from_user.username or ""
+        first_name = message.from_user.first_name or ""
+
+        add_user(user_id, username, first_name)
+        set_user_language(user_id, 'ru')
+
+        self.outbox.send_message(message.chat.id, WELCOME_TEXT.format(first_name=first_name),
+                                 reply_markup=get_main_keyboard(),
+                                 parse_mode='Markdown')
 
-def add_user(user_id, username="", first_name=""):
-    """Добавление пользователя"""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute('''
-        INSERT OR IGNORE INTO users (user_id, username, first_name) 
-        VALUES (?, ?, ?)
-        ''', (user_id, username, first_name))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        logger.error(f"Ошибка добавления пользователя: {e}")
+    def cmd_help(self, message):
+        """Команда помощь"""
+        self.outbox.send_message(message.chat.id, HELP_TEXT, parse_mode='Markdown')
 
-def add_to_history(user_id, type_, original, translated, src_lang, target_lang):
-    """Добавление в историю"""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute('''
-        INSERT INTO history (user_id, type, original_text, translated_text, source_lang, target_lang)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, type_, original[:1000], translated[:1000], src_lang, target_lang))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        logger.error(f"Ошибка добавления в историю: {e}")
+    def cmd_examples(self, message):
+        """Примеры достопримечательностей"""
+        self.outbox.send_message(message.chat.id, EXAMPLES_TEXT, parse_mode='Markdown')
 
-def get_user_language(user_id):
-    """Получение языка пользователя"""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute('SELECT target_language FROM users WHERE user_id = ?', (user_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else 'ru'
-    except:
-        return 'ru'
-
-def set_user_language(user_id, lang):
-    """Установка языка"""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute('''
-        INSERT OR REPLACE INTO users (user_id, target_language) 
-        VALUES (?, ?)
-        ''', (user_id, lang))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        logger.error(f"Ошибка установки языка: {e}")
-
-# инициализация бд
-init_db()
-
-# клавиатуры
-
-def get_main_keyboard():
-    """Главное меню"""
-    from telebot import types
-    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    markup.row("📸 Распознать фото", "📝 Переводчик")
-    markup.row("🌍 Язык перевода", "📚 История")
-    markup.row("❓ Помощь", "🏛️ Примеры достопримечательностей")
-    return markup
-
-def get_lang_keyboard():
-    """Выбор языка"""
-    from telebot import types
-    markup = types.InlineKeyboardMarkup(row_width=3)
-    languages = [
-        ("🇬🇧 Английский", "en"),
-        ("🇩🇪 Немецкий", "de"),
-        ("🇫🇷 Французский", "fr"),
-        ("🇪🇸 Испанский", "es"),
-        ("🇯🇵 Японский", "ja"),
-        ("🇰🇷 Корейский", "ko"),
-        ("🇷🇺 Русский", "ru"),
-        ("🇮🇹 Итальянский", "it"),
-        ("🇵🇹 Португальский", "pt"),
-        ("🇦🇪 Арабский", "ar"),
-        ("🇹🇷 Турецкий", "tr"),
-        ("🇨🇳 Китайский", "zh-cn")
-    ]
-    for name, code in languages:
-        markup.add(types.InlineKeyboardButton(name, callback_data=f"lang_{code}"))
-    return markup
-
-# функц оцр
-
-def process_image_ocr(image_bytes):
-    """Обработка изображения и распознавание текста"""
-    try:
-        image = Image.open(io.BytesIO(image_bytes))
-        img_np = np.array(image)
-        
-        if len(img_np.shape) == 3:
-            if img_np.shape[2] == 4:
-                img_np = cv2.cvtColor(img_np, cv2.COLOR_RGBA2RGB)
-            img_np = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-        
-        all_results = []
-        
-        # пробуем сначала кириллический читатель (для русского)
+    def cmd_language(self, message):
+        """Выбор языка"""
+        self.outbox.send_message(message.chat.id,
+                                 "Выберите язык для перевода:",
+                                 reply_markup=get_lang_keyboard(),
+                                 parse_mode='Markdown')
+
+    def cmd_history(self, message):
+        """История переводов"""
+        history = get_history(message.from_user.id)
+
+        if not history:
+            self.outbox.send_message(message.chat.id,
+                                     "История пуста",
+                                     parse_mode='Markdown')
+            return
+
+        self.outbox.send_message(message.chat.id, format_history(history), parse_mode='Markdown')
+
+    def cmd_stats(self, message):
+        """Статистика из счётчиков (без обхода истории)"""
+        user_id = message.from_user.id
+        self.outbox.send_message(message.chat.id,
+                                 format_stats(get_stats(user_id), self.is_admin(user_id)),
+                                 parse_mode='Markdown')
+
+    def cmd_clear(self, message):
+        """Очистка истории"""
+        clear_history(message.from_user.id)
+        self.outbox.send_message(message.chat.id, "✅ История очищена")
+
+    def cmd_export(self, message):
+        """Выгрузка всей истории файлом: /export [csv|jsonl] (админ - ещё и id пользователя)"""
+        args = message.text.split()[1:]
+        fmt = next((arg for arg in args if arg in EXPORT_FORMATS), 'csv')
+        user_id = message.from_user.id
+        other = next((arg for arg in args if arg.isdigit()), None)
+        if other and self.is_admin(user_id):
+            user_id = int(other)
+
+        with self._export_lock:
+            busy = user_id in self._exporting
+            self._exporting.add(user_id)
+        if busy:
+            self.outbox.send_message(message.chat.id, EXPORT_BUSY_TEXT)
+            return
+        self.outbox.send_message(message.chat.id, EXPORT_STARTED_TEXT)
+        self._export_pool.submit(self._export, message.chat.id, user_id, fmt)
+
+    def _export(self, chat_id, user_id, fmt):
+        path = None
         try:
-            if 'cyrillic' in readers:
-                result = readers['cyrillic'].readtext(img_np, detail=0, paragraph=True)
-                if result:
-                    text = ' '.join(result).strip()
-                    if text and len(text) > 1:
-                        all_results.append(('cyrillic', text))
+            path, filename, count = export_history(user_id, fmt)
+            with open(path, 'rb') as f:
+                # файл читается при отправке, поэтому ждём её до закрытия
+                future = self.outbox.send_document(chat_id, f, visible_file_name=filename,
+                                                   caption=f"📦 История: {count} записей")
+                try:
+                    future.result(timeout=EXPORT_SEND_TIMEOUT)
+                except FutureTimeout:
+                    # ещё не начатую отправку снимаем: файл сейчас будет удалён
+                    future.cancel()
+                    raise TimeoutError(f"файл не отправлен за {EXPORT_SEND_TIMEOUT:g} с") from None
         except Exception as e:
-            logger.error(f"Ошибка кириллического OCR: {e}")
-        
-        # пробуем другие читатели
-        for reader_name, reader in readers.items():
-            if reader_name == 'cyrillic':
-                continue
-                
-            try:
-                result = reader.readtext(img_np, detail=0, paragraph=True)
-                if result:
-                    text = ' '.join(result).strip()
-                    if text and len(text) > 1:
-                        all_results.append((reader_name, text))
-            except Exception as e:
-                logger.error(f"Ошибка OCR {reader_name}: {e}")
-        
-        if not all_results:
-            return None
-        
-        # выбираем самый длинный результат
-        best_result = max(all_results, key=lambda x: len(x[1]))
-        return best_result[1]
-        
-    except Exception as e:
-        logger.error(f"Общая ошибка OCR: {e}")
-        return None
-
-# обтработчики команд
-
-@bot.message_handler(commands=['start'])
-def cmd_start(message):
-    """Команда старт"""
-    user_id = message.from_user.id
-    username = message.from_user.username or ""
-    first_name = message.from_user.first_name or ""
-    
-    add_user(user_id, username, first_name)
-    set_user_language(user_id, 'ru')
-    
-    welcome = f"""
-Привет, {first_name}! 🎉 Я ИИ-переводчик для путешествий
-
-Я помогу тебе:
-📸 Распознаю текст с фото (вывески, меню, указатели)
-🏛️ Определю достопримечательности по названию
-🌍 Переведу на 100+ языков
-📚 Сохраню историю переводов
-
-**Как пользоваться:**
-1. Отправь фото с текстом → получи перевод
-2. Напиши название достопримечательности → узнай о ней
-3. Напиши любой текст → получи перевод
-
-Примеры достопримечательностей:
-Эйфелева башня, Красная площадь, Колизей, Статуя Свободы, Тадж-Махал
-    """
-    
-    bot.send_message(message.chat.id, welcome, 
-                    reply_markup=get_main_keyboard(),
-                    parse_mode='Markdown')
-
-@bot.message_handler(commands=['help'])
-def cmd_help(message):
-    """Команда помощь"""
-    help_text = """
-📚 **Помощь по использованию:**
-
-📸 **Для фото с текстом:**
-1. Сфотографируйте текст (вывеску, меню, указатель)
-2. Отправьте фото боту
-3. Получите перевод или информацию о достопримечательности
-
-🏛️ **Для определения достопримечательностей:**
-• Напишите название (например: "Эйфелева башня")
-• Или отправьте фото с названием достопримечательности
-
-🌍 **Для перевода текста:**
-• Просто напишите текст на любом языке
-• Бот определит язык и переведёт
-
-📋 **Примеры запросов:**
-• Фото с надписью "Eiffel Tower"
-• Текст "Красная площадь Москва"
-• "Where is Colosseum?" (переведёт и найдёт Колизей)
-
-🔧 **Команды:**
-/start - начало работы
-/help - эта справка  
-/language - выбрать язык перевода
-/history - показать историю
-/clear - очистить историю
-/examples - примеры достопримечательностей
-    """
-    
-    bot.send_message(message.chat.id, help_text, parse_mode='Markdown')
-
-@bot.message_handler(commands=['examples'])
-def cmd_examples(message):
-    """Примеры достопримечательностей"""
-    examples = """
-🏛️ **Примеры достопримечательностей для поиска:**
-
-**Россия:**
-• Красная площадь
-• Московский Кремль
-• Эрмитаж
-• Петергоф
-• Собор Василия Блаженного
-
-**Европа:**
-• Эйфелева башня (Eiffel Tower)
-• Лувр (Louvre)
-• Колизей (Colosseum)
-• Биг-Бен (Big Ben)
-• Собор Святого Петра
-
-**Америка:**
-• Статуя Свободы (Statue of Liberty)
-• Белый дом (White House)
-• Гора Рашмор
-
-**Азия:**
-• Великая Китайская стена (Great Wall of China)
-• Тадж-Махал (Taj Mahal)
-• Фудзияма (Mount Fuji)
-• Ангкор-Ват (Angkor Wat)
-
-**Отправьте название на русском или английском!**
-    """
-    
-    bot.send_message(message.chat.id, examples, parse_mode='Markdown')
-
-@bot.message_handler(commands=['language', 'lang'])
-def cmd_language(message):
-    """Выбор языка"""
-    bot.send_message(message.chat.id, 
-                    "Выберите язык для перевода:",
-                    reply_markup=get_lang_keyboard(),
-                    parse_mode='Markdown')
-
-@bot.message_handler(commands=['history'])
-def cmd_history(message):
-    """История переводов"""
-    user_id = message.from_user.id
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''
-    SELECT type, original_text, translated_text, source_lang, target_lang, timestamp
-    FROM history 
-    WHERE user_id = ? 
-    ORDER BY timestamp DESC 
-    LIMIT 10
-    ''', (user_id,))
-    
-    history = cursor.fetchall()
-    conn.close()
-    
-    if not history:
-        bot.send_message(message.chat.id, 
-                        "История пуста",
-                        parse_mode='Markdown')
-        return
-    
-    response = "📚 **Последние 10 запросов:**\n\n"
-    
-    for i, (type_, orig, trans, src, targ, time) in enumerate(history, 1):
-        icon = "📸" if 'photo' in type_ else "📝"
-        if 'landmark' in type_:
-            icon = "🏛️"
-        
-        orig_display = orig[:40] + "..." if len(orig) > 40 else orig
-        trans_display = trans[:40] + "..." if len(trans) > 40 else trans
-        
+            logger.error(f"Ошибка выгрузки истории {user_id}: {e}")
+            ERRORS.inc(stage='export')
+            self.outbox.send_message(chat_id, EXPORT_FAILED_TEXT)
+        finally:
+            if path:
+                os.remove(path)
+            with self._export_lock:
+                self._exporting.discard(user_id)
+
+    def cmd_reload(self, message):
+        """Перезагрузка каталога достопримечательностей (админ)"""
+        if not self.is_admin(message.from_user.id):
+            return
         try:
-            time_str = datetime.strptime(time, "%Y-%m-%d %H:%M:%S").strftime("%d.%m %H:%M")
-        except:
-            time_str = time[:16]
-        
-        response += f"{icon} **{i}.** `{orig_display}`\n"
-        response += f"   → `{trans_display}`\n"
-        response += f"   🌐 `{src.upper()} → {targ.upper()}` | 🕒 {time_str}\n\n"
-    
-    bot.send_message(message.chat.id, response, parse_mode='Markdown')
-
-@bot.message_handler(commands=['clear'])
-def cmd_clear(message):
-    """Очистка истории"""
-    user_id = message.from_user.id
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM history WHERE user_id = ?', (user_id,))
-    conn.commit()
-    conn.close()
-    bot.send_message(message.chat.id, "✅ История очищена")
-
-# обработка фото
-
-@bot.message_handler(content_types=['photo'])
-def handle_photo(message):
-    """Обработка фото: распознаём текст и ищем достопримечательности"""
-    user_id = message.from_user.id
-    
-    processing_msg = bot.send_message(message.chat.id, 
-                                     "📸 Распознаю текст на фото...",
+            index = landmarks.reload_landmarks()
+            self.outbox.send_message(message.chat.id,
+                                     f"✅ Каталог перезагружен: {len(index.landmarks_ru)} достопримечательностей")
+        except Exception as e:
+            logger.error(f"Ошибка перезагрузки каталога: {e}")
+            self.outbox.send_message(message.chat.id, f"❌ Ошибка перезагрузки каталога: `{str(e)[:100]}`",
                                      parse_mode='Markdown')
-    
-    try:
-        file_id = message.photo[-1].file_id
-        file_info = bot.get_file(file_id)
-        downloaded_file = bot.download_file(file_info.file_path)
-        
-        # распознаём текст на фото
-        recognized_text = process_image_ocr(downloaded_file)
-        
+
+    def send_report(self, chat_id, filename, content, caption):
+        """Отчёт администратору файлом"""
+        self.outbox.send_document(chat_id, content, visible_file_name=filename, caption=caption)
+
+    def cmd_profile(self, message):
+        """Профилирование обработчиков: /profile [секунд] [sample] (админ)"""
+        if not self.is_admin(message.from_user.id):
+            return
+        args = message.text.split()[1:]
+        seconds = int(args[0]) if args and args[0].isdigit() else 30
+        mode = SAMPLE if SAMPLE in args else CPROFILE
+        chat_id = message.chat.id
+        started = self.profiler.start(
+            seconds, mode,
+            on_done=lambda filename, content, caption: self.send_report(chat_id, filename,
+                                                                        content, caption))
+        if started:
+            self.outbox.send_message(chat_id, f"⏱ Профилирование ({mode}) на {seconds} с...")
+        else:
+            self.outbox.send_message(chat_id, "⏱ Профилирование уже идёт")
+
+    def cmd_memsnap(self, message):
+        """Снимок памяти с разницей от предыдущего: /memsnap [stop] (админ)"""
+        if not self.is_admin(message.from_user.id):
+            return
+        if 'stop' in message.text.split()[1:]:
+            stopped = self.memory_snapshots.stop()
+            self.outbox.send_message(message.chat.id, "✅ tracemalloc выключен" if stopped
+                                     else "tracemalloc не был включён")
+            return
+        filename, content, caption = self.memory_snapshots.snapshot()
+        self.send_report(message.chat.id, filename, content, caption)
+
+    # обработка фото
+
+    def _wait_for_ocr(self, chat_id, processing_msg):
+        """Сразу после запуска фото ждут загрузки моделей; False - OCR недоступен"""
+        if ocr.readers_loading():
+            self.outbox.edit_message_text(OCR_WARMING_TEXT, chat_id, processing_msg)
+            if not ocr.wait_readers(current_deadline().remaining()) and ocr.readers_loading():
+                raise DeadlineExceeded("модели OCR ещё загружаются")
+        return bool(ocr.readers)
+
+    @timed(HANDLER_SECONDS, handler='photo')
+    @with_deadline(PHOTO_DEADLINE)
+    def handle_photo(self, message):
+        """Обработка фото: распознаём текст и ищем достопримечательности"""
+        user_id = message.from_user.id
+        outbox = self.outbox
+
+        processing_msg = outbox.send_message(message.chat.id,
+                                             "📸 Распознаю текст на фото...",
+                                             parse_mode='Markdown')
+
+        try:
+            # сначала поиск по изображению: фото без текста не доходят до OCR
+            download = self._photo_downloader()
+            visual_match = self.recognize_landmark_image(message, download)
+            if visual_match is not None:
+                record_result(outcome='visual_landmark', landmark=visual_match[0]['name'],
+                              score=round(visual_match[1], 3))
+                self._reply_visual(user_id, message.chat.id, processing_msg, *visual_match)
+                return
+
+            if self.jobs is not None:
+                record_result(outcome='queued')
+                self._enqueue_photo(message, processing_msg)
+                return
+
+            if not self._wait_for_ocr(message.chat.id, processing_msg):
+                record_result(outcome='ocr_unavailable')
+                outbox.edit_message_text(OCR_UNAVAILABLE_TEXT, message.chat.id, processing_msg)
+                return
+
+            # скачиваем и распознаём текст на фото
+            recognized_text = self.recognize_photo(message, download)
+            record_result(ocr_chars=len(recognized_text or ''))
+            self._reply_recognized(user_id, message.chat.id, processing_msg, recognized_text)
+
+        except DeadlineExceeded as e:
+            logger.warning(f"Фото не обработано вовремя: {e}")
+            ERRORS.inc(stage='deadline')
+            record_result(outcome='timeout')
+            outbox.edit_message_text(PHOTO_TIMEOUT_TEXT, message.chat.id, processing_msg)
+
+        except Exception as e:
+            logger.error(f"Ошибка обработки фото: {e}")
+            ERRORS.inc(stage='photo')
+            record_result(outcome='error')
+            error_msg = f"❌ Ошибка обработки фото: `{str(e)[:100]}`"
+            outbox.edit_message_text(error_msg,
+                                     message.chat.id,
+                                     processing_msg,
+                                     parse_mode='Markdown')
+
+    def _reply_visual(self, user_id, chat_id, processing_msg, landmark_info, score):
+        """Ответ на фото, где достопримечательность узнана по изображению"""
+        card = self.landmark_cards.get('photo', landmark_info, get_user_language(user_id))
+        add_to_history(user_id, 'photo_landmark', landmark_info['name'],
+                       landmark_info['name'], 'image', 'landmark')
+        self.outbox.edit_message_text(format_photo_visual(card, score), chat_id, processing_msg,
+                                      parse_mode='Markdown')
+
+    def _reply_recognized(self, user_id, chat_id, processing_msg, recognized_text):
+        """Ответ на фото по распознанному тексту: достопримечательность или перевод"""
+        outbox = self.outbox
+
         # если текст распознан
         if recognized_text and len(recognized_text.strip()) > 2:
-            display_text = recognized_text[:300] + "..." if len(recognized_text) > 300 else recognized_text
-            
+            display_text = shorten(recognized_text, 300)
+
             # пробуем найти достопримечательность в тексте
             landmark_info = find_landmark_info(recognized_text)
-            
-            if landmark_info['found']:
-                # нашли достопримечательность
-                response = f"""
-🏛️ **Найдена достопримечательность!**
 
-**{landmark_info['name']}**
-{landmark_info['description']}
-
-{landmark_info['fact']}
-
-📝 **Текст на фото:**
-`{display_text}`
+            if landmark_info['found']:
+                # нашли достопримечательность: готовая карточка на языке пользователя
+                card = self.landmark_cards.get('photo', landmark_info, get_user_language(user_id))
 
-🔍 Определено по распознанному тексту
-                """
-                
                 # добавляем в историю
-                add_to_history(user_id, 'photo_landmark', recognized_text[:100], 
+                add_to_history(user_id, 'photo_landmark', recognized_text[:100],
                               landmark_info['name'], 'text', 'landmark')
-                
-                bot.edit_message_text(response,
-                                     message.chat.id,
-                                     processing_msg.message_id,
-                                     parse_mode='Markdown')
+                record_result(outcome='landmark', landmark=landmark_info['name'])
+
+                outbox.edit_message_text(format_photo_landmark(card, display_text),
+                                         chat_id,
+                                         processing_msg,
+                                         parse_mode='Markdown')
                 return
-            
+
             # если достопримечательность не найдена, переводим текст
-            bot.edit_message_text("🌍 Определяю язык для перевода...",
-                                 message.chat.id,
-                                 processing_msg.message_id,
-                                 parse_mode='Markdown')
-            
-            detected = translator.detect(recognized_text)
-            src_lang = detected.lang
-            confidence = detected.confidence * 100
-            
+            outbox.edit_message_text("🌍 Определяю язык для перевода...",
+                                     chat_id,
+                                     processing_msg,
+                                     parse_mode='Markdown')
+
             target_lang = get_user_language(user_id)
-            translation = translator.translate(recognized_text, src=src_lang, dest=target_lang)
-            
+            try:
+                src_lang, confidence, translated = self.translate_text(recognized_text, target_lang)
+            except (DeadlineExceeded, CircuitOpenError) as e:
+                # переводчик не успел или отключён: отдаём хотя бы распознанный текст
+                logger.warning(f"Фото без перевода: {e}")
+                ERRORS.inc(stage='translate')
+                record_result(outcome='untranslated')
+                outbox.edit_message_text(format_photo_untranslated(display_text),
+                                         chat_id,
+                                         processing_msg,
+                                         parse_mode='Markdown')
+                return
+
             # добавляем в историю
-            add_to_history(user_id, 'photo', recognized_text, translation.text, src_lang, target_lang)
-            
+            add_to_history(user_id, 'photo', recognized_text, translated, src_lang, target_lang)
+            record_result(outcome='translation', src_lang=src_lang, target_lang=target_lang)
+
             # формируем ответ
-            lang_names = {
-                'en': 'английский', 'ru': 'русский', 'de': 'немецкий',
-                'fr': 'французский', 'es': 'испанский', 'zh-cn': 'китайский',
-                'ja': 'японский', 'ko': 'корейский', 'it': 'итальянский',
-                'pt': 'португальский', 'ar': 'арабский', 'tr': 'турецкий'
-            }
-            
-            src_name = lang_names.get(src_lang, src_lang)
-            targ_name = lang_names.get(target_lang, target_lang)
-            
-            response = f"""
-📸 **Распознанный текст:**
-`{display_text}`
-
-🌐 **Язык:** {src_name.upper()} (точность: {confidence:.1f}%)
-➡️ **Перевод на {targ_name.upper()}:**
-{translation.text}
-            """
-            
-            bot.edit_message_text(response,
-                                 message.chat.id,
-                                 processing_msg.message_id,
-                                 parse_mode='Markdown')
-            
+            response = format_photo_translation(display_text, src_lang, confidence,
+                                                target_lang, translated)
+
+            outbox.edit_message_text(response,
+                                     chat_id,
+                                     processing_msg,
+                                     parse_mode='Markdown')
+
         else:
             # не удалось распознать текст
-            bot.edit_message_text("❌ Не удалось распознать текст на фото.\n\n"
-                                "**Советы для лучшего распознавания:**\n"
-                                "• Убедитесь, что текст хорошо освещён\n"
-                                "• Текст должен быть чётким и контрастным\n"
-                                "• Попробуйте сфотографировать под прямым углом\n"
-                                "• Избегайте бликов и отражений\n\n"
-                                "Можете также просто написать текст для перевода.",
-                                 message.chat.id,
-                                 processing_msg.message_id,
-                                 parse_mode='Markdown')
-        
-    except Exception as e:
-        logger.error(f"Ошибка обработки фото: {e}")
-        error_msg = f"❌ Ошибка обработки фото: `{str(e)[:100]}`"
-        bot.edit_message_text(error_msg,
-                             message.chat.id,
-                             processing_msg.message_id,
-                             parse_mode='Markdown')
-
-# обработ текста
-
-@bot.message_handler(func=lambda message: True)
-def handle_text(message):
-    """Обработка текста: ищем достопримечательности или переводим"""
-    text = message.text.strip()
-    user_id = message.from_user.id
-    
-    # проверяем команды меню
-    if text == "📸 Распознать фото":
-        bot.send_message(message.chat.id,
-                        "Отправьте фото с текстом для распознавания и перевода.\n\n"
-                        "📌 **Совет:** Фотографируйте текст чётко, без бликов.",
-                        parse_mode='Markdown')
-        return
-        
-    elif text == "📝 Переводчик":
-        bot.send_message(message.chat.id,
-                        "Напишите текст для перевода на выбранный язык.\n\n"
-                        "Пример: 'Hello, how are you?' или 'Привет, как дела?'",
-                        parse_mode='Markdown')
-        return
-        
-    elif text == "🌍 Язык перевода":
-        cmd_language(message)
-        return
-        
-    elif text == "📚 История":
-        cmd_history(message)
-        return
-        
-    elif text == "❓ Помощь":
-        cmd_help(message)
-        return
-        
-    elif text == "🏛️ Примеры достопримечательностей":
-        cmd_examples(message)
-        return
-    
-    if len(text) < 2:
-        bot.send_message(message.chat.id,
-                        "Текст слишком короткий. Напишите минимум 2 символа.",
-                        parse_mode='Markdown')
-        return
-    
-    # пробуем найти достопримечательность в тексте
-    landmark_info = find_landmark_info(text)
-    
-    if landmark_info['found']:
-        # это достопримечательность
-        response = f"""
-🏛️ **Достопримечательность найдена!**
-
-**{landmark_info['name']}**
-{landmark_info['description']}
-
-{landmark_info['fact']}
-
-📌 Английское название: {landmark_info.get('en_name', 'Нет информации')}
-
-💡 *Можете также отправить фото с названием этой достопримечательности*
-        """
-        
-        # добавляем в историю
-        add_to_history(user_id, 'text_landmark', text, landmark_info['name'], 'landmark', 'info')
-        
-        bot.reply_to(message, response, parse_mode='Markdown')
-        return
-    
-    # если не достопримечательность, делаем перевод
-    try:
-        bot.send_chat_action(message.chat.id, 'typing')
-        
-        detected = translator.detect(text)
-        src_lang = detected.lang
-        confidence = detected.confidence * 100
-        
-        target_lang = get_user_language(user_id)
-        translation = translator.translate(text, src=src_lang, dest=target_lang)
-        
-        add_to_history(user_id, 'text', text, translation.text, src_lang, target_lang)
-        
-        lang_names = {
-            'en': 'английский', 'ru': 'русский', 'de': 'немецкий',
-            'fr': 'французский', 'es': 'испанский', 'ja': 'японский',
-            'ko': 'корейский', 'zh-cn': 'китайский', 'it': 'итальянский',
-            'pt': 'португальский', 'ar': 'арабский', 'tr': 'турецкий'
+            record_result(outcome='ocr_failed')
+            outbox.edit_message_text(PHOTO_FAILED_TEXT,
+                                     chat_id,
+                                     processing_msg,
+                                     parse_mode='Markdown')
+
+    # очередь задач OCR
+
+    def _enqueue_photo(self, message, processing_msg):
+        """Фото - в очередь исполнителей OCR; ответит поток результатов"""
+        sent = processing_msg.result(current_deadline().remaining())
+        payload = {
+            'chat_id': message.chat.id,
+            'user_id': message.from_user.id,
+            'message_id': sent.message_id,
+            'photo': [{'file_id': size.file_id, 'file_unique_id': size.file_unique_id,
+                       'width': size.width, 'height': size.height} for size in message.photo],
         }
-        
-        src_name = lang_names.get(src_lang, src_lang)
-        targ_name = lang_names.get(target_lang, target_lang)
-        
-        response = f"""
-📝 **Исходный текст ({src_name.upper()}):**
-`{text}`
-
-🌐 **Язык:** {src_name.upper()} (точность: {confidence:.1f}%)
-➡️ **Перевод на {targ_name.upper()}:**
-{translation.text}
-
-💡 *Хотите узнать о достопримечательности? Напишите её название!*
-        """
-        
-        bot.reply_to(message, response, parse_mode='Markdown')
-        
-    except Exception as e:
-        bot.reply_to(message, f"❌ Ошибка перевода: `{str(e)[:100]}`", parse_mode='Markdown')
+        job_id = self.jobs.enqueue(OCR_JOB, payload, JOB_MAX_ATTEMPTS)
+        logger.info(f"Фото в очереди OCR: задача {job_id}")
+
+    def _deliver_results(self):
+        """Забор готовых задач OCR и ответы пользователям"""
+        while not self._stopped.wait(0.5):
+            try:
+                # результаты, которых уже не дождаться, отдаются как отказ
+                self.jobs.expire(JOB_RESULT_TIMEOUT)
+                for job in self.jobs.completed([OCR_JOB]):
+                    with self._delivering_lock:
+                        if job.id in self._delivering:
+                            continue
+                        self._delivering.add(job.id)
+                    self._delivery_pool.submit(self._deliver_job, job)
+            except Exception as e:
+                logger.error(f"Ошибка очереди задач: {e}")
+                ERRORS.inc(stage='jobqueue')
+
+    @with_deadline(PHOTO_DEADLINE)
+    def _deliver_job(self, job):
+        payload = job.payload
+        chat_id = payload['chat_id']
+        try:
+            if job.status == DONE:
+                self._reply_recognized(payload['user_id'], chat_id, payload['message_id'],
+                                       job.result.get('text'))
+            elif job.error == 'expired':
+                self.outbox.edit_message_text(PHOTO_TIMEOUT_TEXT, chat_id, payload['message_id'])
+            else:
+                logger.error(f"Задача OCR {job.id} не выполнена: {job.error}")
+                self.outbox.edit_message_text(PHOTO_FAILED_TEXT, chat_id, payload['message_id'],
+                                              parse_mode='Markdown')
+        except Exception as e:
+            logger.error(f"Ошибка отправки результата задачи {job.id}: {e}")
+            ERRORS.inc(stage='jobqueue')
+        finally:
+            # без повторов: лучше потерять ответ, чем слать его по кругу
+            try:
+                self.jobs.mark_delivered(job.id)
+            finally:
+                with self._delivering_lock:
+                    self._delivering.discard(job.id)
 
-# обработчик callback
+    # обработ текста
 
-@bot.callback_query_handler(func=lambda call: True)
-def callback_handler(call):
-    """Обработка callback (выбор языка)"""
-    try:
-        if call.data.startswith("lang_"):
-            lang = call.data[5:]
-            user_id = call.from_user.id
-            set_user_language(user_id, lang)
-            
-            lang_names = {
-                'en': 'английский', 'de': 'немецкий', 'fr': 'французский',
-                'es': 'испанский', 'ja': 'японский', 'ko': 'корейский',
-                'ru': 'русский', 'it': 'итальянский', 'pt': 'португальский',
-                'ar': 'арабский', 'tr': 'турецкий', 'zh-cn': 'китайский'
-            }
-            
-            lang_name = lang_names.get(lang, lang)
-            
-            bot.answer_callback_query(call.id, f"Язык перевода: {lang_name}")
-            bot.edit_message_text(
-                f"✅ Язык перевода установлен: **{lang_name.upper()}**\n\n"
-                f"Теперь весь текст будет переводиться на {lang_name}.",
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='Markdown'
-            )
-            
-    except Exception as e:
-        bot.answer_callback_query(call.id, f"Ошибка: {str(e)[:50]}")
+    @timed(HANDLER_SECONDS, handler='text')
+    @with_deadline(TEXT_DEADLINE)
+    def handle_text(self, message):
+        """Обработка текста: ищем достопримечательности или переводим"""
+        text = message.text.strip()
+        user_id = message.from_user.id
+        outbox = self.outbox
+
+        # проверяем команды меню
+        if text == BUTTON_PHOTO:
+            outbox.send_message(message.chat.id, PHOTO_HINT_TEXT, parse_mode='Markdown')
+            return
+
+        elif text == BUTTON_TRANSLATOR:
+            outbox.send_message(message.chat.id, TRANSLATOR_HINT_TEXT, parse_mode='Markdown')
+            return
+
+        elif text == BUTTON_LANGUAGE:
+            self.cmd_language(message)
+            return
+
+        elif text == BUTTON_HISTORY:
+            self.cmd_history(message)
+            return
+
+        elif text == BUTTON_HELP:
+            self.cmd_help(message)
+            return
+
+        elif text == BUTTON_EXAMPLES:
+            self.cmd_examples(message)
+            return
+
+        if len(text) < 2:
+            outbox.send_message(message.chat.id, SHORT_TEXT, parse_mode='Markdown')
+            return
+
+        # пробуем найти достопримечательность в тексте
+        landmark_info = find_landmark_info(text)
+
+        if landmark_info['found']:
+            # это достопримечательность: готовая карточка на языке пользователя
+            response = self.landmark_cards.get('text', landmark_info, get_user_language(user_id))
+
+            # добавляем в историю
+            add_to_history(user_id, 'text_landmark', text, landmark_info['name'], 'landmark', 'info')
+            record_result(outcome='landmark', landmark=landmark_info['name'])
+
+            outbox.reply_to(message, response, parse_mode='Markdown')
+            return
+
+        # если не достопримечательность, делаем перевод
+        try:
+            outbox.submit(message.chat.id, 'send_chat_action', message.chat.id, 'typing')
+
+            target_lang = get_user_language(user_id)
+            src_lang, confidence, translated = self.translate_text(text, target_lang)
+
+            add_to_history(user_id, 'text', text, translated, src_lang, target_lang)
+            record_result(outcome='translation', src_lang=src_lang, target_lang=target_lang)
+
+            response = format_text_translation(text, src_lang, confidence, target_lang, translated)
+
+            outbox.reply_to(message, response, parse_mode='Markdown')
+
+        except (DeadlineExceeded, CircuitOpenError) as e:
+            logger.warning(f"Текст без перевода: {e}")
+            ERRORS.inc(stage='translate')
+            record_result(outcome='untranslated')
+            outbox.reply_to(message, TRANSLATE_UNAVAILABLE_TEXT)
+
+        except Exception as e:
+            ERRORS.inc(stage='translate')
+            record_result(outcome='error')
+            outbox.reply_to(message, f"❌ Ошибка перевода: `{str(e)[:100]}`", parse_mode='Markdown')
+
+    # обработчик callback
+
+    def callback_handler(self, call):
+        """Обработка callback (выбор языка)"""
+        try:
+            if call.data.startswith("lang_"):
+                lang = call.data[5:]
+                user_id = call.from_user.id
+                set_user_language(user_id, lang)
+
+                lang_name = LANG_NAMES.get(lang, lang)
+
+                self.bot.answer_callback_query(call.id, f"Язык перевода: {lang_name}")
+                self.outbox.edit_message_text(
+                    format_language_set(lang),
+                    call.message.chat.id,
+                    call.message.message_id,
+                    parse_mode='Markdown'
+                )
+
+        except Exception as e:
+            self.bot.answer_callback_query(call.id, f"Ошибка: {str(e)[:50]}")
+
+    # диспетчер
+
+    def reject_update(self, update, lane):
+        """Ответ на апдейт, не поместившийся в очередь"""
+        ERRORS.inc(stage=f'rejected_{lane}')
+        chat_id = update_chat_id(update)
+        if chat_id is not None and update.message is not None:
+            self.outbox.send_message(chat_id, "⏳ Сейчас слишком много запросов, попробуйте через минуту.")
+
+    def notify_queued(self, update, position):
+        """Быстрый ответ на фото сверх лимита: оно в очереди"""
+        self.outbox.send_message(update_chat_id(update),
+                                 f"⏳ Фото в очереди, позиция {position}. Лимит фото исчерпан, обработаю чуть позже.")
+
+    def _create_dispatcher(self):
+        """Диспетчер апдейтов с отдельными пулами для фото и текста"""
+        return Dispatcher(lambda update: self.bot.process_new_updates([update]),
+                          heavy_workers=HEAVY_WORKERS,
+                          light_workers=LIGHT_WORKERS,
+                          heavy_queue_limit=HEAVY_QUEUE_LIMIT,
+                          light_queue_limit=LIGHT_QUEUE_LIMIT,
+                          on_reject=self.reject_update,
+                          user_limiter=KeyedRateLimiter(USER_PHOTO_RATE / 60, USER_PHOTO_BURST),
+                          chat_limiter=KeyedRateLimiter(CHAT_PHOTO_RATE / 60, CHAT_PHOTO_BURST),
+                          user_queue_limit=USER_PHOTO_QUEUE_LIMIT,
+                          on_queued=self.notify_queued)
+
+
+def create_app(token=TOKEN):
+    """Фабрика приложения: созданное и подготовленное, но ещё не запущенное"""
+    return LangHelperApp(token).setup()
 
 # заупск бота
 
 if __name__ == '__main__':
+    try:
+        app = create_app()
+    except ValueError as e:
+        print(f"ОШИБКА: {e}")
+        exit(1)
+
     print("=" * 60)
     print("🚀 ЗАПУСК ИИ-ПЕРЕВОДЧИКА ДЛЯ ПУТЕШЕСТВИЙ")
     print("=" * 60)
     print("📁 База данных:", DB_FILE)
     print("🔍 Поиск достопримечательностей: ✅ Включён")
-    print("📸 Распознавание фото: ✅ Включено (OCR)")
+    print("📸 Распознавание фото: ✅ Включено (OCR, модели загружаются в фоне)")
     print("🌍 Поддерживаемых языков: 100+")
+    print(f"⚙️ Потоки: фото {HEAVY_WORKERS}, текст {LIGHT_WORKERS}")
+    print(f"📡 Режим: {RUN_MODE}")
     print("=" * 60)
     print("\n🤖 Бот запущен! Ожидаю запросы...")
-    
+
+    app.start()
     try:
-        bot.infinity_polling()
+        app.run()
     except KeyboardInterrupt:
         print("\n✅ Бот остановлен пользователем")
     except Exception as e:
-        print(f"❌ Критическая ошибка: {e}")
\ No newline at end of file
+        print(f"❌ Критическая ошибка: {e}")
+    finally:
+        app.stop()
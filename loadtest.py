@@ -0,0 +1,326 @@
+"""
+Нагрузочный тест бота на локальных заглушках Bot API и переводчика
+
+    python loadtest.py --mix text=70,photo=25,album=5 --rate 20 --count 500
+    python loadtest.py --mode webhook --rate 20 --count 500
+
+Запускает бота подпроцессом (TELEGRAM_API_URL и TRANSLATE_URL указывают на
+заглушки), подаёт апдейты с заданной частотой и считает задержку до первого
+ответа и до итогового ответа по каждому типу апдейтов. В режиме webhook
+заглушка Bot API сама отправляет апдейты на webhook-сервер бота.
+"""
+import argparse
+import json
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmark import SAMPLE_TEXTS, summarize, find_font, make_text_image
+from fake_servers import FakeBotApiServer, FakeTranslateServer
+
+# промежуточные ответы бота на фото (не итоговые)
+STATUS_PREFIXES = ("📸", "🌍", "⏳ Фото в очереди")
+REJECT_PREFIX = "⏳ Сейчас слишком много запросов"
+
+TEXT_SAMPLES = ["Где находится вокзал?", "How much is the ticket?", "Guten Morgen",
+                "Эйфелева башня", "I visited the Colosseum", "биг бен лондон",
+                "Where is the nearest pharmacy?", "Спасибо большое", "Bonjour, ça va?"]
+
+PHOTO_SIZES = [(90, 68), (320, 240), (800, 600), (1280, 960)]
+
+BOT_TOKEN = "123456:loadtest"
+
+
+class Request:
+    """Один апдейт (или альбом) и ответы на него"""
+
+    def __init__(self, kind, expected):
+        self.kind = kind
+        self.expected = expected
+        self.sent_at = None
+        self.first_at = None
+        self.finals = 0
+        self.done_at = None
+        self.rejected = False
+
+
+class Tracker:
+    """Сопоставление ответов бота с отправленными апдейтами по чату"""
+
+    def __init__(self):
+        self.requests = {}
+        self.lock = threading.Lock()
+        self.all_done = threading.Condition(self.lock)
+        self.open = 0
+
+    def add(self, chat_id, request):
+        with self.lock:
+            self.requests[chat_id] = request
+            self.open += 1
+
+    def on_message(self, record):
+        with self.lock:
+            request = self.requests.get(record['chat_id'])
+            if request is None or request.done_at is not None:
+                return
+            now = record['time']
+            if request.first_at is None:
+                request.first_at = now
+            text = record['text']
+            if text.startswith(STATUS_PREFIXES):
+                return
+            if text.startswith(REJECT_PREFIX):
+                request.rejected = True
+            request.finals += 1
+            if request.finals >= request.expected or request.rejected:
+                request.done_at = now
+                self.open -= 1
+                self.all_done.notify_all()
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while self.open and time.monotonic() < deadline:
+                self.all_done.wait(deadline - time.monotonic())
+            return self.open
+
+
+class Traffic:
+    """Генерация апдейтов text / photo / album"""
+
+    def __init__(self, api, seed, image_pool):
+        self.api = api
+        self.rng = random.Random(seed)
+        self.next_chat = 10_000
+        self.next_message = 1
+        self.photos = self._build_photos(image_pool)
+
+    def _build_photos(self, pool_size):
+        """Набор фото: у каждого несколько размеров, как в Telegram"""
+        from PIL import ImageFont
+        photos = []
+        scripts = list(SAMPLE_TEXTS)
+        for i in range(pool_size):
+            script = scripts[i % len(scripts)]
+            sizes = []
+            for width, height in PHOTO_SIZES:
+                font = find_font(script, max(10, width // 16)) or ImageFont.load_default()
+                content = make_text_image(SAMPLE_TEXTS[script], font, (width, height))
+                file_id = f"photo{i}_{width}"
+                self.api.add_file(file_id, content)
+                sizes.append({'file_id': file_id, 'file_unique_id': f"u{i}_{width}",
+                              'width': width, 'height': height, 'file_size': len(content)})
+            photos.append(sizes)
+        return photos
+
+    def _message(self, chat_id, **fields):
+        message = {'message_id': self.next_message, 'date': int(time.time()),
+                   'chat': {'id': chat_id, 'type': 'private', 'first_name': 'Load'},
+                   'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Load',
+                            'username': f'load{chat_id}'}}
+        message.update(fields)
+        self.next_message += 1
+        return {'message': message}
+
+    def make(self, kind):
+        """Апдейты одного запроса: (чат, [апдейты], число итоговых ответов)"""
+        chat_id = self.next_chat
+        self.next_chat += 1
+        if kind == 'text':
+            return chat_id, [self._message(chat_id, text=self.rng.choice(TEXT_SAMPLES))], 1
+        if kind == 'photo':
+            return chat_id, [self._message(chat_id, photo=self.rng.choice(self.photos))], 1
+        if kind == 'album':
+            count = self.rng.randint(2, 5)
+            group = f"album{chat_id}"
+            updates = [self._message(chat_id, photo=self.rng.choice(self.photos),
+                                     media_group_id=group) for _ in range(count)]
+            return chat_id, updates, count
+        raise ValueError(f"неизвестный тип апдейта: {kind}")
+
+
+def parse_mix(value):
+    """'text=70,photo=25,album=5' -> [('text', 70.0), ...]"""
+    mix = []
+    for part in value.split(','):
+        kind, _, weight = part.partition('=')
+        mix.append((kind.strip(), float(weight or 1)))
+    return mix
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def webhook_env(port, path, secret):
+    """Окружение бота для webhook-режима; WEBHOOK_URL не задаём - адрес не регистрируется"""
+    return {'RUN_MODE': 'webhook', 'WEBHOOK_HOST': '127.0.0.1', 'WEBHOOK_PORT': str(port),
+            'WEBHOOK_PATH': path, 'WEBHOOK_SECRET': secret}
+
+
+def start_bot(script, api_url, translate_url, workdir, extra_env):
+    env = dict(os.environ)
+    env.update({
+        'BOT_TOKEN': BOT_TOKEN,
+        'TELEGRAM_API_URL': api_url,
+        'TRANSLATE_BACKEND': 'gtx',
+        'TRANSLATE_URL': translate_url,
+        'RUN_MODE': 'polling',
+        'LANDMARKS_WATCH_INTERVAL': '0',
+    })
+    env.update(extra_env)
+    log = open(os.path.join(workdir, 'bot.log'), 'w')
+    return subprocess.Popen([sys.executable, os.path.abspath(script)], cwd=workdir, env=env,
+                            stdout=log, stderr=subprocess.STDOUT)
+
+
+def report(tracker, elapsed):
+    """Сводка по типам апдейтов (задержки в миллисекундах)"""
+    by_kind = {}
+    for request in tracker.requests.values():
+        by_kind.setdefault(request.kind, []).append(request)
+
+    results = {}
+    for kind, requests in sorted(by_kind.items()):
+        done = [r for r in requests if r.done_at is not None and not r.rejected]
+        first = [(r.first_at - r.sent_at) * 1000 for r in requests if r.first_at is not None]
+        final = [(r.done_at - r.sent_at) * 1000 for r in done]
+        results[kind] = {
+            'sent': len(requests),
+            'completed': len(done),
+            'rejected': sum(1 for r in requests if r.rejected),
+            'timed_out': sum(1 for r in requests if r.done_at is None),
+            'throughput_per_sec': len(done) / elapsed if elapsed else 0.0,
+            'first_response_ms': summarize(first),
+            'final_response_ms': summarize(final),
+        }
+    return results
+
+
+def print_report(results, elapsed):
+    print(f"\n⏱ Длительность: {elapsed:.1f} с")
+    for kind, item in results.items():
+        final = item['final_response_ms']
+        first = item['first_response_ms']
+        print(f"\n{kind}: отправлено {item['sent']}, готово {item['completed']}, "
+              f"отклонено {item['rejected']}, без ответа {item['timed_out']}, "
+              f"{item['throughput_per_sec']:.2f}/с")
+        print(f"  первый ответ  p50 {first['p50']:.0f}  p95 {first['p95']:.0f}  "
+              f"p99 {first['p99']:.0f} мс")
+        print(f"  итоговый      p50 {final['p50']:.0f}  p95 {final['p95']:.0f}  "
+              f"p99 {final['p99']:.0f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота на локальных заглушках")
+    parser.add_argument('--mix', default='text=70,photo=25,album=5',
+                        help="доли типов апдейтов: text, photo, album")
+    parser.add_argument('--rate', type=float, default=10, help="запросов в секунду")
+    parser.add_argument('--count', type=int, default=200, help="всего запросов")
+    parser.add_argument('--bot', default='langhelperbot.py',
+                        help="скрипт бота (langhelperbot.py или async_bot.py)")
+    parser.add_argument('--mode', choices=('polling', 'webhook'), default='polling',
+                        help="как бот получает апдейты (webhook есть только в langhelperbot.py)")
+    parser.add_argument('--no-spawn', action='store_true',
+                        help="не запускать бота: он уже работает с адресами заглушек")
+    parser.add_argument('--api-port', type=int, default=0)
+    parser.add_argument('--translate-port', type=int, default=0)
+    parser.add_argument('--webhook-port', type=int, default=0,
+                        help="порт webhook-сервера бота (по умолчанию свободный)")
+    parser.add_argument('--webhook-secret', default=secrets.token_hex(16),
+                        help="WEBHOOK_SECRET бота (для --no-spawn)")
+    parser.add_argument('--translate-delay', type=float, default=0.05,
+                        help="задержка заглушки переводчика (секунды)")
+    parser.add_argument('--photos', type=int, default=8, help="разных фото в наборе")
+    parser.add_argument('--startup-timeout', type=float, default=600,
+                        help="сколько ждать первого getUpdates от бота")
+    parser.add_argument('--drain-timeout', type=float, default=120,
+                        help="сколько ждать ответов после отправки последнего апдейта")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--env', action='append', default=[],
+                        help="переменная окружения бота, KEY=VALUE (можно несколько)")
+    parser.add_argument('--output', help="JSON с результатами")
+    args = parser.parse_args()
+
+    tracker = Tracker()
+    bot_env = {}
+    webhook_url = None
+    if args.mode == 'webhook':
+        port = args.webhook_port or free_port()
+        webhook_url = f"http://127.0.0.1:{port}/webhook"
+        bot_env = webhook_env(port, '/webhook', args.webhook_secret)
+    api = FakeBotApiServer(port=args.api_port, on_message=tracker.on_message,
+                           webhook_url=webhook_url, webhook_secret=args.webhook_secret).start()
+    translate = FakeTranslateServer(port=args.translate_port, delay=args.translate_delay).start()
+    print(f"Bot API: {api.url}, переводчик: {translate.url}")
+
+    traffic = Traffic(api, args.seed, args.photos)
+    mix = parse_mix(args.mix)
+    kinds = [kind for kind, _ in mix]
+    weights = [weight for _, weight in mix]
+
+    process = None
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    if not args.no_spawn:
+        bot_env.update(item.split('=', 1) for item in args.env)
+        process = start_bot(args.bot, api.url, translate.url, workdir, bot_env)
+        print(f"Бот запущен (pid {process.pid}), лог: {os.path.join(workdir, 'bot.log')}")
+
+    try:
+        if not api.wait_ready(args.startup_timeout):
+            if webhook_url:
+                print(f"❌ Webhook-сервер бота не ответил на {webhook_url}")
+            else:
+                print("❌ Бот не начал опрос getUpdates")
+            return 1
+
+        print(f"Отправка {args.count} запросов, {args.rate}/с...")
+        start = time.monotonic()
+        for i in range(args.count):
+            # равномерный темп: не догоняем, если отстали
+            delay = start + i / args.rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            kind = traffic.rng.choices(kinds, weights)[0]
+            chat_id, updates, expected = traffic.make(kind)
+            request = Request(kind, expected)
+            tracker.add(chat_id, request)
+            request.sent_at = time.monotonic()
+            for update in updates:
+                api.push_update(update)
+
+        left = tracker.wait(args.drain_timeout)
+        elapsed = time.monotonic() - start
+        if left:
+            print(f"⚠️ Без итогового ответа: {left}")
+        if api.webhook_errors:
+            print(f"⚠️ Не доставлено на webhook: {api.webhook_errors}")
+
+        results = report(tracker, elapsed)
+        print_report(results, elapsed)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({'args': vars(args), 'elapsed': elapsed, 'results': results}, f,
+                          ensure_ascii=False, indent=2)
+        return 0
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        api.stop()
+        translate.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,289 @@
+import re
+from datetime import datetime
+
+from telebot import types
+
+# языки перевода (кнопки выбора языка)
+LANGUAGES = [
+    ("🇬🇧 Английский", "en"),
+    ("🇩🇪 Немецкий", "de"),
+    ("🇫🇷 Французский", "fr"),
+    ("🇪🇸 Испанский", "es"),
+    ("🇯🇵 Японский", "ja"),
+    ("🇰🇷 Корейский", "ko"),
+    ("🇷🇺 Русский", "ru"),
+    ("🇮🇹 Итальянский", "it"),
+    ("🇵🇹 Португальский", "pt"),
+    ("🇦🇪 Арабский", "ar"),
+    ("🇹🇷 Турецкий", "tr"),
+    ("🇨🇳 Китайский", "zh-cn")
+]
+
+LANG_NAMES = {
+    'en': 'английский', 'ru': 'русский', 'de': 'немецкий',
+    'fr': 'французский', 'es': 'испанский', 'zh-cn': 'китайский',
+    'ja': 'японский', 'ko': 'корейский', 'it': 'итальянский',
+    'pt': 'португальский', 'ar': 'арабский', 'tr': 'турецкий'
+}
+
+# кнопки главного меню
+BUTTON_PHOTO = "📸 Распознать фото"
+BUTTON_TRANSLATOR = "📝 Переводчик"
+BUTTON_LANGUAGE = "🌍 Язык перевода"
+BUTTON_HISTORY = "📚 История"
+BUTTON_HELP = "❓ Помощь"
+BUTTON_EXAMPLES = "🏛️ Примеры достопримечательностей"
+
+# тексты
+
+WELCOME_TEXT = """
+Привет, {first_name}! 🎉 Я ИИ-переводчик для путешествий
+
+Я помогу тебе:
+📸 Распознаю текст с фото (вывески, меню, указатели)
+🏛️ Определю достопримечательности по названию
+🌍 Переведу на 100+ языков
+📚 Сохраню историю переводов
+
+**Как пользоваться:**
+1. Отправь фото с текстом → получи перевод
+2. Напиши название достопримечательности → узнай о ней
+3. Напиши любой текст → получи перевод
+
+Примеры достопримечательностей:
+Эйфелева башня, Красная площадь, Колизей, Статуя Свободы, Тадж-Махал
+    """
+
+HELP_TEXT = """
+📚 **Помощь по использованию:**
+
+📸 **Для фото с текстом:**
+1. Сфотографируйте текст (вывеску, меню, указатель)
+2. Отправьте фото боту
+3. Получите перевод или информацию о достопримечательности
+
+🏛️ **Для определения достопримечательностей:**
+• Напишите название (например: "Эйфелева башня")
+• Или отправьте фото с названием достопримечательности
+
+🌍 **Для перевода текста:**
+• Просто напишите текст на любом языке
+• Бот определит язык и переведёт
+
+📋 **Примеры запросов:**
+• Фото с надписью "Eiffel Tower"
+• Текст "Красная площадь Москва"
+• "Where is Colosseum?" (переведёт и найдёт Колизей)
+
+🔧 **Команды:**
+/start - начало работы
+/help - эта справка
+/language - выбрать язык перевода
+/history - показать историю
+/clear - очистить историю
+/export - выгрузить всю историю файлом (csv или jsonl)
+/stats - статистика запросов
+/examples - примеры достопримечательностей
+    """
+
+EXAMPLES_TEXT = """
+🏛️ **Примеры достопримечательностей для поиска:**
+
+**Россия:**
+• Красная площадь
+• Московский Кремль
+• Эрмитаж
+• Петергоф
+• Собор Василия Блаженного
+
+**Европа:**
+• Эйфелева башня (Eiffel Tower)
+• Лувр (Louvre)
+• Колизей (Colosseum)
+• Биг-Бен (Big Ben)
+• Собор Святого Петра
+
+**Америка:**
+• Статуя Свободы (Statue of Liberty)
+• Белый дом (White House)
+• Гора Рашмор
+
+**Азия:**
+• Великая Китайская стена (Great Wall of China)
+• Тадж-Махал (Taj Mahal)
+• Фудзияма (Mount Fuji)
+• Ангкор-Ват (Angkor Wat)
+
+**Отправьте название на русском или английском!**
+    """
+
+PHOTO_HINT_TEXT = ("Отправьте фото с текстом для распознавания и перевода.\n\n"
+                   "📌 **Совет:** Фотографируйте текст чётко, без бликов.")
+
+TRANSLATOR_HINT_TEXT = ("Напишите текст для перевода на выбранный язык.\n\n"
+                        "Пример: 'Hello, how are you?' или 'Привет, как дела?'")
+
+SHORT_TEXT = "Текст слишком короткий. Напишите минимум 2 символа."
+
+PHOTO_FAILED_TEXT = ("❌ Не удалось распознать текст на фото.\n\n"
+                     "**Советы для лучшего распознавания:**\n"
+                     "• Убедитесь, что текст хорошо освещён\n"
+                     "• Текст должен быть чётким и контрастным\n"
+                     "• Попробуйте сфотографировать под прямым углом\n"
+                     "• Избегайте бликов и отражений\n\n"
+                     "Можете также просто написать текст для перевода.")
+
+PHOTO_TIMEOUT_TEXT = "⏳ Не успел обработать фото, попробуйте отправить его ещё раз."
+
+OCR_WARMING_TEXT = "⏳ Загружаю модели распознавания после запуска, фото обработаю через минуту..."
+
+OCR_UNAVAILABLE_TEXT = ("❌ Распознавание фото сейчас недоступно.\n\n"
+                        "Напишите текст сообщением - я переведу его.")
+
+TRANSLATE_UNAVAILABLE_TEXT = "⏳ Перевод сейчас недоступен, попробуйте через минуту."
+
+EXPORT_STARTED_TEXT = "📦 Готовлю выгрузку истории, пришлю файлом..."
+
+EXPORT_FAILED_TEXT = "❌ Не удалось выгрузить историю, попробуйте позже."
+
+EXPORT_BUSY_TEXT = "⏳ Выгрузка истории уже готовится, пришлю файл, как только она закончится."
+
+# клавиатуры
+
+def get_main_keyboard():
+    """Главное меню"""
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    markup.row(BUTTON_PHOTO, BUTTON_TRANSLATOR)
+    markup.row(BUTTON_LANGUAGE, BUTTON_HISTORY)
+    markup.row(BUTTON_HELP, BUTTON_EXAMPLES)
+    return markup
+
+def get_lang_keyboard():
+    """Выбор языка"""
+    markup = types.InlineKeyboardMarkup(row_width=3)
+    for name, code in LANGUAGES:
+        markup.add(types.InlineKeyboardButton(name, callback_data=f"lang_{code}"))
+    return markup
+
+# форматирование ответов
+
+def escape_markdown(text):
+    """Экранирование символов разметки Markdown (_ * ` [) в подставляемом тексте"""
+    return re.sub(r'([_*`\[])', r'\\\1', text)
+
+def shorten(text, limit):
+    """Обрезка длинного текста для показа"""
+    return text[:limit] + "..." if len(text) > limit else text
+
+def format_photo_landmark(card, display_text):
+    """Ответ на фото с достопримечательностью"""
+    return card + f"""
+📝 **Текст на фото:**
+`{display_text}`
+
+🔍 Определено по распознанному тексту
+                """
+
+def format_photo_visual(card, score):
+    """Ответ на фото, где достопримечательность узнана по изображению"""
+    return card + f"""
+🔍 Определено по изображению (сходство {score:.0%})
+                """
+
+def format_photo_translation(display_text, src_lang, confidence, target_lang, translated):
+    """Ответ на фото с переводом"""
+    src_name = LANG_NAMES.get(src_lang, src_lang)
+    targ_name = LANG_NAMES.get(target_lang, target_lang)
+    return f"""
+📸 **Распознанный текст:**
+`{display_text}`
+
+🌐 **Язык:** {src_name.upper()} (точность: {confidence:.1f}%)
+➡️ **Перевод на {targ_name.upper()}:**
+{translated}
+            """
+
+def format_photo_untranslated(display_text):
+    """Ответ на фото, когда перевод недоступен: только распознанный текст"""
+    return f"""
+📸 **Распознанный текст:**
+`{display_text}`
+
+⏳ Перевод сейчас недоступен, попробуйте через минуту.
+            """
+
+def format_text_translation(text, src_lang, confidence, target_lang, translated):
+    """Ответ на текст с переводом"""
+    src_name = LANG_NAMES.get(src_lang, src_lang)
+    targ_name = LANG_NAMES.get(target_lang, target_lang)
+    return f"""
+📝 **Исходный текст ({src_name.upper()}):**
+`{text}`
+
+🌐 **Язык:** {src_name.upper()} (точность: {confidence:.1f}%)
+➡️ **Перевод на {targ_name.upper()}:**
+{translated}
+
+💡 *Хотите узнать о достопримечательности? Напишите её название!*
+        """
+
+def format_history(history):
+    """Список последних запросов"""
+    response = "📚 **Последние 10 запросов:**\n\n"
+
+    for i, (type_, orig, trans, src, targ, time) in enumerate(history, 1):
+        icon = "📸" if 'photo' in type_ else "📝"
+        if 'landmark' in type_:
+            icon = "🏛️"
+
+        orig_display = shorten(orig, 40)
+        trans_display = shorten(trans, 40)
+
+        try:
+            time_str = datetime.strptime(time, "%Y-%m-%d %H:%M:%S").strftime("%d.%m %H:%M")
+        except:
+            time_str = time[:16]
+
+        response += f"{icon} **{i}.** `{orig_display}`\n"
+        response += f"   → `{trans_display}`\n"
+        response += f"   🌐 `{src.upper()} → {targ.upper()}` | 🕒 {time_str}\n\n"
+
+    return response
+
+def format_language_set(lang):
+    """Подтверждение выбора языка"""
+    lang_name = LANG_NAMES.get(lang, lang)
+    return (f"✅ Язык перевода установлен: **{lang_name.upper()}**\n\n"
+            f"Теперь весь текст будет переводиться на {lang_name}.")
+
+def format_stats(stats, admin=False):
+    """Статистика: своя активность, популярное и (для администратора) по дням"""
+    response = "📊 **Статистика**\n\n"
+
+    user = stats['user']
+    if user:
+        requests, photos, landmarks, first_at, last_at = user
+        response += (f"👤 **Ваши запросы:** {requests} (фото: {photos}, "
+                     f"достопримечательности: {landmarks})\n"
+                     f"   с {first_at[:10]}, последний {last_at[:16]}\n\n")
+    else:
+        response += "👤 У вас пока нет запросов\n\n"
+
+    if stats['landmarks']:
+        response += "🏛️ **Популярные достопримечательности:**\n"
+        for name, count in stats['landmarks']:
+            response += f"• {name} — {count}\n"
+        response += "\n"
+
+    if stats['pairs']:
+        response += "🌐 **Частые переводы:**\n"
+        for src, targ, count in stats['pairs']:
+            response += f"• `{src.upper()} → {targ.upper()}` — {count}\n"
+        response += "\n"
+
+    if admin and stats['daily']:
+        response += "📅 **По дням (запросы / фото / достопр. / пользователи):**\n"
+        for day, requests, photos, landmarks, users in stats['daily']:
+            response += f"`{day}` {requests} / {photos} / {landmarks} / {users}\n"
+
+    return response
@@ -0,0 +1,272 @@
+import asyncio
+import bisect
+import functools
+import threading
+import time
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# границы корзин гистограмм (секунды): от быстрых запросов к бд до OCR
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"'))
+                    for name, value in pairs)
+    return '{' + body + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric:
+    """Общее для всех метрик: имя, описание, метки и значения по меткам"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Счётчик, который только растёт"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Текущее значение; set_function - значение считается при каждом запросе"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, description, labelnames=()):
+        super().__init__(name, description, labelnames)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, func, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._functions[key] = func
+
+    def render(self):
+        with self._lock:
+            functions = list(self._functions.items())
+        for key, func in functions:
+            try:
+                value = func()
+            except Exception as e:
+                logger.error(f"Ошибка метрики {self.name}: {e}")
+                continue
+            with self._lock:
+                self._values[key] = value
+        return super().render()
+
+
+class _HistogramValue:
+
+    def __init__(self, buckets):
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram(Metric):
+    """Распределение длительностей по корзинам"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(buckets)
+        # listener(histogram, value, labels) на каждое наблюдение (запись апдейтов)
+        self.listeners = []
+
+    def observe(self, value, **labels):
+        for listener in self.listeners:
+            listener(self, value, labels)
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                item = self._values[key] = _HistogramValue(self.buckets)
+            if index < len(self.buckets):
+                item.counts[index] += 1
+            item.total += value
+            item.count += 1
+
+    def time(self, **labels):
+        """Контекстный менеджер: длительность блока"""
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, list(item.counts), item.total, item.count)
+                           for key, item in self._values.items())
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, ('le', '+Inf'))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class _Timer:
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def timed(histogram, **labels):
+    """Декоратор: длительность каждого вызова функции (обычной или async)"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start, **labels)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+
+class Registry:
+    """Все метрики процесса"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        """Текстовый формат Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# метрики бота
+
+STAGE_SECONDS = Histogram('langhelper_stage_seconds',
+                          'Длительность этапов обработки (download, decode, landmark, detect, translate)',
+                          ['stage'])
+OCR_READER_SECONDS = Histogram('langhelper_ocr_reader_seconds',
+                               'Длительность распознавания одним читателем OCR', ['reader'])
+DB_SECONDS = Histogram('langhelper_db_seconds', 'Длительность запросов к бд', ['op'])
+HANDLER_SECONDS = Histogram('langhelper_handler_seconds', 'Полное время обработки апдейта',
+                            ['handler'])
+CACHE_REQUESTS = Counter('langhelper_cache_requests_total', 'Обращения к кэшам', ['cache', 'result'])
+ERRORS = Counter('langhelper_errors_total', 'Ошибки по этапам', ['stage'])
+QUEUE_DEPTH = Gauge('langhelper_queue_depth', 'Число задач в очередях', ['queue'])
+OCR_WORKER_MEMORY = Gauge('langhelper_ocr_worker_memory_bytes',
+                          'Память процессов OCR: rss, pss и своя (uss)', ['worker', 'kind'])
+
+
+# HTTP endpoint
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Отдача метрик в формате Prometheus"""
+
+    server_version = "langhelperbot"
+
+    def do_GET(self):
+        if self.path != '/metrics':
+            self._reply(404, 'text/plain', b'not found')
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self._reply(200, 'text/plain; version=0.0.4; charset=utf-8', body)
+
+    def _reply(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class MetricsServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+
+def start_metrics_server(host, port):
+    """Сервер метрик в фоновом потоке"""
+    server = MetricsServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+    thread.start()
+    print(f"📊 Метрики: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,256 @@
+import numpy as np
+from PIL import Image
+import io
+import logging
+import threading
+
+from resilience import DeadlineExceeded, deadline_expired
+from metrics import STAGE_SECONDS, OCR_READER_SECONDS, ERRORS, OCR_WORKER_MEMORY, QUEUE_DEPTH
+from config import OCR_BACKEND, ONNX_MODEL_DIR, ONNX_QUANTIZE, OCR_SHM_SLOT_MB, OCR_SHM_SLOTS
+from resources import apply_threads
+
+logger = logging.getLogger(__name__)
+
+# читатели OCR по группам языков
+readers = {}
+
+# загрузка моделей завершена (успешно или нет)
+_loaded = threading.Event()
+
+# пул процессов OCR (start_worker_pool), иначе распознавание в этом процессе
+_pool = None
+
+# языки каждого читателя; кириллический пробуется первым
+READER_CONFIGS = {
+    'cyrillic': ['en', 'ru'],
+    'japanese': ['ja', 'en'],
+    'korean': ['ko', 'en'],
+    'europe': ['en', 'de', 'fr', 'es'],
+}
+
+def init_readers(threads=None):
+    """Инициализация нейросети OCR; threads - потоков torch и OpenCV на распознавание"""
+    global readers
+    print("Инициализация нейросети EasyOCR...")
+    try:
+        # easyocr тянет за собой torch и cv2: импорт только при загрузке моделей
+        import easyocr
+        if threads:
+            apply_threads(threads)
+        readers = {name: easyocr.Reader(langs, gpu=False)
+                   for name, langs in READER_CONFIGS.items()}
+        
+        print("Нейросеть OCR загружена")
+    except Exception as e:
+        print(f"Ошибка загрузки OCR: {e}")
+        try:
+            readers = {'english': easyocr.Reader(['en'], gpu=False)}
+            print("Загружен только английский")
+        except:
+            print("Критическая ошибка: не удалось загрузить OCR")
+            _loaded.set()
+            return False
+    if OCR_BACKEND == 'onnx':
+        try:
+            from ocr_onnx import enable_onnx
+            enable_onnx(readers, READER_CONFIGS, ONNX_MODEL_DIR, ONNX_QUANTIZE)
+            print("OCR переведён на ONNX Runtime")
+        except Exception as e:
+            # остаёмся на PyTorch
+            print(f"Ошибка ONNX Runtime, OCR на PyTorch: {e}")
+    _loaded.set()
+    return True
+
+def start_worker_pool(workers, threads=1, pin=False):
+    """
+    Распознавание в процессах с общими весами (модели уже загружены)
+
+    Процессы создаются через fork, поэтому вызывать до запуска других потоков.
+    """
+    global _pool
+    from ocr_workers import OcrWorkerPool, format_memory_report, memory_usage
+    slot_size = int(OCR_SHM_SLOT_MB * 2**20)
+    _pool = OcrWorkerPool(workers, threads, pin, OCR_SHM_SLOTS or 2 * workers, slot_size).start()
+    if _pool.frames is not None:
+        QUEUE_DEPTH.set_function(_pool.frames.in_use, queue='ocr_frames')
+    for line in format_memory_report(_pool.memory_report()):
+        logger.info(line)
+    for process in _pool.processes:
+        for kind in ('rss', 'pss', 'uss'):
+            OCR_WORKER_MEMORY.set_function(
+                lambda pid=process.pid, kind=kind: (memory_usage(pid) or {}).get(kind, 0),
+                worker=str(process.pid), kind=kind)
+    return _pool
+
+def stop_worker_pool():
+    global _pool
+    if _pool is not None:
+        _pool.stop()
+        _pool = None
+
+def recognize_bytes(image_bytes):
+    """Распознавание в пуле процессов, если он запущен и жив, иначе в этом процессе"""
+    if _pool is not None and _pool.alive():
+        return _pool.recognize(image_bytes)
+    return process_image_ocr_detailed(image_bytes)
+
+def start_readers_warmup(threads=None):
+    """Загрузка моделей OCR в фоновом потоке"""
+    thread = threading.Thread(target=init_readers, args=(threads,), name="ocr-warmup",
+                              daemon=True)
+    thread.start()
+    return thread
+
+def readers_loading():
+    """Модели ещё загружаются"""
+    return not _loaded.is_set()
+
+def wait_readers(timeout=None):
+    """Ожидание загрузки моделей; True, если OCR готов к работе"""
+    _loaded.wait(timeout)
+    return bool(readers)
+
+def decode_image(image_bytes):
+    """Декодирование изображения в массив BGR"""
+    import cv2
+    image = Image.open(io.BytesIO(image_bytes))
+    img_np = np.array(image)
+    
+    if len(img_np.shape) == 3:
+        if img_np.shape[2] == 4:
+            img_np = cv2.cvtColor(img_np, cv2.COLOR_RGBA2RGB)
+        img_np = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
+    return img_np
+
+def decoded_nbytes(image_bytes):
+    """
+    Размер массива decode_image по заголовку файла, без декодирования
+
+    None, если по заголовку не понять (файл не читается или редкий режим)
+    """
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+    except Exception:
+        return None
+    # альфа-канал decode_image отбрасывает; остальные режимы - байт на канал
+    bands = {'1': 1, 'L': 1, 'P': 1, 'RGB': 3, 'RGBA': 3}.get(image.mode)
+    if bands is None:
+        return None
+    return image.width * image.height * bands
+
+def read_text(reader, img_np):
+    """
+    Распознавание одним читателем: (текст, уверенность)
+    
+    Эквивалент readtext(detail=0, paragraph=True), но с сохранением
+    уверенности распознавания (средняя по символам)
+    """
+    from easyocr.utils import get_paragraph
+    raw = reader.readtext(img_np, detail=1, paragraph=False)
+    if not raw:
+        return None, 0.0
+    
+    chars = sum(len(item[1]) for item in raw)
+    confidence = sum(len(item[1]) * item[2] for item in raw) / chars if chars else 0.0
+    
+    paragraphs = get_paragraph(raw, x_ths=1.0, y_ths=0.5, mode='ltr')
+    text = ' '.join(item[1] for item in paragraphs).strip()
+    return text, confidence
+
+def process_image_ocr_detailed(image_bytes):
+    """Распознавание текста: (лучший текст, его уверенность) или (None, 0.0)"""
+    try:
+        with STAGE_SECONDS.time(stage='decode'):
+            img_np = decode_image(image_bytes)
+    except Exception as e:
+        logger.error(f"Ошибка декодирования изображения: {e}")
+        ERRORS.inc(stage='decode')
+        return None, 0.0
+    return recognize_image(img_np)
+
+def recognize_image(img_np):
+    """Распознавание декодированного изображения (BGR): (лучший текст, уверенность)"""
+    try:
+        all_results = []
+        
+        # пробуем сначала кириллический читатель (для русского)
+        try:
+            if 'cyrillic' in readers:
+                with OCR_READER_SECONDS.time(reader='cyrillic'):
+                    text, confidence = read_text(readers['cyrillic'], img_np)
+                if text and len(text) > 1:
+                    all_results.append(('cyrillic', text, confidence))
+        except Exception as e:
+            logger.error(f"Ошибка кириллического OCR: {e}")
+            ERRORS.inc(stage='ocr')
+        
+        # пробуем другие читатели
+        for reader_name, reader in readers.items():
+            if reader_name == 'cyrillic':
+                continue
+                
+            try:
+                with OCR_READER_SECONDS.time(reader=reader_name):
+                    text, confidence = read_text(reader, img_np)
+                if text and len(text) > 1:
+                    all_results.append((reader_name, text, confidence))
+            except Exception as e:
+                logger.error(f"Ошибка OCR {reader_name}: {e}")
+                ERRORS.inc(stage='ocr')
+        
+        if not all_results:
+            return None, 0.0
+        
+        # выбираем самый длинный результат
+        best_result = max(all_results, key=lambda x: len(x[1]))
+        return best_result[1], best_result[2]
+        
+    except Exception as e:
+        logger.error(f"Общая ошибка OCR: {e}")
+        ERRORS.inc(stage='ocr')
+        return None, 0.0
+
+def process_image_ocr(image_bytes):
+    """Обработка изображения и распознавание текста"""
+    return process_image_ocr_detailed(image_bytes)[0]
+
+# выбор размера фото
+
+def photo_size_plan(photo_sizes, min_pixels):
+    """
+    Порядок попыток распознавания по размерам фото Telegram
+    
+    Сначала самый маленький размер не меньше min_pixels пикселей,
+    при низкой уверенности - самый большой
+    """
+    sizes = sorted(photo_sizes, key=lambda size: size.width * size.height)
+    first = next((size for size in sizes if size.width * size.height >= min_pixels), sizes[-1])
+    if first is sizes[-1]:
+        return [first]
+    return [first, sizes[-1]]
+
+def recognize_adaptive(photo_sizes, download, min_pixels, min_confidence):
+    """
+    Распознавание с повышением разрешения при низкой уверенности
+    
+    download(photo_size) -> байты файла
+    """
+    best_text, best_confidence = None, -1.0
+    for size in photo_size_plan(photo_sizes, min_pixels):
+        if best_text and deadline_expired():
+            # на большой размер времени нет: отдаём то, что есть
+            break
+        try:
+            image_bytes = download(size)
+            # в пуле процессов распознавание тоже ограничено дедлайном
+            text, confidence = recognize_bytes(image_bytes)
+        except DeadlineExceeded:
+            if best_text:
+                break
+            raise
+        if text and confidence > best_confidence:
+            best_text, best_confidence = text, confidence
+        if text and len(text.strip()) > 2 and confidence >= min_confidence:
+            break
+        logger.info(f"Низкая уверенность OCR ({confidence:.2f}) на {size.width}x{size.height}")
+    return best_text
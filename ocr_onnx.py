@@ -0,0 +1,203 @@
+import os
+import copy
+import logging
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# ONNX Runtime вместо PyTorch для моделей EasyOCR
+#
+# Модели экспортируются один раз (python ocr_onnx.py) в ONNX_MODEL_DIR:
+#   detector.onnx         - CRAFT, общий для всех читателей
+#   recognizer_<имя>.onnx - распознаватель читателя из ocr.READER_CONFIGS
+# С квантованием рядом лежат *.int8.onnx. Сессии ONNX Runtime подменяют
+# reader.detector и reader.recognizer: EasyOCR вызывает их так же, как модули
+# PyTorch, поэтому readtext и process_image_ocr не меняются.
+
+QUANTIZE_NONE = 'none'
+QUANTIZE_RECOGNIZER = 'recognizer'
+QUANTIZE_ALL = 'all'
+
+OPSET = 17
+
+
+class MeanOverLastDim(torch.nn.Module):
+    """Замена AdaptiveAvgPool2d((None, 1)): то же самое, но экспортируется в ONNX"""
+
+    def forward(self, x):
+        return x.mean(dim=3, keepdim=True)
+
+
+class RecognizerExport(torch.nn.Module):
+    """Распознаватель с одним входом: аргумент text моделям generation2 не нужен"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, image):
+        return self.model(image, None)
+
+
+def _export(module, args, path, input_names, output_names, dynamic_axes):
+    kwargs = dict(input_names=input_names, output_names=output_names,
+                  dynamic_axes=dynamic_axes, opset_version=OPSET, do_constant_folding=True)
+    try:
+        # новые версии torch по умолчанию экспортируют через dynamo
+        torch.onnx.export(module, args, path, dynamo=False, **kwargs)
+    except TypeError:
+        torch.onnx.export(module, args, path, **kwargs)
+
+
+def export_detector(reader, path):
+    """CRAFT -> ONNX; вход [batch, 3, h, w], выходы (y, feature)"""
+    detector = reader.detector
+    detector.eval()
+    dummy = torch.randn(1, 3, 640, 640)
+    _export(detector, (dummy,), path, ['image'], ['y', 'feature'],
+            {'image': {0: 'batch', 2: 'height', 3: 'width'},
+             'y': {0: 'batch', 1: 'out_height', 2: 'out_width'},
+             'feature': {0: 'batch', 2: 'out_height', 3: 'out_width'}})
+
+
+def export_recognizer(reader, path):
+    """Распознаватель -> ONNX; вход [batch, 1, 64, w], выход [batch, steps, классы]"""
+    model = copy.deepcopy(reader.recognizer).eval()
+    if isinstance(getattr(model, 'AdaptiveAvgPool', None), torch.nn.AdaptiveAvgPool2d):
+        model.AdaptiveAvgPool = MeanOverLastDim()
+    dummy = torch.randn(1, 1, 64, 256)
+    _export(RecognizerExport(model), (dummy,), path, ['image'], ['preds'],
+            {'image': {0: 'batch', 3: 'width'}, 'preds': {0: 'batch', 1: 'steps'}})
+
+
+def quantize(path):
+    """Динамическое int8-квантование весов; путь к квантованной модели"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantized = path[:-len('.onnx')] + '.int8.onnx'
+    quantize_dynamic(path, quantized, weight_type=QuantType.QInt8)
+    return quantized
+
+
+def model_paths(model_dir, name, mode=QUANTIZE_NONE):
+    """Пути к моделям читателя с учётом квантования: (детектор, распознаватель)"""
+    detector = os.path.join(model_dir, 'detector.onnx')
+    recognizer = os.path.join(model_dir, f'recognizer_{name}.onnx')
+    if mode == QUANTIZE_ALL:
+        detector = detector[:-len('.onnx')] + '.int8.onnx'
+    if mode in (QUANTIZE_RECOGNIZER, QUANTIZE_ALL):
+        recognizer = recognizer[:-len('.onnx')] + '.int8.onnx'
+    return detector, recognizer
+
+
+def export_models(configs, model_dir, mode=QUANTIZE_NONE, force=False):
+    """
+    Экспорт моделей для читателей configs ({имя: языки})
+
+    Для экспорта нужны модели без квантования PyTorch (quantize=False),
+    поэтому читатели создаются заново и после экспорта не нужны.
+    """
+    import easyocr
+    os.makedirs(model_dir, exist_ok=True)
+    detector_done = False
+    for name, langs in configs.items():
+        detector_path, recognizer_path = model_paths(model_dir, name)
+        need_detector = force or not os.path.exists(detector_path)
+        need_recognizer = force or not os.path.exists(recognizer_path)
+        if need_detector or need_recognizer:
+            reader = easyocr.Reader(langs, gpu=False, quantize=False, verbose=False,
+                                    detector=need_detector and not detector_done)
+            if need_detector and not detector_done:
+                logger.info(f"Экспорт детектора в {detector_path}")
+                export_detector(reader, detector_path)
+                detector_done = True
+            if need_recognizer:
+                logger.info(f"Экспорт распознавателя {name} в {recognizer_path}")
+                export_recognizer(reader, recognizer_path)
+
+        if mode == QUANTIZE_ALL and (force or not os.path.exists(model_paths(model_dir, name, mode)[0])):
+            quantize(detector_path)
+        if mode in (QUANTIZE_RECOGNIZER, QUANTIZE_ALL) and \
+                (force or not os.path.exists(model_paths(model_dir, name, mode)[1])):
+            quantize(recognizer_path)
+
+
+def _session(path, threads=None):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+    return ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+
+class OnnxDetector:
+    """Сессия ONNX Runtime с интерфейсом модуля CRAFT"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def eval(self):
+        return self
+
+    def __call__(self, x):
+        y, feature = self.session.run(None, {'image': x.cpu().numpy()})
+        return torch.from_numpy(y), torch.from_numpy(feature)
+
+
+class OnnxRecognizer:
+    """Сессия ONNX Runtime с интерфейсом модуля распознавателя"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def eval(self):
+        return self
+
+    def __call__(self, image, text=None):
+        preds, = self.session.run(None, {'image': image.cpu().numpy()})
+        return torch.from_numpy(preds)
+
+
+def enable_onnx(readers, configs, model_dir, mode=QUANTIZE_NONE, threads=None):
+    """
+    Перевод читателей на ONNX Runtime (недостающие модели экспортируются)
+
+    Подмена происходит, только если все сессии создались, иначе читатели
+    остаются на PyTorch.
+    """
+    export_models({name: configs[name] for name in readers if name in configs}, model_dir, mode)
+
+    detectors = {}
+    replacements = {}
+    for name in readers:
+        if name not in configs:
+            continue
+        detector_path, recognizer_path = model_paths(model_dir, name, mode)
+        if detector_path not in detectors:
+            # один детектор на всех: веса CRAFT у читателей одинаковые
+            detectors[detector_path] = OnnxDetector(_session(detector_path, threads))
+        replacements[name] = (detectors[detector_path],
+                              OnnxRecognizer(_session(recognizer_path, threads)))
+
+    for name, (detector, recognizer) in replacements.items():
+        readers[name].detector = detector
+        readers[name].recognizer = recognizer
+    logger.info(f"OCR на ONNX Runtime: {', '.join(replacements)} (квантование: {mode})")
+
+
+if __name__ == '__main__':
+    import argparse
+    from ocr import READER_CONFIGS
+    from config import ONNX_MODEL_DIR
+
+    parser = argparse.ArgumentParser(description="Экспорт моделей EasyOCR в ONNX")
+    parser.add_argument('--model-dir', default=ONNX_MODEL_DIR)
+    parser.add_argument('--quantize', default=QUANTIZE_NONE,
+                        choices=[QUANTIZE_NONE, QUANTIZE_RECOGNIZER, QUANTIZE_ALL])
+    parser.add_argument('--force', action='store_true', help="экспортировать заново")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    export_models(READER_CONFIGS, args.model_dir, args.quantize, args.force)
+    print(f"✅ Модели в {args.model_dir}")
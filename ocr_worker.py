@@ -0,0 +1,133 @@
+"""
+Отдельный исполнитель OCR: берёт задачи из очереди, скачивает фото и распознаёт текст
+
+    JOB_QUEUE_URL=sqlite:///path/langhelper.db python ocr_worker.py
+
+Процессов можно запустить сколько угодно и на разных машинах (с общим
+хранилищем задач). Результат - распознанный текст - бот забирает из
+очереди сам и отвечает пользователю.
+"""
+import argparse
+import logging
+import threading
+
+import telebot
+from telebot import apihelper, types
+
+import ocr
+from jobqueue import create_backend
+from config import (TOKEN, TELEGRAM_API_URL, JOB_QUEUE_URL, JOB_VISIBILITY_TIMEOUT,
+                    PHOTO_MIN_PIXELS, OCR_MIN_CONFIDENCE, OCR_THREADS)
+
+logger = logging.getLogger(__name__)
+
+OCR_JOB = 'ocr'
+
+
+class LeaseKeeper:
+    """Продление аренды задачи, пока она выполняется"""
+
+    def __init__(self, backend, job, visibility_timeout):
+        self.backend = backend
+        self.job = job
+        self.visibility_timeout = visibility_timeout
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{job.id}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.visibility_timeout / 3):
+            if not self.backend.extend(self.job.id, self.job.lease_token, self.visibility_timeout):
+                logger.warning(f"Аренда задачи {self.job.id} потеряна")
+                return
+
+
+class OcrWorker:
+    """Цикл исполнителя: аренда -> скачивание и OCR -> ack или fail с повтором"""
+
+    def __init__(self, backend, bot, visibility_timeout=60, poll_interval=1.0, retry_delay=5):
+        self.backend = backend
+        self.bot = bot
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self._stop = threading.Event()
+
+    def download_photo(self, photo_size):
+        file_info = self.bot.get_file(photo_size.file_id)
+        return self.bot.download_file(file_info.file_path)
+
+    def process(self, job):
+        """Распознанный текст задачи (или None)"""
+        photo_sizes = [types.PhotoSize.de_json(size) for size in job.payload['photo']]
+        text = ocr.recognize_adaptive(photo_sizes, self.download_photo, PHOTO_MIN_PIXELS,
+                                      OCR_MIN_CONFIDENCE)
+        return {'text': text}
+
+    def run_once(self):
+        """Одна задача; False, если очередь пуста"""
+        job = self.backend.lease([OCR_JOB], self.visibility_timeout)
+        if job is None:
+            return False
+        logger.info(f"Задача {job.id}, попытка {job.attempts}")
+        try:
+            with LeaseKeeper(self.backend, job, self.visibility_timeout):
+                result = self.process(job)
+        except Exception as e:
+            logger.error(f"Ошибка задачи {job.id}: {e}")
+            self.backend.fail(job.id, job.lease_token, e, self.retry_delay)
+            return True
+        if not self.backend.ack(job.id, job.lease_token, result):
+            logger.warning(f"Задача {job.id} выполнена, но аренда уже потеряна")
+        return True
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                if not self.run_once():
+                    self._stop.wait(self.poll_interval)
+            except Exception as e:
+                # хранилище недоступно: ждём и пробуем снова
+                logger.error(f"Ошибка очереди задач: {e}")
+                self._stop.wait(self.poll_interval * 5)
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Исполнитель OCR для очереди задач бота")
+    parser.add_argument('--queue', default=JOB_QUEUE_URL or 'sqlite',
+                        help="хранилище задач (sqlite:///путь/к/базе)")
+    parser.add_argument('--visibility-timeout', type=float, default=JOB_VISIBILITY_TIMEOUT)
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    parser.add_argument('--threads', type=int, default=OCR_THREADS,
+                        help="потоков torch / OpenCV (0 - все ядра: исполнитель распознаёт по одному фото)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if TELEGRAM_API_URL:
+        apihelper.API_URL = TELEGRAM_API_URL.rstrip('/') + "/bot{0}/{1}"
+        apihelper.FILE_URL = TELEGRAM_API_URL.rstrip('/') + "/file/bot{0}/{1}"
+
+    if not ocr.init_readers(args.threads or None):
+        return 1
+    worker = OcrWorker(create_backend(args.queue), telebot.TeleBot(TOKEN, threaded=False),
+                       args.visibility_timeout, args.poll_interval)
+    print("✅ Исполнитель OCR запущен")
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
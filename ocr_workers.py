@@ -0,0 +1,334 @@
+import gc
+import os
+import collections
+import logging
+import multiprocessing
+import signal
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from multiprocessing.connection import wait
+
+import ocr
+from resilience import DeadlineExceeded, current_deadline
+from metrics import ERRORS, STAGE_SECONDS
+from resources import apply_threads, pin_to_cores, core_plan
+from shm_transport import FrameSlots, Frame
+
+logger = logging.getLogger(__name__)
+
+# Процессы OCR с общими весами моделей
+#
+# Модели загружаются один раз в родителе, затем процессы создаются через fork:
+# страницы с весами у всех общие (copy-on-write) и не копируются, пока их
+# никто не меняет. Веса при распознавании только читаются, а gc.freeze
+# убирает объекты родителя из обхода сборщика мусора, который иначе
+# переписывал бы их заголовки и копировал страницы в каждом процессе.
+# Своя память процесса (USS) берётся из /proc/<pid>/smaps_rollup.
+#
+# Со слотами разделяемой памяти (shm_transport) фото декодируется в
+# родителе, а процессу уходит только описание кадра; без них - байты файла.
+
+
+def memory_usage(pid='self'):
+    """Память процесса в байтах: rss, pss, uss (своя), shared; None, если /proc недоступен"""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    fields = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        parts = value.split()
+        if parts and parts[0].isdigit():
+            fields[name] = int(parts[0]) * 1024
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+    }
+
+
+def freeze_models(readers):
+    """Подготовка загруженных моделей к fork: без градиентов, объекты родителя заморожены"""
+    for reader in readers.values():
+        for model in (getattr(reader, 'detector', None), getattr(reader, 'recognizer', None)):
+            if hasattr(model, 'parameters'):
+                model.eval()
+                for parameter in model.parameters():
+                    parameter.requires_grad_(False)
+    gc.collect()
+    gc.freeze()
+
+
+def _worker_main(conn, threads, cores, frames):
+    """Цикл процесса: кадр в слоте или байты изображения -> (текст, уверенность)"""
+    import torch
+    # Ctrl+C получает родитель, он и останавливает пул
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    apply_threads(threads)
+    pin_to_cores(cores)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        with torch.no_grad():
+            if isinstance(job, Frame):
+                # массив поверх памяти слота: родитель не трогает слот до ответа
+                conn.send(ocr.recognize_image(frames.view(job)))
+            else:
+                conn.send(ocr.process_image_ocr_detailed(job))
+
+
+class _Worker:
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.future = None
+        self.job = None
+
+
+class OcrWorkerPool:
+    """
+    Пул процессов OCR, созданных через fork после загрузки моделей
+
+    recognize(image_bytes) -> (текст, уверенность), как
+    ocr.process_image_ocr_detailed. Задачи раздаёт поток пула: по одной
+    на свободный процесс. Упавший процесс не перезапускается (fork из
+    многопоточного родителя небезопасен): его задача завершается ошибкой,
+    остальные процессы продолжают работу.
+
+    frame_slots > 0 - изображения передаются через столько слотов
+    разделяемой памяти по slot_size байт (не больше стольких фото в работе).
+    """
+
+    def __init__(self, workers, threads=1, pin=False, frame_slots=0, slot_size=0):
+        self.workers = workers
+        self.threads = threads
+        self.pin = pin
+        self.frame_slots = frame_slots
+        self.slot_size = slot_size
+        self.frames = None
+        self._context = multiprocessing.get_context('fork')
+        self._workers = []
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+        # пробуждение потока пула при новой задаче
+        self._wakeup_reader, self._wakeup_writer = self._context.Pipe(duplex=False)
+        self._stopping = False
+        self._thread = None
+
+    @property
+    def processes(self):
+        return [worker.process for worker in self._workers]
+
+    def start(self):
+        """Создание процессов; вызывать после загрузки моделей и до запуска других потоков"""
+        freeze_models(ocr.readers)
+        # свои ядра у каждого процесса: потоки разных процессов не вытесняют друг друга
+        plan = core_plan(self.workers, self.threads) if self.pin else [None] * self.workers
+        # сегмент до fork: процессы получают его отображение вместе с памятью родителя
+        if self.frame_slots > 0 and self.slot_size > 0:
+            self.frames = FrameSlots(self.frame_slots, self.slot_size)
+        for i in range(self.workers):
+            parent_conn, child_conn = self._context.Pipe()
+            process = self._context.Process(target=_worker_main, name=f"ocr-worker-{i}",
+                                            args=(child_conn, self.threads, plan[i], self.frames),
+                                            daemon=True)
+            process.start()
+            child_conn.close()
+            self._workers.append(_Worker(process, parent_conn))
+        self._thread = threading.Thread(target=self._loop, name="ocr-pool", daemon=True)
+        self._thread.start()
+        return self
+
+    def alive(self):
+        return sum(1 for worker in self._workers if worker.process.is_alive())
+
+    def submit(self, image_bytes, timeout=None):
+        """
+        Задача пулу -> Future
+
+        Со слотами фото декодируется здесь же, в потоке вызывающего;
+        timeout - сколько ждать свободный слот (иначе TimeoutError).
+        """
+        future = Future()
+        job = image_bytes
+        if self.frames is not None:
+            job = self._frame(image_bytes, timeout)
+            if job is None:
+                # не декодируется: тот же ответ, что дал бы процесс OCR
+                future.set_result((None, 0.0))
+                return future
+        with self._lock:
+            self._pending.append((future, job))
+            self._wakeup_writer.send_bytes(b'')
+        return future
+
+    def _frame(self, image_bytes, timeout):
+        """Декодированное фото в свободном слоте; байты, если в слот не помещается"""
+        # размер из заголовка: слишком большое фото не декодируется здесь зря
+        nbytes = ocr.decoded_nbytes(image_bytes)
+        if nbytes is not None and nbytes > self.frames.slot_size:
+            return image_bytes
+        slot = self.frames.acquire(timeout)
+        if slot is None:
+            raise FutureTimeout("нет свободного слота для изображения")
+        try:
+            with STAGE_SECONDS.time(stage='decode'):
+                frame = self.frames.write(slot, ocr.decode_image(image_bytes))
+        except Exception as e:
+            self.frames.release(slot)
+            logger.error(f"Ошибка декодирования изображения: {e}")
+            ERRORS.inc(stage='decode')
+            return None
+        if frame is None:
+            self.frames.release(slot)
+            return image_bytes
+        return frame
+
+    def _release(self, job):
+        if isinstance(job, Frame):
+            self.frames.release(job.slot)
+
+    def recognize(self, image_bytes):
+        """Распознавание в процессе пула с учётом дедлайна запроса"""
+        deadline = current_deadline()
+        try:
+            future = self.submit(image_bytes, deadline.remaining() if deadline else None)
+        except FutureTimeout:
+            raise DeadlineExceeded("нет свободного слота для изображения")
+        try:
+            return future.result(deadline.remaining() if deadline else None)
+        except FutureTimeout:
+            # ещё не отданная процессу задача не займёт его зря
+            future.cancel()
+            raise DeadlineExceeded("время на распознавание истекло")
+
+    def _loop(self):
+        while not self._stopping:
+            self._assign()
+            busy = [worker for worker in self._workers if worker.future is not None]
+            waitables = [self._wakeup_reader]
+            waitables += [worker.conn for worker in busy]
+            waitables += [worker.process.sentinel for worker in busy]
+            ready = wait(waitables, timeout=1)
+            if self._wakeup_reader in ready:
+                while self._wakeup_reader.poll():
+                    self._wakeup_reader.recv_bytes()
+            for worker in busy:
+                if worker.conn in ready or worker.process.sentinel in ready:
+                    self._finish(worker)
+
+    def _assign(self):
+        """Задачи из очереди - свободным живым процессам"""
+        for worker in self._workers:
+            if worker.future is not None or not worker.process.is_alive():
+                continue
+            with self._lock:
+                if not self._pending:
+                    return
+                future, job = self._pending.popleft()
+            if not future.set_running_or_notify_cancel():
+                self._release(job)
+                continue
+            worker.future = future
+            worker.job = job
+            worker.conn.send(job)
+        if self._pending and not self.alive():
+            with self._lock:
+                pending, self._pending = self._pending, collections.deque()
+            for future, job in pending:
+                self._release(job)
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(RuntimeError("процессы OCR завершились"))
+
+    def _finish(self, worker):
+        future, worker.future = worker.future, None
+        # слот свободен: процесс ответил или его уже нет
+        job, worker.job = worker.job, None
+        self._release(job)
+        try:
+            future.set_result(worker.conn.recv())
+        except (EOFError, OSError):
+            # процесс упал посреди задачи
+            worker.process.join(1)
+            logger.error(f"Процесс OCR {worker.process.pid} завершился "
+                         f"с кодом {worker.process.exitcode}")
+            ERRORS.inc(stage='ocr_worker')
+            future.set_exception(RuntimeError(f"процесс OCR {worker.process.pid} завершился"))
+
+    def memory_report(self):
+        """Память родителя и процессов пула: {pid: memory_usage}"""
+        report = {os.getpid(): memory_usage()}
+        for process in self.processes:
+            if process.is_alive():
+                report[process.pid] = memory_usage(process.pid)
+        return report
+
+    def stop(self):
+        self._stopping = True
+        if self._thread is not None:
+            self._thread.join()
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self._workers:
+            worker.process.join(5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        if self.frames is not None:
+            self.frames.close()
+
+
+def format_memory_report(report):
+    """Строки отчёта о памяти в мегабайтах"""
+    lines = []
+    parent = os.getpid()
+    for pid, usage in report.items():
+        role = 'родитель' if pid == parent else 'процесс OCR'
+        if usage is None:
+            lines.append(f"{role} {pid}: нет данных")
+            continue
+        lines.append(f"{role} {pid}: RSS {usage['rss'] / 2**20:.0f} МБ, "
+                     f"PSS {usage['pss'] / 2**20:.0f} МБ, своя (USS) {usage['uss'] / 2**20:.0f} МБ")
+    return lines
+
+
+def fork_supported():
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Память процессов OCR с общими весами")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--pin', action='store_true', help="закрепить процессы за ядрами")
+    parser.add_argument('--image', help="изображение для пробного распознавания в каждом процессе")
+    args = parser.parse_args()
+
+    if not ocr.init_readers():
+        raise SystemExit(1)
+    pool = OcrWorkerPool(args.workers, args.threads, args.pin).start()
+    if args.image:
+        with open(args.image, 'rb') as f:
+            image_bytes = f.read()
+        # по задаче на процесс, чтобы каждый поработал с моделями
+        futures = [pool.submit(image_bytes) for _ in range(args.workers)]
+        for future in futures:
+            print(future.result()[0])
+    else:
+        time.sleep(1)
+    for line in format_memory_report(pool.memory_report()):
+        print(line)
+    pool.stop()
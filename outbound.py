@@ -0,0 +1,236 @@
+import io
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from telebot.apihelper import ApiTelegramException
+
+from ratelimit import TokenBucket, KeyedRateLimiter
+from metrics import ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    """Один вызов Bot API в очереди"""
+
+    def __init__(self, chat_id, method, args, kwargs, edit_key=None):
+        self.chat_id = chat_id
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.edit_key = edit_key
+        self.future = Future()
+        self.attempts = 0
+
+
+def _resolve(value):
+    """Ссылка на сообщение: id, Message или Future от send_message"""
+    if isinstance(value, Future):
+        value = value.result()
+    return getattr(value, 'message_id', value)
+
+
+class OutboundSender:
+    """
+    Очередь исходящих вызовов Bot API с учётом лимитов Telegram
+
+    Общий token bucket ограничивает все отправки бота, отдельные - каждый
+    чат (в группах лимит ниже). Вызовы одного чата выполняются по порядку.
+    На 429 вызов повторяется через retry_after. Если правка сообщения ещё
+    не отправлена, новая правка того же сообщения заменяет её текст -
+    уходит только последний статус.
+
+    Методы возвращают Future с результатом вызова; обработчику ждать его
+    не нужно, правку можно ставить сразу, передав Future от send_message.
+    """
+
+    def __init__(self, bot, global_rate=30, chat_rate=1, chat_burst=3,
+                 group_rate=20 / 60, group_burst=5, workers=4, max_retries=5):
+        self.bot = bot
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_limiter = KeyedRateLimiter(chat_rate, chat_burst)
+        self._group_limiter = KeyedRateLimiter(group_rate, group_burst)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="outbound")
+        self._chats = {}
+        self._ready = deque()
+        self._busy = set()
+        self._blocked_until = {}
+        self._pending_edits = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    # постановка в очередь
+
+    def submit(self, chat_id, method, *args, **kwargs):
+        """Произвольный метод бота (send_chat_action, answer_callback_query, ...)"""
+        return self._enqueue(_Job(chat_id, method, args, kwargs))
+
+    def send_message(self, chat_id, text, **kwargs):
+        return self.submit(chat_id, 'send_message', chat_id, text, **kwargs)
+
+    def send_document(self, chat_id, document, **kwargs):
+        """Файл; document - байты или открытый файл (перед повтором перематывается)"""
+        return self.submit(chat_id, 'send_document', chat_id, document, **kwargs)
+
+    def reply_to(self, message, text, **kwargs):
+        return self.submit(message.chat.id, 'reply_to', message, text, **kwargs)
+
+    def edit_message_text(self, text, chat_id, message, **kwargs):
+        """Правка сообщения; message - id, Message или Future от send_message"""
+        edit_key = (chat_id, message if isinstance(message, Future) else _resolve(message))
+        with self._cond:
+            job = self._pending_edits.get(edit_key)
+            if job is not None:
+                # предыдущая правка ещё не ушла: просто заменяем текст
+                job.args = (text, chat_id, message)
+                job.kwargs = kwargs
+                return job.future
+        return self._enqueue(_Job(chat_id, 'edit_message_text', (text, chat_id, message), kwargs,
+                                  edit_key=edit_key))
+
+    def _enqueue(self, job):
+        with self._cond:
+            if job.edit_key is not None:
+                self._pending_edits[job.edit_key] = job
+            queue = self._chats.get(job.chat_id)
+            if queue is None:
+                queue = self._chats[job.chat_id] = deque()
+            queue.append(job)
+            if job.chat_id not in self._busy and job.chat_id not in self._ready:
+                self._ready.append(job.chat_id)
+            self._cond.notify()
+        return job.future
+
+    def depth(self):
+        """Число вызовов в очереди"""
+        with self._cond:
+            return sum(len(queue) for queue in self._chats.values())
+
+    # отправка
+
+    def start(self):
+        self._thread = threading.Thread(target=self._schedule, name="outbound-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def _limiter(self, chat_id):
+        return self._group_limiter if chat_id is not None and chat_id < 0 else self._chat_limiter
+
+    def _next_job(self):
+        """Следующий чат, которому можно отправлять; иначе время ожидания"""
+        now = time.monotonic()
+        wait = None
+        for _ in range(len(self._ready)):
+            chat_id = self._ready.popleft()
+            blocked = self._blocked_until.get(chat_id, 0) - now
+            if blocked <= 0:
+                limiter = self._limiter(chat_id)
+                blocked = limiter.wait_time(chat_id)
+                if blocked <= 0:
+                    limiter.allow(chat_id)
+                    job = self._chats[chat_id].popleft()
+                    if job.edit_key is not None:
+                        self._pending_edits.pop(job.edit_key, None)
+                    self._busy.add(chat_id)
+                    return job, None
+            self._ready.append(chat_id)
+            wait = blocked if wait is None else min(wait, blocked)
+        return None, wait
+
+    def _schedule(self):
+        while True:
+            with self._cond:
+                while not self._ready and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+
+                # общий лимит бота
+                global_wait = self._global.wait_time()
+                if global_wait > 0:
+                    self._cond.wait(global_wait)
+                    continue
+
+                job, wait = self._next_job()
+                if job is None:
+                    self._cond.wait(wait)
+                    continue
+                self._global.try_acquire()
+
+            self._executor.submit(self._execute, job)
+
+    def _execute(self, job):
+        retry_after = None
+        args = job.args
+        if not job.future.running() and not job.future.set_running_or_notify_cancel():
+            # вызов отменён, пока ждал в очереди (например, истёк таймаут выгрузки)
+            job.method = None
+        try:
+            if job.method == 'edit_message_text':
+                args = (args[0], args[1], _resolve(args[2]))
+        except Exception as e:
+            # исходное сообщение так и не отправилось - править нечего
+            job.future.set_exception(e)
+            job.method = None
+
+        try:
+            if job.method is not None:
+                for arg in args:
+                    # файл после неудачной попытки прочитан до конца
+                    if isinstance(arg, io.IOBase):
+                        arg.seek(0)
+                result = getattr(self.bot, job.method)(*args, **job.kwargs)
+                job.future.set_result(result)
+        except ApiTelegramException as e:
+            job.attempts += 1
+            if e.error_code == 429 and job.attempts <= self.max_retries:
+                retry_after = (e.result_json.get('parameters') or {}).get('retry_after', 1)
+                logger.warning(f"429 для чата {job.chat_id}, повтор через {retry_after} с")
+                ERRORS.inc(stage='outbound_429')
+            else:
+                logger.error(f"Ошибка отправки {job.method} в чат {job.chat_id}: {e}")
+                ERRORS.inc(stage='outbound')
+                job.future.set_exception(e)
+        except requests.exceptions.ConnectionError as e:
+            job.attempts += 1
+            if job.attempts <= self.max_retries:
+                # запрос не дошёл до Telegram: повтор с нарастающей паузой
+                retry_after = min(2 ** job.attempts, 30)
+                logger.warning(f"Ошибка сети при {job.method}, повтор через {retry_after} с: {e}")
+            else:
+                logger.error(f"Ошибка отправки {job.method} в чат {job.chat_id}: {e}")
+                ERRORS.inc(stage='outbound')
+                job.future.set_exception(e)
+        except Exception as e:
+            # таймаут чтения и прочее: сообщение могло уйти, не повторяем
+            logger.error(f"Ошибка отправки {job.method} в чат {job.chat_id}: {e}")
+            ERRORS.inc(stage='outbound')
+            job.future.set_exception(e)
+
+        with self._cond:
+            self._busy.discard(job.chat_id)
+            queue = self._chats[job.chat_id]
+            if retry_after is not None:
+                # повтор первым в очереди чата, чтобы не нарушить порядок
+                queue.appendleft(job)
+                self._blocked_until[job.chat_id] = time.monotonic() + retry_after
+            else:
+                self._blocked_until.pop(job.chat_id, None)
+            if queue:
+                self._ready.append(job.chat_id)
+            else:
+                del self._chats[job.chat_id]
+            self._cond.notify()
@@ -0,0 +1,218 @@
+import io
+import os
+import sys
+import time
+import cProfile
+import pstats
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Профилирование обработчиков и снимки памяти по команде администратора
+#
+# Профилировщик подменяет функцию обработки апдейтов диспетчера на время
+# замера и возвращает исходную после него: когда замер не идёт, никаких
+# проверок на пути апдейта нет. Снимки памяти - tracemalloc, который
+# включается первым снимком и выключается отдельной командой.
+
+CPROFILE = 'cprofile'
+SAMPLE = 'sample'
+
+MAX_SECONDS = 300
+SAMPLE_INTERVAL = 0.005
+
+
+class HandlerProfiler:
+    """
+    Замер обработчиков диспетчера в течение seconds секунд
+
+    cprofile - cProfile на каждый вызов обработчика (в своём потоке),
+    sample - периодический снимок стеков потоков, занятых обработкой
+    (в формате folded stacks для flamegraph / speedscope).
+    """
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self._lock = threading.Lock()
+        self._running = False
+        self._original = None
+        self._mode = None
+        self._profiles = []
+        self._local = threading.local()
+        self._active = set()
+        self._stacks = Counter()
+        self._calls = 0
+        self._skipped = 0
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self, seconds, mode=CPROFILE, on_done=None):
+        """Запуск замера; on_done(имя файла, содержимое, описание) по окончании"""
+        seconds = max(1, min(seconds, MAX_SECONDS))
+        with self._lock:
+            if self._running:
+                return False
+            self._running = True
+            self._mode = mode
+            self._profiles = []
+            self._local = threading.local()
+            self._active = set()
+            self._stacks = Counter()
+            self._calls = 0
+            self._skipped = 0
+            self._original = self.dispatcher.handle
+            self.dispatcher.handle = self._wrap(self._original)
+
+        threading.Thread(target=self._run, args=(seconds, on_done), name="profiler",
+                         daemon=True).start()
+        return True
+
+    def _wrap(self, handle):
+        if self._mode == SAMPLE:
+            def sampled(update):
+                thread_id = threading.get_ident()
+                self._active.add(thread_id)
+                try:
+                    return handle(update)
+                finally:
+                    self._active.discard(thread_id)
+                    self._calls += 1
+            return sampled
+
+        def profiled(update):
+            profile = getattr(self._local, 'profile', None)
+            if profile is None:
+                profile = self._local.profile = cProfile.Profile()
+                with self._lock:
+                    self._profiles.append(profile)
+            try:
+                profile.enable()
+            except ValueError:
+                # начиная с Python 3.12 профилировщик активен только один на процесс
+                self._skipped += 1
+                return handle(update)
+            try:
+                return handle(update)
+            finally:
+                profile.disable()
+                self._calls += 1
+        return profiled
+
+    def _run(self, seconds, on_done):
+        stop_at = time.monotonic() + seconds
+        if self._mode == SAMPLE:
+            own = threading.get_ident()
+            while time.monotonic() < stop_at:
+                frames = sys._current_frames()
+                for thread_id in list(self._active):
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own:
+                        self._stacks[_folded_stack(frame)] += 1
+                time.sleep(SAMPLE_INTERVAL)
+        else:
+            time.sleep(seconds)
+
+        with self._lock:
+            self.dispatcher.handle = self._original
+            self._original = None
+            self._running = False
+
+        try:
+            filename, content = self._report(seconds)
+            description = f"Профиль {self._mode} за {seconds} с: вызовов обработчиков {self._calls}"
+            if self._skipped:
+                description += f", без замера {self._skipped}"
+            if on_done:
+                on_done(filename, content, description)
+        except Exception as e:
+            logger.error(f"Ошибка отчёта профилировщика: {e}")
+
+    def _report(self, seconds):
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        if self._mode == SAMPLE:
+            lines = [f"{stack} {count}" for stack, count in self._stacks.most_common()]
+            return f"profile-{stamp}.folded.txt", ('\n'.join(lines) + '\n').encode('utf-8')
+
+        out = io.StringIO()
+        profiles = [profile for profile in self._profiles if profile.getstats()]
+        if not profiles:
+            out.write(f"За {seconds} с обработчики не вызывались\n")
+        else:
+            stats = pstats.Stats(profiles[0], stream=out)
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.strip_dirs().sort_stats('cumulative').print_stats(80)
+            stats.sort_stats('tottime').print_stats(40)
+        return f"profile-{stamp}.txt", out.getvalue().encode('utf-8')
+
+
+def _folded_stack(frame):
+    """Стек кадра в строку 'внешняя;...;внутренняя' (файл:функция)"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class MemorySnapshots:
+    """Снимки tracemalloc с разницей относительно предыдущего снимка"""
+
+    def __init__(self, frames=10, top=40):
+        self.frames = frames
+        self.top = top
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """(имя файла, содержимое, описание); первый вызов включает tracemalloc"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._previous = None
+            snapshot = self._filtered(tracemalloc.take_snapshot())
+            current, peak = tracemalloc.get_traced_memory()
+
+            out = io.StringIO()
+            out.write(f"Отслеживается: {current / 2**20:.1f} МБ, пик {peak / 2**20:.1f} МБ\n\n")
+            if self._previous is None:
+                out.write("Первый снимок, крупнейшие места выделения:\n")
+                for stat in snapshot.statistics('lineno')[:self.top]:
+                    out.write(f"{stat}\n")
+                description = "Снимок памяти сохранён; следующий /memsnap покажет прирост"
+            else:
+                out.write("Прирост с предыдущего снимка:\n")
+                diff = snapshot.compare_to(self._previous, 'lineno')
+                for stat in diff[:self.top]:
+                    out.write(f"{stat}\n")
+                # стеки для самых растущих мест
+                out.write("\nСтеки крупнейших приростов:\n")
+                for stat in snapshot.compare_to(self._previous, 'traceback')[:5]:
+                    out.write(f"\n{stat.size_diff / 1024:+.1f} КиБ, {stat.count_diff:+d} блоков\n")
+                    out.write('\n'.join(stat.traceback.format()) + '\n')
+                description = "Разница снимков памяти"
+            self._previous = snapshot
+
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        return f"memsnap-{stamp}.txt", out.getvalue().encode('utf-8'), description
+
+    def stop(self):
+        with self._lock:
+            self._previous = None
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+                return True
+            return False
+
+    @staticmethod
+    def _filtered(snapshot):
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import deque
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens=1):
+        """Взять токены, если есть; иначе False"""
+        self._refill(time.monotonic())
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def wait_time(self, tokens=1):
+        """Сколько секунд ждать до появления токенов"""
+        self._refill(time.monotonic())
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def reserve(self, tokens=1):
+        """
+        Взять токены в долг; возвращает, через сколько секунд их можно тратить
+
+        Следующие резервы встают за уже взятыми, так что отложенные запросы
+        выполняются с темпом rate, а не все разом.
+        """
+        self._refill(time.monotonic())
+        self.tokens -= tokens
+        return max(0.0, -self.tokens / self.rate)
+
+
+class KeyedRateLimiter:
+    """Отдельный token bucket на каждый ключ (пользователь, чат)"""
+
+    def __init__(self, rate, capacity, idle_ttl=3600):
+        self.rate = rate
+        self.capacity = capacity
+        self.idle_ttl = idle_ttl
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._last_cleanup = time.monotonic()
+
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+        return bucket
+
+    def allow(self, key, tokens=1):
+        """Разрешён ли запрос для ключа (токены списываются)"""
+        with self._lock:
+            self._cleanup()
+            return self._bucket(key).try_acquire(tokens)
+
+    def wait_time(self, key, tokens=1):
+        with self._lock:
+            return self._bucket(key).wait_time(tokens)
+
+    def reserve(self, key, tokens=1):
+        """Резерв токенов ключа; задержка в секундах (0 - в пределах лимита)"""
+        with self._lock:
+            self._cleanup()
+            return self._bucket(key).reserve(tokens)
+
+    def _cleanup(self):
+        # давно неактивные ключи удаляем, чтобы словарь не рос бесконечно
+        now = time.monotonic()
+        if now - self._last_cleanup < self.idle_ttl:
+            return
+        self._last_cleanup = now
+        stale = [key for key, bucket in self._buckets.items()
+                 if now - bucket.updated > self.idle_ttl]
+        for key in stale:
+            del self._buckets[key]
+
+
+class FairQueue:
+    """
+    Очередь задач с обходом ключей по кругу (round-robin по пользователям)
+
+    Задачу можно отложить (not_before, по time.monotonic): до этого времени
+    она и задачи того же ключа за ней не выдаются, а другие ключи - выдаются.
+    """
+
+    def __init__(self):
+        self._queues = {}
+        self._order = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item, key=None, not_before=0.0):
+        with self._cond:
+            if key not in self._queues:
+                self._queues[key] = deque()
+                self._order.append(key)
+            self._queues[key].append((not_before, item))
+            self._cond.notify_all()
+
+    def get(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wake_at = None
+                for _ in range(len(self._order)):
+                    key = self._order.popleft()
+                    queue = self._queues[key]
+                    not_before, item = queue[0]
+                    if not_before <= now:
+                        queue.popleft()
+                        if queue:
+                            self._order.append(key)
+                        else:
+                            del self._queues[key]
+                        return item
+                    # ключ ещё отложен: в конец круга
+                    self._order.append(key)
+                    wake_at = not_before if wake_at is None else min(wake_at, not_before)
+                self._cond.wait(None if wake_at is None else wake_at - now)
+
+    def qsize(self):
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
+
+
+def fair_position(pending, key):
+    """
+    Примерная позиция новой задачи ключа key при обходе по кругу
+
+    pending - число ожидающих задач по ключам (без новой задачи)
+    """
+    ahead = pending.get(key, 0)
+    others = sum(min(count, ahead + 1) for other, count in pending.items() if other != key)
+    return ahead + others + 1
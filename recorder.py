@@ -0,0 +1,201 @@
+import os
+import hmac
+import json
+import time
+import hashlib
+import logging
+import secrets
+import threading
+
+from dispatcher import classify_update
+from metrics import STAGE_SECONDS, OCR_READER_SECONDS, DB_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Запись входящих апдейтов для воспроизведения (replay.py)
+#
+# Каждый апдейт - строка JSONL: время прихода, полоса, сколько ждал в
+# очереди и обрабатывался, длительности этапов (из гистограмм метрик) и
+# результаты этапов, которые отмечает бот (record_result). Пользователи и
+# чаты (любой объект с id и is_bot или type, где бы он ни был: отправитель,
+# пересланный автор, новые участники) и файлы заменены стабильными
+# псевдонимами (HMAC с солью), имена убраны; текст сообщений остаётся -
+# без него воспроизведение бессмысленно.
+# Скачанные ботом фото сохраняются рядом, в photos/<sha256>.jpg.
+
+_current = threading.local()
+
+# у пользователя и чата (где бы они ни были в апдейте) остаются только эти поля
+IDENTITY_FIELDS = ('type', 'is_bot')
+# строковые идентификаторы, которые тоже заменяются псевдонимами
+OPAQUE_KEYS = ('file_id', 'file_unique_id', 'chat_instance')
+DROPPED_KEYS = ('username', 'first_name', 'last_name', 'language_code', 'date', 'contact',
+                'location', 'venue', 'caption_entities', 'is_premium', 'sender_user_name',
+                'author_signature', 'forward_sender_name', 'forward_signature')
+
+
+def record_result(**fields):
+    """Результаты этапов в запись текущего апдейта (без записи - ничего)"""
+    record = getattr(_current, 'record', None)
+    if record is not None:
+        record['results'].update(fields)
+
+
+def record_photo(photo_size, content):
+    """Скачанный размер фото: байты сохраняются по хешу содержимого"""
+    recorder = getattr(_current, 'recorder', None)
+    if recorder is not None:
+        recorder.save_photo(photo_size, content)
+
+
+def update_json(update):
+    """Исходный JSON апдейта (telebot хранит его у сообщений и callback)"""
+    for name in ('message', 'edited_message', 'callback_query'):
+        part = getattr(update, name, None)
+        if part is not None and getattr(part, 'json', None) is not None:
+            return {name: part.json}
+    return {}
+
+
+class UpdateRecorder:
+    """
+    Запись апдейтов диспетчера в path (дописывается)
+
+    salt - соль псевдонимов; без неё случайная, и псевдонимы разных
+    запусков не совпадают.
+    """
+
+    def __init__(self, path, salt=None):
+        self.path = path
+        self.photos_dir = os.path.join(os.path.dirname(path) or '.', 'photos')
+        self.salt = (salt or secrets.token_hex(16)).encode()
+        self._arrivals = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self._histograms = {STAGE_SECONDS: '', OCR_READER_SECONDS: 'reader:', DB_SECONDS: 'db:'}
+
+    def install(self, dispatcher):
+        """Обёртки над submit (время прихода) и handle (обработка) диспетчера"""
+        os.makedirs(self.photos_dir, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        for histogram in self._histograms:
+            histogram.listeners.append(self._observe)
+
+        submit, handle = dispatcher.submit, dispatcher.handle
+
+        def recorded_submit(update):
+            self._arrivals[update.update_id] = (time.time(), time.monotonic())
+            accepted = submit(update)
+            if not accepted:
+                record = self._record(update, self._arrivals.pop(update.update_id, None))
+                record['rejected'] = True
+                self._write(record)
+            return accepted
+
+        def recorded_handle(update):
+            record = self._record(update, self._arrivals.pop(update.update_id, None))
+            _current.record, _current.recorder = record, self
+            start = time.perf_counter()
+            try:
+                return handle(update)
+            except Exception as e:
+                record['error'] = type(e).__name__
+                raise
+            finally:
+                record['seconds'] = round(time.perf_counter() - start, 4)
+                _current.record = _current.recorder = None
+                self._write(record)
+
+        dispatcher.submit = recorded_submit
+        dispatcher.handle = recorded_handle
+        logger.info(f"Запись апдейтов в {self.path}")
+        return self
+
+    def stop(self):
+        for histogram in self._histograms:
+            if self._observe in histogram.listeners:
+                histogram.listeners.remove(self._observe)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # псевдонимы
+
+    def _digest(self, value):
+        return hmac.new(self.salt, str(value).encode(), hashlib.sha256).hexdigest()
+
+    def anon_id(self, value):
+        """Числовой псевдоним id (знак сохраняется: у групп id отрицательные)"""
+        alias = int(self._digest(value)[:12], 16)
+        return -alias if int(value) < 0 else alias
+
+    def anon_file(self, value):
+        return 'f' + self._digest(value)[:24]
+
+    @staticmethod
+    def is_identity(data):
+        """Объект User (есть is_bot) или Chat (есть type) - с числовым id"""
+        return isinstance(data.get('id'), int) and ('is_bot' in data or 'type' in data)
+
+    def anonymize(self, data):
+        if isinstance(data, list):
+            return [self.anonymize(item) for item in data]
+        if not isinstance(data, dict):
+            return data
+        if self.is_identity(data):
+            # отправитель, чат, пересланный автор, участник и т.п.
+            identity = {'id': self.anon_id(data['id'])}
+            for field in IDENTITY_FIELDS:
+                if field in data:
+                    identity[field] = data[field]
+            if 'is_bot' in data:
+                identity['first_name'] = 'User'
+            return identity
+        result = {}
+        for key, value in data.items():
+            if key in DROPPED_KEYS:
+                continue
+            if key in OPAQUE_KEYS:
+                result[key] = self.anon_file(value)
+            else:
+                result[key] = self.anonymize(value)
+        return result
+
+    # запись
+
+    def _record(self, update, arrival):
+        now_wall, now = time.time(), time.monotonic()
+        arrived_wall, arrived = arrival or (now_wall, now)
+        return {'ts': round(arrived_wall, 3), 'queued': round(now - arrived, 4),
+                'lane': classify_update(update), 'update': self.anonymize(update_json(update)),
+                'stages': [], 'results': {}, 'photos': {}}
+
+    def _observe(self, histogram, value, labels):
+        record = getattr(_current, 'record', None)
+        if record is not None:
+            name = next(iter(labels.values()), '')
+            record['stages'].append([self._histograms[histogram] + str(name), round(value, 4)])
+
+    def save_photo(self, photo_size, content):
+        digest = hashlib.sha256(content).hexdigest()
+        path = os.path.join(self.photos_dir, f"{digest}.jpg")
+        if not os.path.exists(path):
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(content)
+            os.replace(tmp, path)
+        record = getattr(_current, 'record', None)
+        if record is not None:
+            record['photos'][self.anon_file(photo_size.file_unique_id)] = digest
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._file is None:
+                return
+            try:
+                self._file.write(line)
+                self._file.flush()
+            except OSError as e:
+                logger.error(f"Ошибка записи апдейта: {e}")
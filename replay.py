@@ -0,0 +1,298 @@
+"""
+Воспроизведение записанных апдейтов (recorder.py) на локальных заглушках
+
+    python replay.py recordings/updates.jsonl --speed 4 --output new.json
+    python replay.py --compare old.json new.json
+
+Бот запускается подпроцессом, как в loadtest.py, и получает апдейты записи
+в исходном порядке и с исходными интервалами (--speed 4 - в четыре раза
+быстрее, 0 - без пауз). Фото отдаются из сохранённых при записи файлов.
+Задержка считается до первого и до итогового ответа в чате апдейта; в
+отчёт попадают и задержки из самой записи - для сравнения с исходной
+нагрузкой, а --compare сравнивает два прогона (например, двух версий бота).
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+from benchmark import summarize
+from fake_servers import FakeBotApiServer, FakeTranslateServer
+from loadtest import Request, STATUS_PREFIXES, REJECT_PREFIX, start_bot, report, print_report
+
+# промежуточный ответ на /export
+REPLAY_STATUS_PREFIXES = STATUS_PREFIXES + ("📦",)
+
+
+def load_recording(path):
+    """Записи апдейтов по времени прихода"""
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    records.sort(key=lambda record: record['ts'])
+    return records
+
+
+def update_kind(update):
+    """Тип апдейта для отчёта; None - бот на такие не отвечает"""
+    if 'callback_query' in update:
+        data = update['callback_query'].get('data') or ''
+        return 'callback' if data.startswith('lang_') else None
+    message = update.get('message')
+    if message is None:
+        return None
+    if 'photo' in message:
+        return 'photo'
+    text = message.get('text')
+    if not text:
+        return None
+    return 'command' if text.startswith('/') else 'text'
+
+
+def update_chat(update):
+    if 'callback_query' in update:
+        query = update['callback_query']
+        return (query.get('message') or {}).get('chat', {}).get('id', query['from']['id'])
+    return update['message']['chat']['id']
+
+
+# объекты, у которых date обязателен, кроме сообщений: источник пересылки
+DATED_KEYS = ('forward_origin', 'origin')
+
+
+def with_dates(data, now, key=None):
+    """date у сообщений и источников пересылки (убран при записи, а без него telebot не разберёт апдейт)"""
+    if isinstance(data, list):
+        return [with_dates(item, now) for item in data]
+    if not isinstance(data, dict):
+        return data
+    dated = 'message_id' in data or key in DATED_KEYS
+    data = {name: with_dates(value, now, name) for name, value in data.items()}
+    if dated and 'date' not in data:
+        data['date'] = now
+    return data
+
+
+def placeholder_photo(width, height):
+    from PIL import Image
+    out = io.BytesIO()
+    Image.new('RGB', (width, height), 'white').save(out, 'JPEG')
+    return out.getvalue()
+
+
+def register_photos(api, records, photos_dir):
+    """
+    Файлы фото для заглушки Bot API
+
+    Размер, который при записи не скачивался, заменяется ближайшим
+    сохранённым размером того же фото, а если такого нет - пустой картинкой.
+    """
+    digests = {}
+    for record in records:
+        digests.update(record.get('photos', {}))
+    missing = 0
+    for record in records:
+        sizes = (record['update'].get('message') or {}).get('photo') or []
+        stored = [(size['width'] * size['height'], digests[size['file_unique_id']])
+                  for size in sizes if size['file_unique_id'] in digests]
+        for size in sizes:
+            pixels = size['width'] * size['height']
+            if stored:
+                digest = min(stored, key=lambda item: abs(item[0] - pixels))[1]
+                with open(os.path.join(photos_dir, f"{digest}.jpg"), 'rb') as f:
+                    content = f.read()
+            else:
+                missing += 1
+                content = placeholder_photo(size['width'], size['height'])
+            api.add_file(size['file_id'], content)
+    return missing
+
+
+class ReplayTracker:
+    """
+    Ответы бота по апдейтам записи
+
+    В одном чате апдейты обрабатываются по порядку, поэтому ответ
+    относится к самому раннему незавершённому апдейту чата.
+    """
+
+    def __init__(self):
+        self.requests = {}
+        self.lock = threading.Lock()
+        self.all_done = threading.Condition(self.lock)
+        self.open = 0
+        self._chats = {}
+
+    def add(self, chat_id, request):
+        with self.lock:
+            self.requests[len(self.requests)] = request
+            self._chats.setdefault(chat_id, deque()).append(request)
+            self.open += 1
+
+    def on_message(self, record):
+        with self.lock:
+            chat_queue = self._chats.get(record['chat_id'])
+            if not chat_queue:
+                return
+            request = chat_queue[0]
+            now = record['time']
+            if request.first_at is None:
+                request.first_at = now
+            text = record['text']
+            if text.startswith(REPLAY_STATUS_PREFIXES):
+                return
+            request.rejected = text.startswith(REJECT_PREFIX)
+            request.done_at = now
+            chat_queue.popleft()
+            self.open -= 1
+            self.all_done.notify_all()
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while self.open and time.monotonic() < deadline:
+                self.all_done.wait(deadline - time.monotonic())
+            return self.open
+
+
+def recorded_summary(records):
+    """Задержки из самой записи по типам (мс): ожидание в очереди и обработка"""
+    by_kind = {}
+    for record in records:
+        kind = update_kind(record['update'])
+        if kind is not None and 'seconds' in record:
+            by_kind.setdefault(kind, []).append(record)
+    return {kind: {'count': len(items),
+                   'queued_ms': summarize([r['queued'] * 1000 for r in items]),
+                   'handler_ms': summarize([r['seconds'] * 1000 for r in items])}
+            for kind, items in sorted(by_kind.items())}
+
+
+def replay(records, api, tracker, speed):
+    """Подача апдейтов с исходными интервалами, делёнными на speed"""
+    start = time.monotonic()
+    first_ts = records[0]['ts']
+    for record in records:
+        if speed > 0:
+            delay = start + (record['ts'] - first_ts) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        update = with_dates(record['update'], int(time.time()))
+        kind = update_kind(update)
+        if kind is not None:
+            request = Request(kind, 1)
+            tracker.add(update_chat(update), request)
+            request.sent_at = time.monotonic()
+        api.push_update(update)
+    return start
+
+
+def compare(old_path, new_path):
+    """Итоговые задержки и пропускная способность двух прогонов"""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)['results']
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)['results']
+    for kind in sorted(set(old) | set(new)):
+        if kind not in old or kind not in new:
+            print(f"{kind}: только в одном прогоне")
+            continue
+        print(f"\n{kind}:")
+        for name in ('p50', 'p95', 'p99'):
+            before = old[kind]['final_response_ms'][name]
+            after = new[kind]['final_response_ms'][name]
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"  {name}  {before:8.0f} -> {after:8.0f} мс  ({change:+.0f}%)")
+        before, after = old[kind]['throughput_per_sec'], new[kind]['throughput_per_sec']
+        print(f"  пропускная способность {before:.2f} -> {after:.2f}/с")
+        print(f"  без ответа {old[kind]['timed_out']} -> {new[kind]['timed_out']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воспроизведение записанных апдейтов")
+    parser.add_argument('recording', nargs='?', help="файл записи (RECORD_UPDATES_FILE)")
+    parser.add_argument('--photos', help="папка фото записи (по умолчанию photos рядом с ней)")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="ускорение относительно записи (0 - без пауз)")
+    parser.add_argument('--bot', default='langhelperbot.py')
+    parser.add_argument('--translate-delay', type=float, default=0.05)
+    parser.add_argument('--startup-timeout', type=float, default=600)
+    parser.add_argument('--drain-timeout', type=float, default=120)
+    parser.add_argument('--env', action='append', default=[],
+                        help="переменная окружения бота, KEY=VALUE (можно несколько)")
+    parser.add_argument('--output', help="JSON с результатами")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help="сравнить два файла результатов")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    if not args.recording:
+        parser.error("нужен файл записи или --compare")
+
+    records = load_recording(args.recording)
+    if not records:
+        print("❌ Запись пуста")
+        return 1
+    photos_dir = args.photos or os.path.join(os.path.dirname(args.recording) or '.', 'photos')
+
+    tracker = ReplayTracker()
+    api = FakeBotApiServer(on_message=tracker.on_message).start()
+    translate = FakeTranslateServer(delay=args.translate_delay).start()
+    missing = register_photos(api, records, photos_dir)
+    span = records[-1]['ts'] - records[0]['ts']
+    print(f"Апдейтов: {len(records)} за {span:.0f} с записи, фото без файла: {missing}")
+
+    workdir = tempfile.mkdtemp(prefix='replay-')
+    # бот под воспроизведением сам ничего не записывает
+    extra_env = {'RECORD_UPDATES_FILE': ''}
+    extra_env.update(item.split('=', 1) for item in args.env)
+    process = start_bot(args.bot, api.url, translate.url, workdir, extra_env)
+    print(f"Бот запущен (pid {process.pid}), лог: {os.path.join(workdir, 'bot.log')}")
+
+    try:
+        if not api.polling.wait(args.startup_timeout):
+            print("❌ Бот не начал опрос getUpdates")
+            return 1
+
+        start = replay(records, api, tracker, args.speed)
+        left = tracker.wait(args.drain_timeout)
+        elapsed = time.monotonic() - start
+        if left:
+            print(f"⚠️ Без итогового ответа: {left}")
+
+        results = report(tracker, elapsed)
+        print_report(results, elapsed)
+        recorded = recorded_summary(records)
+        print("\nВ записи:")
+        for kind, item in recorded.items():
+            print(f"  {kind}: {item['count']}, очередь p95 {item['queued_ms']['p95']:.0f} мс, "
+                  f"обработка p50 {item['handler_ms']['p50']:.0f}  "
+                  f"p95 {item['handler_ms']['p95']:.0f} мс")
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({'args': vars(args), 'elapsed': elapsed, 'results': results,
+                           'recorded': recorded}, f, ensure_ascii=False, indent=2)
+        return 0
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        api.stop()
+        translate.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """Бюджет времени запроса исчерпан"""
+
+
+class CallTimeout(DeadlineExceeded):
+    """Внешний сервис не ответил за время, отведённое одному вызову"""
+
+
+class CircuitOpenError(Exception):
+    """Внешний сервис отключён предохранителем"""
+
+
+class Deadline:
+    """Момент, к которому запрос должен быть обработан"""
+
+    def __init__(self, seconds):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded("время запроса истекло")
+
+
+# дедлайн текущего запроса; contextvars работают и в потоках, и в asyncio
+_current = contextvars.ContextVar('deadline', default=None)
+
+
+@contextmanager
+def deadline(seconds):
+    """Бюджет времени на всё, что выполняется внутри блока"""
+    token = _current.set(Deadline(seconds))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def with_deadline(seconds):
+    """Декоратор обработчика (обычного или async): бюджет на весь вызов"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with deadline(seconds):
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with deadline(seconds):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_deadline():
+    return _current.get()
+
+
+def deadline_expired():
+    current = _current.get()
+    return current is not None and current.expired()
+
+
+# потоки для блокирующих внешних вызовов: зависший вызов остаётся здесь,
+# а поток обработчика освобождается по дедлайну
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="external")
+
+
+def call_with_deadline(func, *args, **kwargs):
+    """Блокирующий вызов, ограниченный дедлайном текущего запроса"""
+    current = _current.get()
+    if current is None:
+        return func(*args, **kwargs)
+    current.check()
+    context = contextvars.copy_context()
+    future = _executor.submit(context.run, func, *args, **kwargs)
+    try:
+        return future.result(timeout=current.remaining())
+    except FutureTimeout:
+        future.cancel()
+        raise DeadlineExceeded(f"{getattr(func, '__name__', func)} не уложился в дедлайн")
+
+
+async def await_with_deadline(awaitable):
+    """То же для корутин"""
+    current = _current.get()
+    if current is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, current.remaining())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("вызов не уложился в дедлайн")
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для внешнего сервиса
+
+    После failure_threshold ошибок подряд размыкается: вызовы сразу получают
+    CircuitOpenError. Через reset_timeout пропускается один пробный вызов
+    (half-open): успех замыкает цепь, ошибка снова размыкает её.
+
+    Ошибками считаются сбои сервиса и вызовы дольше call_timeout (CallTimeout).
+    Вызов ограничивается и дедлайном запроса, но если запросу просто не
+    хватило своего бюджета (его остаток меньше call_timeout), это
+    DeadlineExceeded, а не сбой сервиса: такие вызовы не считаются.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, call_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.call_timeout = call_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Можно ли выполнять вызов; в half-open - только один пробный"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe = False
+            if self._probe:
+                return False
+            self._probe = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Предохранитель {self.name}: сервис снова доступен")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Предохранитель {self.name} разомкнут после {self.failures} ошибок")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe = False
+
+    def _release(self):
+        # вызов не состоялся по вине запроса: пробный вызов можно повторить
+        with self._lock:
+            self._probe = False
+
+    def _timeout(self):
+        """Таймаут вызова и признак того, что его задаёт дедлайн запроса"""
+        current = _current.get()
+        if current is not None:
+            # запрос, у которого время уже вышло, до сервиса не доходит
+            current.check()
+            remaining = current.remaining()
+            if self.call_timeout is None or remaining < self.call_timeout:
+                return remaining, True
+        return self.call_timeout, False
+
+    def _timed_out(self, by_deadline):
+        if by_deadline:
+            return DeadlineExceeded(f"{self.name}: время запроса истекло")
+        return CallTimeout(f"{self.name}: нет ответа за {self.call_timeout} с")
+
+    def call(self, func, *args, **kwargs):
+        """Блокирующий вызов; с таймаутом выполняется в отдельном потоке"""
+        timeout, by_deadline = self._timeout()
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} временно недоступен")
+        try:
+            if timeout is None:
+                result = func(*args, **kwargs)
+            else:
+                context = contextvars.copy_context()
+                future = _executor.submit(context.run, func, *args, **kwargs)
+                try:
+                    result = future.result(timeout=timeout)
+                except FutureTimeout:
+                    if future.done():
+                        # таймаут клиента самого сервиса
+                        raise
+                    future.cancel()
+                    raise self._timed_out(by_deadline) from None
+        except CallTimeout:
+            self.record_failure()
+            raise
+        except DeadlineExceeded:
+            self._release()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    async def call_async(self, func, *args, **kwargs):
+        """То же для корутинной функции func"""
+        timeout, by_deadline = self._timeout()
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} временно недоступен")
+        started = time.monotonic()
+        try:
+            try:
+                result = await asyncio.wait_for(func(*args, **kwargs), timeout)
+            except asyncio.TimeoutError:
+                if timeout is None or time.monotonic() - started < timeout:
+                    # таймаут клиента самого сервиса
+                    raise
+                raise self._timed_out(by_deadline) from None
+        except asyncio.CancelledError:
+            # отмена - не ошибка сервиса, но пробный вызов надо освободить
+            self._release()
+            raise
+        except CallTimeout:
+            self.record_failure()
+            raise
+        except DeadlineExceeded:
+            self._release()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
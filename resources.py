@@ -0,0 +1,180 @@
+"""
+Потоки torch / OpenCV и ядра для OCR
+
+По умолчанию torch занимает все ядра в каждом вызове, и несколько
+одновременных распознаваний мешают друг другу. Здесь число потоков
+согласуется с числом одновременных распознаваний, а процессы OCR
+закрепляются за своими ядрами.
+
+    python resources.py --objective throughput
+
+подбирает число процессов OCR и потоков на процесс на этой машине
+и сохраняет лучший вариант в OCR_TUNING_FILE.
+"""
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+THROUGHPUT = 'throughput'
+LATENCY = 'latency'
+
+
+def available_cpus():
+    """Ядра, доступные процессу (с учётом taskset / cgroup cpuset)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def threads_per_task(concurrency, cpus=None):
+    """Потоков на одно распознавание, чтобы concurrency распознаваний не делили ядра"""
+    cpus = cpus if cpus is not None else len(available_cpus())
+    return max(1, cpus // max(1, concurrency))
+
+
+def core_plan(workers, threads, cpus=None):
+    """Ядра для каждого процесса: по threads подряд, по кругу, если ядер не хватает"""
+    cpus = cpus if cpus is not None else available_cpus()
+    plan = []
+    for i in range(workers):
+        start = (i * threads) % len(cpus)
+        plan.append([cpus[(start + j) % len(cpus)] for j in range(min(threads, len(cpus)))])
+    return plan
+
+
+def apply_threads(threads):
+    """Потоки torch и OpenCV в этом процессе"""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        try:
+            # межоператорный пул задаётся только до первого параллельного вызова
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass
+    except ImportError:
+        pass
+    try:
+        import cv2
+        cv2.setNumThreads(threads)
+    except ImportError:
+        pass
+
+
+def pin_to_cores(cores, pid=0):
+    """Закрепление процесса за ядрами; False, если ОС этого не умеет"""
+    if not cores or not hasattr(os, 'sched_setaffinity'):
+        return False
+    try:
+        os.sched_setaffinity(pid, cores)
+        return True
+    except OSError as e:
+        logger.warning(f"Не удалось закрепить процесс за ядрами {cores}: {e}")
+        return False
+
+
+def load_tuning(path):
+    """Сохранённая настройка ({'workers', 'threads', 'pin', ...}) или None"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.error(f"Ошибка чтения {path}: {e}")
+        return None
+
+
+# подбор настройки
+
+def candidates(cpus):
+    """Сочетания (процессов, потоков) степенями двойки, не больше ядер в сумме"""
+    powers = [1]
+    while powers[-1] * 2 <= cpus:
+        powers.append(powers[-1] * 2)
+    return [(workers, threads) for workers in powers for threads in powers
+            if workers * threads <= cpus]
+
+
+def measure(images, workers, threads, pin, rounds):
+    """Пропускная способность и задержки пула на наборе изображений"""
+    from ocr_workers import OcrWorkerPool
+    from benchmark import summarize
+
+    pool = OcrWorkerPool(workers, threads, pin=pin).start()
+    try:
+        # прогрев: по изображению на процесс
+        for future in [pool.submit(images[0]) for _ in range(workers)]:
+            future.result()
+
+        # замкнутый цикл: в работе не больше workers изображений, без очереди
+        latencies = []
+        slots = threading.Semaphore(workers)
+        batch = images * rounds
+
+        def done(future, sent_at):
+            latencies.append(time.perf_counter() - sent_at)
+            slots.release()
+
+        start = time.perf_counter()
+        for image_bytes in batch:
+            slots.acquire()
+            sent_at = time.perf_counter()
+            pool.submit(image_bytes).add_done_callback(lambda f, sent_at=sent_at: done(f, sent_at))
+        for _ in range(workers):
+            slots.acquire()
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.stop()
+
+    summary = summarize(latencies)
+    return {'workers': workers, 'threads': threads, 'pin': pin,
+            'images_per_sec': len(batch) / elapsed, 'p50': summary['p50'],
+            'p95': summary['p95']}
+
+
+def autotune(objective=THROUGHPUT, rounds=2, pin=True):
+    """Замер всех сочетаний; (лучшее, все результаты)"""
+    import ocr
+    from benchmark import build_images
+
+    if not ocr.init_readers():
+        raise RuntimeError("модели OCR не загружены")
+    images = list(build_images().values())
+    cpus = len(available_cpus())
+
+    results = []
+    for workers, threads in candidates(cpus):
+        result = measure(images, workers, threads, pin, rounds)
+        print(f"{workers} x {threads}: {result['images_per_sec']:.2f} изобр/с, "
+              f"p50 {result['p50'] * 1000:.0f} мс, p95 {result['p95'] * 1000:.0f} мс")
+        results.append(result)
+
+    if objective == LATENCY:
+        best = min(results, key=lambda result: result['p95'])
+    else:
+        best = max(results, key=lambda result: result['images_per_sec'])
+    return best, results
+
+
+if __name__ == '__main__':
+    import argparse
+    from config import OCR_TUNING_FILE
+
+    parser = argparse.ArgumentParser(description="Подбор числа процессов и потоков OCR")
+    parser.add_argument('--objective', default=THROUGHPUT, choices=[THROUGHPUT, LATENCY])
+    parser.add_argument('--rounds', type=int, default=2, help="проходов по набору изображений")
+    parser.add_argument('--no-pin', action='store_true', help="не закреплять процессы за ядрами")
+    parser.add_argument('--output', default=OCR_TUNING_FILE)
+    args = parser.parse_args()
+
+    best, results = autotune(args.objective, args.rounds, not args.no_pin)
+    tuning = dict(best, objective=args.objective, cpus=len(available_cpus()),
+                  timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'), results=results)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(tuning, f, ensure_ascii=False, indent=2)
+    print(f"✅ {best['workers']} процессов x {best['threads']} потоков, сохранено в {args.output}")
@@ -0,0 +1,71 @@
+import threading
+import collections
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Передача декодированных изображений процессам OCR через разделяемую память
+#
+# Один сегмент делится на slots слотов по slot_size байт. Родитель берёт
+# свободный слот, кладёт в него декодированное фото и отправляет процессу
+# только описание кадра (слот, размеры, тип): массив не сериализуется и
+# не копируется через pipe, процесс читает его на месте. Слот свободен
+# снова, когда родитель получил результат (или процесс упал). Слотов
+# ограниченное число, поэтому и памяти под изображения в работе не больше
+# slots * slot_size: лишние фото ждут слот, не декодируясь.
+#
+# Сегмент создаётся до fork, и процессы OCR получают его отображение
+# вместе с остальной памятью родителя; удаляет его только родитель.
+
+
+# описание кадра в слоте: только оно уходит процессу OCR
+Frame = collections.namedtuple('Frame', 'slot shape dtype')
+
+
+class FrameSlots:
+    """Пул слотов в одном сегменте разделяемой памяти"""
+
+    def __init__(self, slots, slot_size):
+        self.slots = slots
+        self.slot_size = slot_size
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_size)
+        # последний освобождённый слот выдаётся первым: его страницы уже в памяти
+        self._free = list(range(slots - 1, -1, -1))
+        self._cond = threading.Condition()
+
+    def in_use(self):
+        with self._cond:
+            return self.slots - len(self._free)
+
+    def acquire(self, timeout=None):
+        """Номер свободного слота или None, если за timeout секунд слот не освободился"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._free, timeout):
+                return None
+            return self._free.pop()
+
+    def release(self, slot):
+        with self._cond:
+            self._free.append(slot)
+            self._cond.notify()
+
+    def view(self, frame):
+        """Массив кадра поверх памяти слота (без копирования)"""
+        return np.ndarray(frame.shape, frame.dtype, buffer=self.shm.buf,
+                          offset=frame.slot * self.slot_size)
+
+    def write(self, slot, array):
+        """Копия массива в слот; Frame или None, если массив в слот не помещается"""
+        if array.nbytes > self.slot_size:
+            return None
+        frame = Frame(slot, array.shape, array.dtype.str)
+        np.copyto(self.view(frame), array)
+        return frame
+
+    def close(self):
+        """Удаление сегмента (только в родителе, когда процессы OCR остановлены)"""
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
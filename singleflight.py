@@ -0,0 +1,102 @@
+import asyncio
+import threading
+
+from resilience import DeadlineExceeded, current_deadline
+
+
+class _Call:
+    """Вычисление, которое сейчас выполняется"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _expired(current):
+    """Истёк ли дедлайн ожидающего (без дедлайна - никогда)"""
+    return current is not None and current.expired()
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных вызовов
+
+    Первый вызов с ключом выполняет функцию, остальные вызовы с тем же
+    ключом ждут и получают тот же результат (или то же исключение).
+    После завершения ключ освобождается — это не кэш.
+
+    Ожидающие ждут не дольше своего дедлайна. Если у первого вызова
+    истёк его собственный дедлайн, ожидающий, у которого время ещё есть,
+    повторяет вызов сам (или присоединяется к новому первому).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call()
+                    break
+
+            current = current_deadline()
+            if not call.event.wait(None if current is None else current.remaining()):
+                raise DeadlineExceeded("не дождался одинакового запроса")
+            if isinstance(call.error, DeadlineExceeded) and not _expired(current):
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def in_flight(self):
+        """Число ключей, которые сейчас вычисляются"""
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """То же для корутин (в пределах одного цикла событий)"""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, func, *args, **kwargs):
+        while True:
+            future = self._calls.get(key)
+            # завершённый вызов ещё может быть в словаре до своего колбэка
+            if future is None or future.done():
+                break
+            current = current_deadline()
+            try:
+                # shield: отмена одного ожидающего не отменяет общий вызов
+                return await asyncio.wait_for(asyncio.shield(future),
+                                              None if current is None else current.remaining())
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded("не дождался одинакового запроса")
+            except DeadlineExceeded:
+                if _expired(current):
+                    raise
+
+        future = asyncio.ensure_future(func(*args, **kwargs))
+        self._calls[key] = future
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        # ключ мог уже занять повторный вызов
+        if self._calls.get(key) is future:
+            del self._calls[key]
@@ -0,0 +1,72 @@
+import json
+
+from telebot import types
+
+from recorder import UpdateRecorder
+from replay import with_dates
+
+ALICE = {'id': 555123, 'is_bot': False, 'first_name': 'Alice', 'username': 'alice'}
+BOB = {'id': 424242, 'is_bot': False, 'first_name': 'Bob', 'last_name': 'B'}
+HELPER_BOT = {'id': 777001, 'is_bot': True, 'first_name': 'Helper', 'username': 'helper_bot'}
+CHANNEL = {'id': -1009990001, 'type': 'channel', 'title': 'Secret channel', 'username': 'secret'}
+GROUP = {'id': -100123456, 'type': 'supergroup', 'title': 'Travel group'}
+RAW_IDS = ('555123', '424242', '777001', '9990001', '100123456')
+
+
+def message(**fields):
+    return dict({'message_id': 1, 'date': 1700000000, 'chat': GROUP, 'from': ALICE}, **fields)
+
+
+def recorded(update):
+    recorder = UpdateRecorder('/tmp/unused.jsonl', salt='test')
+    anonymized = recorder.anonymize(update)
+    dumped = json.dumps(anonymized, ensure_ascii=False)
+    for raw in RAW_IDS:
+        assert raw not in dumped
+    for name in ('Alice', 'alice', 'Bob', 'Helper', 'Secret channel', 'Travel group'):
+        assert name not in dumped
+    return recorder, anonymized
+
+
+def test_forwarded_message():
+    update = {'message': message(
+        text='Eiffel Tower',
+        forward_origin={'type': 'user', 'sender_user': BOB, 'date': 1700000000},
+        forward_from=BOB,
+        forward_from_chat=CHANNEL,
+        via_bot=HELPER_BOT,
+        reply_to_message=message(
+            message_id=0, text='hi',
+            forward_origin={'type': 'channel', 'chat': CHANNEL, 'message_id': 5,
+                            'author_signature': 'Alice'}),
+    )}
+    recorder, anonymized = recorded(update)
+    msg = anonymized['message']
+    assert msg['text'] == 'Eiffel Tower'
+    # одинаковые id - одинаковые псевдонимы, знак id чата сохраняется
+    assert msg['forward_origin']['sender_user']['id'] == msg['forward_from']['id']
+    assert msg['forward_from_chat']['id'] == msg['reply_to_message']['forward_origin']['chat']['id'] < 0
+    assert msg['via_bot'] == {'id': recorder.anon_id(777001), 'is_bot': True, 'first_name': 'User'}
+    # telebot разбирает анонимизированный апдейт
+    parsed = types.Update.de_json(dict(with_dates(anonymized, 1700000000), update_id=1))
+    assert parsed.message.forward_from.id == recorder.anon_id(424242)
+
+
+def test_service_messages():
+    joined = {'message': message(new_chat_members=[BOB, HELPER_BOT], new_chat_member=BOB)}
+    left = {'message': message(left_chat_member=BOB, sender_chat=CHANNEL)}
+    recorder, anonymized = recorded(joined)
+    members = anonymized['message']['new_chat_members']
+    assert [member['id'] for member in members] == [recorder.anon_id(424242), recorder.anon_id(777001)]
+    _, anonymized = recorded(left)
+    assert anonymized['message']['left_chat_member']['id'] == recorder.anon_id(424242)
+    assert anonymized['message']['sender_chat']['type'] == 'channel'
+
+
+def test_callback_query():
+    update = {'callback_query': {'id': '42', 'from': ALICE, 'chat_instance': '-88001',
+                                 'data': 'lang_en', 'message': message(text='Выберите язык')}}
+    _, anonymized = recorded(update)
+    query = anonymized['callback_query']
+    assert query['data'] == 'lang_en' and query['id'] == '42'
+    assert query['chat_instance'] != '-88001'
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+import pytest
+
+from resilience import CircuitBreaker, CallTimeout, DeadlineExceeded, deadline
+
+
+def slow(seconds=0.3):
+    time.sleep(seconds)
+    return 'ok'
+
+
+async def slow_async(seconds=0.3):
+    await asyncio.sleep(seconds)
+    return 'ok'
+
+
+def test_short_budget_does_not_trip_breaker():
+    breaker = CircuitBreaker('test', failure_threshold=1, call_timeout=1.0)
+    with deadline(0.05):
+        with pytest.raises(DeadlineExceeded) as raised:
+            breaker.call(slow)
+    assert not isinstance(raised.value, CallTimeout)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_slow_service_trips_breaker():
+    breaker = CircuitBreaker('test', failure_threshold=1, call_timeout=0.05)
+    with deadline(5):
+        with pytest.raises(CallTimeout):
+            breaker.call(slow)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_short_budget_does_not_trip_breaker_async():
+    breaker = CircuitBreaker('test', failure_threshold=1, call_timeout=1.0)
+
+    async def run():
+        with deadline(0.05):
+            with pytest.raises(DeadlineExceeded) as raised:
+                await breaker.call_async(slow_async)
+        assert not isinstance(raised.value, CallTimeout)
+        with deadline(5):
+            # цепь осталась замкнутой: следующий вызов проходит
+            assert await breaker.call_async(slow_async, 0.01) == 'ok'
+
+    asyncio.run(run())
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
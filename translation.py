@@ -0,0 +1,126 @@
+import asyncio
+import logging
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# публичный endpoint Google Translate (протокол client=gtx)
+TRANSLATE_URL = "https://translate.googleapis.com"
+
+
+class Translated:
+    """Результат перевода (те же поля, что у googletrans)"""
+
+    def __init__(self, src, dest, origin, text, confidence=1.0):
+        self.src = src
+        self.dest = dest
+        self.origin = origin
+        self.text = text
+        self.confidence = confidence
+
+
+class Detected:
+    """Результат определения языка"""
+
+    def __init__(self, lang, confidence):
+        self.lang = lang
+        self.confidence = confidence
+
+
+def build_params(text, src, dest):
+    """Параметры запроса к translate_a/single"""
+    return {'client': 'gtx', 'sl': src, 'tl': dest, 'dt': 't', 'q': text}
+
+
+def parse_response(data, text, dest):
+    """Разбор ответа translate_a/single"""
+    translated = ''.join(part[0] for part in data[0] or [] if part and part[0])
+    src = (data[2] or 'auto').lower() if len(data) > 2 else 'auto'
+    confidence = 1.0
+    if len(data) > 6 and isinstance(data[6], (int, float)):
+        confidence = float(data[6])
+    return Translated(src, dest, text, translated, confidence)
+
+
+class Translator:
+    """Синхронный клиент перевода поверх requests"""
+
+    def __init__(self, base_url=TRANSLATE_URL, timeout=10):
+        self.url = base_url.rstrip('/') + '/translate_a/single'
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def translate(self, text, src='auto', dest='en'):
+        response = self.session.get(self.url, params=build_params(text, src, dest),
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        return parse_response(response.json(), text, dest)
+
+    def detect(self, text):
+        result = self.translate(text, dest='en')
+        return Detected(result.src, result.confidence)
+
+
+class AsyncTranslator:
+    """Асинхронный клиент перевода поверх aiohttp"""
+
+    def __init__(self, base_url=TRANSLATE_URL, timeout=10, limit=100):
+        self.url = base_url.rstrip('/') + '/translate_a/single'
+        self.timeout = timeout
+        self.limit = limit
+        self._session = None
+
+    async def _get_session(self):
+        import aiohttp
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit),
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def translate(self, text, src='auto', dest='en'):
+        session = await self._get_session()
+        async with session.get(self.url, params=build_params(text, src, dest)) as response:
+            response.raise_for_status()
+            data = await response.json(content_type=None)
+        return parse_response(data, text, dest)
+
+    async def detect(self, text):
+        result = await self.translate(text, dest='en')
+        return Detected(result.src, result.confidence)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+class ThreadedTranslator:
+    """Синхронный переводчик (например, googletrans) с интерфейсом AsyncTranslator: вызовы в потоках"""
+
+    def __init__(self, translator):
+        self.translator = translator
+
+    async def translate(self, text, src='auto', dest='en'):
+        return await asyncio.to_thread(self.translator.translate, text, src=src, dest=dest)
+
+    async def detect(self, text):
+        return await asyncio.to_thread(self.translator.detect, text)
+
+    async def close(self):
+        pass
+
+
+def create_translator(backend, url=TRANSLATE_URL):
+    """Переводчик: googletrans или свой клиент gtx (например, заглушка в нагрузочных тестах)"""
+    if backend == 'gtx':
+        return Translator(url)
+    from googletrans import Translator as GoogleTranslator
+    return GoogleTranslator()
+
+
+def create_async_translator(backend, url=TRANSLATE_URL, limit=100):
+    """То же для асинхронного бота: тот же сервис, что и у синхронного при том же backend"""
+    if backend == 'gtx':
+        return AsyncTranslator(url, limit=limit)
+    return ThreadedTranslator(create_translator(backend, url))
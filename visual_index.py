@@ -0,0 +1,271 @@
+import io
+import os
+import logging
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Поиск достопримечательности по изображению, без текста на фото
+#
+# Эталонные фото лежат в data/landmark_images/<ключ каталога или en_name>/*.jpg.
+# Каждое превращается в вектор признаков (сеть torchvision без классификатора),
+# векторы нормируются и складываются в одну матрицу. Поиск - произведение
+# матрицы запросов на матрицу эталонов (косинусная близость) и top-k по строкам.
+# Векторы эталонов кэшируются в index.npz рядом с фото и пересчитываются
+# только для новых или изменённых файлов.
+#
+# Эталоны в репозитории не лежат, и без них поиск выключен. Пороги
+# VISUAL_MIN_SCORE / VISUAL_MARGIN подбираются на своих эталонах:
+# --check проверяет каждое фото по остальным (leave-one-out) и показывает,
+# сколько узнано верно, неверно и не узнано при разных порогах.
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'landmark_images')
+CACHE_NAME = 'index.npz'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+INPUT_SIZE = 224
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32).reshape(3, 1, 1)
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32).reshape(3, 1, 1)
+
+
+def preprocess(image_bytes):
+    """Байты изображения -> массив [3, 224, 224] с нормализацией ImageNet"""
+    image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+    image = ImageOps.fit(image, (INPUT_SIZE, INPUT_SIZE), Image.BILINEAR)
+    array = np.asarray(image, dtype=np.float32).transpose(2, 0, 1) / 255.0
+    return (array - MEAN) / STD
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class TorchvisionEmbedder:
+    """Векторы признаков предобученной сети torchvision (последний слой перед классификатором)"""
+
+    def __init__(self, model_name='mobilenet_v3_small', pretrained=True, batch_size=32):
+        import torch
+        import torchvision
+        self.batch_size = batch_size
+        weights = torchvision.models.get_model_weights(model_name).DEFAULT if pretrained else None
+        # имя для кэша векторов: другие веса - другие векторы
+        self.name = f"{model_name}:{weights}"
+        model = torchvision.models.get_model(model_name, weights=weights)
+        # классификатор не нужен: берём вектор после пулинга
+        if hasattr(model, 'classifier'):
+            model.classifier = torch.nn.Identity()
+        elif hasattr(model, 'fc'):
+            model.fc = torch.nn.Identity()
+        self.model = model.eval()
+        self._torch = torch
+
+    def embed(self, images):
+        """Список байтов изображений -> нормированные векторы [n, d]"""
+        vectors = []
+        for start in range(0, len(images), self.batch_size):
+            batch = np.stack([preprocess(image) for image in images[start:start + self.batch_size]])
+            with self._torch.inference_mode():
+                vectors.append(self.model(self._torch.from_numpy(batch)).numpy())
+        return normalize(np.concatenate(vectors).astype(np.float32))
+
+
+class VisualIndex:
+    """Матрица нормированных векторов эталонов и ключи их достопримечательностей"""
+
+    def __init__(self, vectors, labels):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.labels = np.asarray(labels, dtype=object)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def search(self, queries, k=5):
+        """
+        Top-k эталонов для каждого запроса
+
+        queries - нормированные векторы [b, d]; результат - списки
+        (ключ, близость) по убыванию близости, по одному на запрос
+        """
+        if not len(self):
+            return [[] for _ in range(len(queries))]
+        k = min(k, len(self))
+        scores = queries @ self.vectors.T
+        # argpartition - O(n) на строку, сортируются только k лучших
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [list(zip(self.labels[row], map(float, row_scores)))
+                for row, row_scores in zip(top, top_scores)]
+
+    def match(self, query, min_score, margin, k=10):
+        """
+        Достопримечательность для одного вектора: (ключ, близость) или None
+
+        Лучший эталон должен быть не хуже min_score и опережать ближайшую
+        другую достопримечательность хотя бы на margin.
+        """
+        best = {}
+        for label, score in self.search(query[np.newaxis], k)[0]:
+            best.setdefault(label, score)
+        if not best:
+            return None
+        ranked = sorted(best.items(), key=lambda item: -item[1])
+        label, score = ranked[0]
+        if score < min_score:
+            return None
+        if len(ranked) > 1 and score - ranked[1][1] < margin:
+            return None
+        return label, score
+
+
+def scan_images(root, resolve_label):
+    """Эталонные фото: [(путь, ключ)]; resolve_label(имя папки) -> ключ каталога или None"""
+    found = []
+    if not os.path.isdir(root):
+        return found
+    for entry in sorted(os.listdir(root)):
+        folder = os.path.join(root, entry)
+        if not os.path.isdir(folder):
+            continue
+        label = resolve_label(entry)
+        if label is None:
+            logger.warning(f"Папка {entry} не соответствует достопримечательности каталога")
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                found.append((os.path.join(folder, name), label))
+    return found
+
+
+def build_index(root, embedder, resolve_label):
+    """Индекс по папке эталонов; векторы неизменённых файлов берутся из кэша"""
+    images = scan_images(root, resolve_label)
+    cache_path = os.path.join(root, CACHE_NAME)
+
+    cached = {}
+    if os.path.exists(cache_path):
+        try:
+            data = np.load(cache_path, allow_pickle=False)
+            if str(data['model']) == embedder.name:
+                cached = dict(zip(data['keys'], data['vectors']))
+        except Exception as e:
+            logger.warning(f"Кэш визуального индекса не прочитан: {e}")
+
+    keys = []
+    vectors = [None] * len(images)
+    missing = []
+    for i, (path, _) in enumerate(images):
+        stat = os.stat(path)
+        key = f"{os.path.relpath(path, root)}|{stat.st_mtime_ns}|{stat.st_size}"
+        keys.append(key)
+        if key in cached:
+            vectors[i] = cached[key]
+        else:
+            missing.append(i)
+
+    if missing:
+        logger.info(f"Визуальный индекс: новых эталонов {len(missing)}")
+        contents = []
+        for i in missing:
+            with open(images[i][0], 'rb') as f:
+                contents.append(f.read())
+        for i, vector in zip(missing, embedder.embed(contents)):
+            vectors[i] = vector
+        try:
+            np.savez(cache_path, model=np.array(embedder.name), keys=np.array(keys),
+                     vectors=np.stack(vectors))
+        except OSError as e:
+            logger.warning(f"Кэш визуального индекса не сохранён: {e}")
+
+    if not images:
+        return VisualIndex(np.zeros((0, 1), dtype=np.float32), [])
+    return VisualIndex(np.stack(vectors), [label for _, label in images])
+
+
+class VisualRecognizer:
+    """Эмбеддер и индекс вместе: байты фото -> (ключ, близость) или None"""
+
+    def __init__(self, embedder, index, min_score=0.75, margin=0.05):
+        self.embedder = embedder
+        self.index = index
+        self.min_score = min_score
+        self.margin = margin
+
+    def recognize(self, image_bytes):
+        with STAGE_SECONDS.time(stage='visual'):
+            query = self.embedder.embed([image_bytes])[0]
+            return self.index.match(query, self.min_score, self.margin)
+
+
+def leave_one_out(index, min_score, margin, k=10):
+    """
+    Проверка порогов на самих эталонах: каждое фото ищется среди остальных
+
+    Возвращает (верно, неверно, не узнано). Фото, у достопримечательности
+    которого нет других эталонов, не считается.
+    """
+    counts = [0, 0, 0]
+    for i, label in enumerate(index.labels):
+        others = np.arange(len(index)) != i
+        if label not in index.labels[others]:
+            continue
+        rest = VisualIndex(index.vectors[others], index.labels[others])
+        match = rest.match(index.vectors[i], min_score, margin, k)
+        if match is None:
+            counts[2] += 1
+        else:
+            counts[0 if match[0] == label else 1] += 1
+    return tuple(counts)
+
+
+def catalog_label_resolver(landmark_index):
+    """Имя папки -> ключ каталога: сам ключ или английское название, без учёта регистра"""
+    by_name = {key.lower(): key for key in landmark_index.infos}
+    for key, info in landmark_index.infos.items():
+        by_name.setdefault(info['en_name'].lower(), key)
+        by_name.setdefault(info['en_name'].lower().replace(' ', '_'), key)
+    return lambda folder: by_name.get(folder.lower())
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    from landmarks import get_index
+
+    parser = argparse.ArgumentParser(description="Построение визуального индекса и поиск по фото")
+    parser.add_argument('--dir', default=IMAGES_DIR)
+    parser.add_argument('--model', default='mobilenet_v3_small')
+    parser.add_argument('--check', action='store_true',
+                        help="подбор порогов: каждое эталонное фото ищется среди остальных")
+    parser.add_argument('query', nargs='*', help="фото для поиска")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    embedder = TorchvisionEmbedder(args.model)
+    start = time.perf_counter()
+    index = build_index(args.dir, embedder, catalog_label_resolver(get_index()))
+    print(f"Эталонов: {len(index)}, {time.perf_counter() - start:.1f} с")
+    if args.check:
+        from config import VISUAL_MIN_SCORE, VISUAL_MARGIN
+        print(f"Сейчас: VISUAL_MIN_SCORE={VISUAL_MIN_SCORE}, VISUAL_MARGIN={VISUAL_MARGIN}")
+        print("порог   отрыв   верно  неверно  не узнано")
+        for min_score in (0.5, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9):
+            for margin in (0.0, 0.02, 0.05, 0.1):
+                right, wrong, rejected = leave_one_out(index, min_score, margin)
+                print(f"{min_score:5.2f}  {margin:6.2f}  {right:6d}  {wrong:7d}  {rejected:9d}")
+    if args.query:
+        contents = []
+        for path in args.query:
+            with open(path, 'rb') as f:
+                contents.append(f.read())
+        for path, results in zip(args.query, index.search(embedder.embed(contents))):
+            print(path)
+            for label, score in results:
+                print(f"  {score:.3f} {label}")
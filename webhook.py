@@ -0,0 +1,97 @@
+import hmac
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+
+logger = logging.getLogger(__name__)
+
+# максимальный размер тела апдейта
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Приём апдейтов Telegram и служебные endpoint'ы"""
+
+    server_version = "langhelperbot"
+
+    def do_GET(self):
+        if self.path == '/healthz':
+            self._reply(200, b'ok')
+        elif self.path == '/readyz':
+            if self.server.is_ready():
+                self._reply(200, b'ready')
+            else:
+                self._reply(503, b'not ready')
+        else:
+            self._reply(404, b'not found')
+
+    def do_POST(self):
+        if self.path != self.server.webhook_path:
+            self._reply(404, b'not found')
+            return
+
+        # проверка секретного токена из setWebhook: без него апдейт может прислать кто угодно
+        secret = self.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not hmac.compare_digest(secret.encode(), self.server.secret.encode()):
+            self._reply(403, b'forbidden')
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0 or length > MAX_BODY_SIZE:
+            self._reply(413 if length > MAX_BODY_SIZE else 400, b'bad request')
+            return
+
+        try:
+            update = types.Update.de_json(json.loads(self.rfile.read(length)))
+        except Exception as e:
+            logger.error(f"Некорректный апдейт: {e}")
+            self._reply(400, b'bad request')
+            return
+
+        # обработка идёт в пулах диспетчера, Telegram сразу получает ответ
+        self.server.on_update(update)
+        self._reply(200, b'ok')
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """HTTP-сервер webhook-режима"""
+
+    daemon_threads = True
+
+    def __init__(self, host, port, webhook_path, secret, on_update, is_ready=lambda: True):
+        if not secret:
+            raise ValueError("для webhook-режима нужен WEBHOOK_SECRET")
+        super().__init__((host, port), WebhookHandler)
+        self.webhook_path = webhook_path
+        self.secret = secret
+        self.on_update = on_update
+        self.is_ready = is_ready
+
+
+def run_webhook(bot, dispatcher, host, port, path, secret, public_url=None, is_ready=None):
+    """Webhook-режим: регистрация адреса в Telegram и приём апдейтов"""
+    server = WebhookServer(host, port, path, secret, dispatcher.submit,
+                           is_ready or (lambda: True))
+
+    # при нескольких репликах за балансировщиком адрес регистрирует одна из них
+    if public_url:
+        bot.set_webhook(url=public_url.rstrip('/') + path, secret_token=secret)
+        logger.info(f"Webhook зарегистрирован: {public_url.rstrip('/') + path}")
+
+    print(f"🌐 Webhook-сервер слушает {host}:{port}{path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()